@@ -0,0 +1,70 @@
+"""
+python_exec ベンチマーク
+
+同じPythonコードを、今までのやり方（shellで毎回 `python3 -c` を起動）と
+python_exec Tool（起動済み・import済みのワーカー）で実行し、1回あたりのレイテンシを比較する。
+
+    PYTHONPATH=. python3 benchmarks/bench_python_exec.py
+"""
+
+import os
+import shlex
+import statistics
+import sys
+import time
+
+os.environ.setdefault("YUI_SHELL_SESSION", "off")  # コマンド毎に起動する（今までの動作）
+
+from yui.tools.python_exec import PythonExecTool  # noqa: E402
+from yui.tools.shell import ShellTool  # noqa: E402
+
+RUNS = 20
+
+# (ラベル, コード)
+SCENARIOS = [
+    ("arithmetic", "print(sum(range(1000)))"),
+    ("json + datetime", "import json, datetime; print(json.dumps({'now': str(datetime.date.today())}))"),
+    ("regex over text", "import re; print(len(re.findall(r'\\w+', 'the quick brown fox ' * 200)))"),
+]
+
+
+def measure(fn) -> tuple[float, float]:
+    """RUNS回実行し (中央値, p90) をミリ秒で返す"""
+    samples = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.9) - 1]
+
+
+def main():
+    shell = ShellTool()
+    python = PythonExecTool()
+    python.execute("None")  # プールの準備を待つ
+    python_cmd = shlex.quote(sys.executable)
+
+    print(f"{'scenario':<20} {'shell p50':>10} {'shell p90':>10} {'exec p50':>9} {'exec p90':>9} {'speedup':>8}")
+    for label, code in SCENARIOS:
+        expected = shell.execute(f"{python_cmd} -c {shlex.quote(code)}")
+        result = python.execute(code)
+        assert result["ok"] and result["stdout"].strip() == expected.strip(), (expected, result)
+
+        shell_p50, shell_p90 = measure(lambda: shell.execute(f"{python_cmd} -c {shlex.quote(code)}"))
+        exec_p50, exec_p90 = measure(lambda: python.execute(code))
+        print(
+            f"{label:<20} {shell_p50:>8.1f}ms {shell_p90:>8.1f}ms {exec_p50:>7.2f}ms {exec_p90:>7.2f}ms "
+            f"{shell_p50 / exec_p50:>7.0f}x"
+        )
+
+    # 新しいセッション（プールから温めたワーカーを取り出す）
+    start = time.perf_counter()
+    python.execute("None", session="fresh")
+    print(f"\nfirst call in a new session (warm pool): {(time.perf_counter() - start) * 1000:.1f}ms")
+    print(f"pool: {python.pool.stats}")
+    python.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Tool並列実行ベンチマーク
+
+1ターンに複数のtool_callsが来たケースを模擬し、
+逐次実行とToolExecutor.aexecute_all()の並行実行のwall-clockを比較する。
+
+    PYTHONPATH=. python3 benchmarks/bench_tool_executor.py
+"""
+
+import asyncio
+import time
+
+from yui.tools.base import BaseTool
+from yui.tools.executor import ToolExecutor
+
+
+class SleepTool(BaseTool):
+    """レイテンシだけを模擬するダミーTool"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.description = f"fake {name}"
+
+    def parameters_schema(self) -> dict:
+        return {"type": "object", "properties": {}}
+
+    def execute(self, seconds: float = 0.0, **kwargs):
+        time.sleep(seconds)
+        return f"{self.name} slept {seconds}s"
+
+
+class FakeRegistry:
+    def __init__(self, names: list[str]):
+        self.tools = {name: SleepTool(name) for name in names}
+
+    def execute(self, tool_name: str, params: dict):
+        return self.tools[tool_name].execute(**params)
+
+    async def aexecute(self, tool_name: str, params: dict):
+        return await self.tools[tool_name].aexecute(**params)
+
+
+# (ラベル, [(tool_name, 秒数[, action]), ...])
+SCENARIOS = [
+    ("3x web_fetch + shell build", [
+        ("web_fetch", 0.30), ("web_fetch", 0.25), ("web_fetch", 0.35), ("shell", 0.50),
+    ]),
+    ("2x file_ops write (serial) + web_fetch", [
+        ("file_ops", 0.10, "write"), ("file_ops", 0.10, "append"), ("web_fetch", 0.30),
+    ]),
+    ("3x file_ops read", [
+        ("file_ops", 0.10, "read"), ("file_ops", 0.10, "read"), ("file_ops", 0.10, "list"),
+    ]),
+    ("single shell", [
+        ("shell", 0.20),
+    ]),
+]
+
+
+def main():
+    registry = FakeRegistry(["web_fetch", "shell", "file_ops"])
+    executor = ToolExecutor(registry, max_workers=4)
+
+    print(f"{'scenario':<40} {'sequential':>11} {'executor':>9} {'speedup':>8}")
+    for label, spec in SCENARIOS:
+        calls = [(name, {"seconds": sec, **({"action": rest[0]} if rest else {})}) for name, sec, *rest in spec]
+
+        start = time.perf_counter()
+        sequential = [registry.execute(name, params) for name, params in calls]
+        seq_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        concurrent = asyncio.run(executor.aexecute_all(calls))
+        async_elapsed = time.perf_counter() - start
+
+        assert concurrent == sequential, "results must keep tool_call order"
+        print(f"{label:<40} {seq_elapsed:>10.2f}s {async_elapsed:>8.2f}s {seq_elapsed / async_elapsed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+YUi Conversation Compactor - 古い会話の要約
+
+トークン予算から溢れて会話履歴から捨てられたメッセージを、
+捨てる代わりに「これまでの会話の要約」に少しずつ畳み込む。
+  - 要約はバックグラウンドのタスクで行い、ユーザーのターンに待ち時間を足さない
+  - 要約の大きさはMAX_SUMMARY_TOKENSで上限を設け、プロンプトを小さく保つ
+  - LLMでの要約に失敗したら、抜粋をそのまま畳み込む（上限は同じ）
+"""
+
+import asyncio
+from typing import Awaitable, Callable
+
+from yui.agent.tokens import count_tokens
+
+MAX_SUMMARY_TOKENS = 600  # 要約ブロックの上限
+MAX_EXCERPT_CHARS = 500  # 要約に渡すメッセージ1件あたりの上限
+
+
+def clip_to_tokens(text: str, max_tokens: int, keep: str = "head") -> str:
+    """テキストをmax_tokens以内に切り詰める（keep="tail"なら末尾を残す）"""
+    while text and count_tokens(text) > max_tokens:
+        cut = max(1, len(text) * max_tokens // max(count_tokens(text), 1))
+        cut = min(cut, len(text) - 1)
+        text = text[-cut:] if keep == "tail" else text[:cut]
+    return text
+
+
+def render_transcript(messages: list[dict]) -> str:
+    """要約用に会話を1行ずつのテキストにする"""
+    lines = []
+    for msg in messages:
+        role = msg.get("role")
+        content = (msg.get("content") or "").strip()
+        if role == "user":
+            label = "ユーザー"
+        elif role == "assistant":
+            label = "YUi"
+            calls = [tc["function"]["name"] for tc in msg.get("tool_calls") or []]
+            if calls:
+                content = f"{content} (tool: {', '.join(calls)})".strip()
+        elif role == "tool":
+            label = "tool結果"
+        else:
+            continue
+        if content:
+            lines.append(f"{label}: {content[:MAX_EXCERPT_CHARS]}")
+    return "\n".join(lines)
+
+
+class ConversationCompactor:
+    def __init__(
+        self,
+        summarize: Callable[[str, str], Awaitable[str]],
+        max_tokens: int = MAX_SUMMARY_TOKENS,
+    ):
+        """
+        summarize(現在の要約, 新しく溢れた会話) -> 新しい要約 を非同期で返す関数を受け取る。
+        """
+        self.summarize = summarize
+        self.max_tokens = max_tokens
+        self.summary = ""
+        self.folded_messages = 0  # これまでに要約へ畳み込んだメッセージ数
+
+        self._pending: list[dict] = []
+        self._task: asyncio.Task | None = None
+        self._generation = 0  # reset()で古いタスクの結果を捨てるため
+
+    def submit(self, evicted: list[dict]):
+        """
+        溢れたメッセージを要約待ちに追加し、バックグラウンドで要約を進める。
+        イベントループ上から呼ぶこと。
+        """
+        if not evicted:
+            return
+        self._pending.extend(evicted)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(self._generation))
+
+    async def _run(self, generation: int):
+        while self._pending and generation == self._generation:
+            batch, self._pending = self._pending, []
+            transcript = render_transcript(batch)
+            if not transcript:
+                continue
+
+            try:
+                summary = await self.summarize(self.summary, transcript)
+            except Exception as e:
+                print(f"[Compactor] summarize error: {e}")
+                summary = None
+            if not summary:
+                # 要約できなければ抜粋をそのまま足す（古い方から溢れる）
+                summary = f"{self.summary}\n{transcript}".strip()
+                keep = "tail"
+            else:
+                keep = "head"
+
+            if generation != self._generation:
+                return
+            self.summary = clip_to_tokens(summary.strip(), self.max_tokens, keep=keep)
+            self.folded_messages += len(batch)
+
+    def summary_block(self) -> str | None:
+        """プロンプトに入れる要約ブロック（要約がなければNone）"""
+        if not self.summary:
+            return None
+        return f"# これまでの会話の要約\n\n{self.summary}"
+
+    def reset(self):
+        """要約を破棄（/reset用）。実行中の要約タスクはキャンセルする。"""
+        self._generation += 1
+        self._pending = []
+        self.summary = ""
+        self.folded_messages = 0
+        if self._task and not self._task.done():
+            self._task.get_loop().call_soon_threadsafe(self._task.cancel)
+        self._task = None
@@ -3,88 +3,320 @@ YUi Context Builder
 
 Agent Loopの毎回のLLM呼び出し前に、system promptを組み立てる。
 SOUL.md (人格) + AGENTS.md (行動指針) + Honchoメモリ をマージ。
+過去の会話や資料（workspace/knowledge/、大きくなったAGENTS.md）は丸ごと入れず、
+今のユーザー発言に関係するものだけを検索してトークン予算内で入れる。
+
+プロンプトキャッシュが効くように、前半（prefix）はターンを跨いでバイト単位で同一に保つ:
+  - prefix: SOUL.md, AGENTS.md, 静的な実行環境情報
+  - 後半  : 記憶、現在時刻（時間単位に丸める）など変わるもの
+workspaceのファイルはmtimeとサイズで変更を検知し、変わらなければ読み直さない（prefixも作り直さない）。
+全体はMAX_SYSTEM_PROMPT_TOKENSの予算に収める。SOUL.mdなどprefixは削らず、記憶・資料・過去の発言を
+優先度の低い順に上限まで・予算まで削る（allocate_sections）。
 """
 
+import hashlib
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
 
+from yui.agent.compaction import clip_to_tokens
+from yui.agent.docs_index import DocIndex, find_markdown
+from yui.agent.local_memory import LocalMemory
 from yui.agent.memory import Memory
+from yui.agent.tokens import count_tokens
+
+RECALL_TOP_K = 5  # 関連する過去の発言を最大何件入れるか
+RECALL_MAX_TOKENS = 400  # 関連する過去の発言ブロックの上限
+RECALL_PASSAGE_TOKENS = 120  # 1件あたりの上限
+
+KNOWLEDGE_DIRNAME = "knowledge"  # 分割検索する資料（workspace/knowledge/**/*.md）
+AGENTS_INLINE_TOKENS = 1500  # AGENTS.mdがこれ以下なら丸ごとprefixへ、超えたら分割検索
+DOCS_TOP_K = 4  # 関係する資料のチャンクを最大何件入れるか
+DOCS_MAX_TOKENS = 800  # 資料ブロックの上限
+
+MAX_SYSTEM_PROMPT_TOKENS = 4000  # system prompt全体の予算（prefixは削らないので、溢れたら後半を削る）
+MEMORY_MAX_TOKENS = 1200  # 記憶ブロックの上限
+# 後半のセクションの優先度（小さいほど優先。0は削らない）と上限トークン数
+SECTION_BUDGETS: dict[str, tuple[int, int | None]] = {
+    "time": (0, None),
+    "memory": (1, MEMORY_MAX_TOKENS),
+    "MEMORY.md": (1, MEMORY_MAX_TOKENS),
+    "docs": (2, DOCS_MAX_TOKENS),
+    "recall": (3, RECALL_MAX_TOKENS),
+}
 
 
 class ContextBuilder:
-    def __init__(self, workspace: Path, memory: Memory | None = None):
+    def __init__(
+        self,
+        workspace: Path,
+        memory: Memory | LocalMemory | None = None,
+        state_dir: Path | None = None,
+    ):
         self.workspace = workspace
         self.memory = memory
-        # 起動時に1回だけHonchoから記憶を取得（毎ターン呼ぶと遅い）
-        self._cached_memory_text: str | None = None
-        self._memory_loaded = False
+        # workspaceの資料の索引（ディスク上。変わったファイルだけ索引し直す）
+        self.docs = DocIndex(workspace, (state_dir or workspace / ".yui") / "docs.db")
+        self.last_docs: list[dict] = []  # 直近のプロンプトに入れた資料のチャンク
+        self.last_recall: list[dict] = []  # 直近のプロンプトに入れた過去の発言
+        self.section_tokens: dict[str, int] = {}  # 直近のプロンプトのセクション毎のトークン数
+        self.cut_tokens: dict[str, int] = {}  # 直近のプロンプトで予算のために削ったトークン数
+
+        # workspaceのファイル: 相対パス -> ((mtime_ns, size), 内容)
+        self._file_cache: dict[str, tuple[tuple[int, int], str]] = {}
+        # 組み立て済みのprefix（ファイルが変わったときだけ作り直す）
+        self._static_key: tuple | None = None
+        self._static_prefix_text = ""
+        self._static_tokens: dict[str, int] = {}
+        self._agents_inline = True  # AGENTS.mdを丸ごとprefixに入れているか
 
-    def build_system_prompt(self) -> str:
+    def build_system_prompt(self, query: str | None = None) -> str:
         """
         system promptを組み立てる。
-        優先順位: SOUL.md > AGENTS.md > Honchoメモリ > Runtime
+        優先順位: SOUL.md = AGENTS.md = Runtime > 記憶 > 資料 > 関連する過去の発言
         """
-        parts = []
+        prefix, volatile = self.build_prompt_parts(query)
+        return join_sections([prefix, volatile])
 
-        # Core identity
-        soul = self._load_file("SOUL.md")
-        if soul:
-            parts.append(soul)
+    def build_prompt_parts(self, query: str | None = None) -> tuple[str, str]:
+        """
+        system promptを (安定したprefix, 変わる後半) に分けて組み立てる。
+        prefixには時刻や記憶など毎ターン変わりうるものを入れない。
+        queryには今のユーザー発言を渡す（関連する過去の発言の検索に使う）。
+        セクション毎のトークン数はsection_tokensに残す。
+        """
+        prefix = self._static_prefix()
 
-        # Behavioral guidelines
-        agents = self._load_file("AGENTS.md")
-        if agents:
-            parts.append(agents)
+        volatile: list[tuple[str, str | None]] = []
 
-        # Honcho persistent memory
+        # Persistent memory (Honcho / SQLite)
         if self.memory:
-            memory_text = self._get_memory_text()
-            if memory_text:
-                parts.append(memory_text)
+            volatile.append(("memory", self._get_memory_text()))
+            volatile.append(("recall", self._get_recall_text(query) if query else None))
         else:
             # Fallback: ローカルMEMORY.md
             local_memory = self._load_file("memory/MEMORY.md")
             if local_memory:
-                parts.append(f"# Long-term Memory\n\n{local_memory}")
+                volatile.append(("MEMORY.md", f"# Long-term Memory\n\n{local_memory}"))
+
+        # 今の発言に関係する資料のチャンク
+        volatile.append(("docs", self._get_docs_text(query) if query else None))
+
+        # Runtime context（変わる部分）
+        volatile.append(("time", self._volatile_runtime_context()))
 
-        # Runtime context
-        parts.append(self._runtime_context())
+        # 予算に収める（prefixは削らない。後半を優先度の低い順に削る）
+        budget = MAX_SYSTEM_PROMPT_TOKENS - sum(self._static_tokens.values())
+        volatile, self.cut_tokens = allocate_sections(volatile, budget)
 
-        return "\n\n---\n\n".join(parts)
+        self.section_tokens = dict(self._static_tokens)
+        self.section_tokens.update((name, section_tokens(text)) for name, text in volatile if text)
+        return prefix, join_sections([text for _, text in volatile])
+
+    @property
+    def static_section_names(self) -> list[str]:
+        """prefixに入っているセクション名"""
+        return list(self._static_tokens)
+
+    def _static_prefix(self) -> str:
+        """
+        prefix（SOUL.md, AGENTS.md, 静的な実行環境情報）。
+        ファイルのmtimeとサイズが変わらなければ、前回組み立てたものをそのまま返す。
+        """
+        sections = [
+            ("SOUL.md", self._load_file("SOUL.md")),  # Core identity
+            ("AGENTS.md", self._load_file("AGENTS.md")),  # Behavioral guidelines
+        ]
+        key = tuple(self._file_cache.get(name, (None,))[0] for name, _ in sections)
+        if key == self._static_key:
+            return self._static_prefix_text
+
+        # AGENTS.mdが大きくなったら丸ごとは入れず、資料として分割検索する
+        agents = sections[1][1]
+        self._agents_inline = not agents or count_tokens(agents) <= AGENTS_INLINE_TOKENS
+        if not self._agents_inline:
+            sections[1] = ("AGENTS.md", None)
+
+        sections.append(("runtime", self._static_runtime_context()))
+        self._static_key = key
+        self._static_prefix_text = join_sections([text for _, text in sections])
+        self._static_tokens = {name: count_tokens(text) for name, text in sections if text}
+        return self._static_prefix_text
 
     def _get_memory_text(self) -> str | None:
-        """Honchoの記憶テキストを取得（初回のみ、以降はキャッシュ）"""
+        """Honchoの記憶テキストを取得（Memory側のキャッシュから。古ければ裏で取り直される）"""
         if not self.memory:
             return None
 
-        if not self._memory_loaded:
-            self._memory_loaded = True
-            try:
-                self._cached_memory_text = self.memory.get_context_for_prompt()
-            except Exception as e:
-                print(f"[Context] memory load error: {e}")
-                self._cached_memory_text = None
+        try:
+            return self.memory.get_context_for_prompt()
+        except Exception as e:
+            print(f"[Context] memory load error: {e}")
+            return None
+
+    def _get_recall_text(self, query: str) -> str | None:
+        """今の発言に関係する過去の発言（今のセッション以外）を、関連の強い順に予算内で"""
+        self.last_recall = []
+        try:
+            hits = self.memory.search(query, limit=RECALL_TOP_K, exclude_session=self.memory.session_id)
+        except Exception as e:
+            print(f"[Context] recall error: {e}")
+            return None
+
+        lines = []
+        used = 0
+        for hit in hits:
+            role = "創造者" if hit["peer"] == self.memory.creator_name else "YUI"
+            day = datetime.fromtimestamp(hit["created_at"]).strftime("%Y-%m-%d")
+            content = clip_to_tokens(" ".join(hit["content"].split()), RECALL_PASSAGE_TOKENS)
+            line = f"- [{day}] {role}: {content}"
+            tokens = count_tokens(line)
+            if used + tokens > RECALL_MAX_TOKENS:
+                break
+            lines.append(line)
+            used += tokens
+            self.last_recall.append(hit)
+
+        if not lines:
+            return None
+        return "## 関連する過去の会話\n\n" + "\n".join(lines)
+
+    def _get_docs_text(self, query: str) -> str | None:
+        """今の発言に関係する資料のチャンクを、関連の強い順に予算内で"""
+        self.last_docs = []
+        paths = find_markdown(self.workspace / KNOWLEDGE_DIRNAME)
+        if not self._agents_inline:
+            paths.append(self.workspace / "AGENTS.md")
+        if not paths:
+            return None
+
+        try:
+            self.docs.refresh(paths)
+            hits = self.docs.search(query, limit=DOCS_TOP_K)
+        except Exception as e:
+            print(f"[Context] docs error: {e}")
+            return None
+
+        blocks = []
+        used = 0
+        for hit in hits:
+            block = f"[{hit['heading']}]\n{hit['content']}"
+            tokens = count_tokens(block)
+            if used + tokens > DOCS_MAX_TOKENS:
+                continue
+            blocks.append(block)
+            used += tokens
+            self.last_docs.append(hit)
 
-        return self._cached_memory_text
+        if not blocks:
+            return None
+        return "# 関係する資料\n\n" + "\n\n".join(blocks)
 
     def refresh_memory(self):
-        """記憶キャッシュを更新（/refreshコマンド用）"""
-        self._memory_loaded = False
-        self._cached_memory_text = None
+        """記憶キャッシュを捨て、次のターンで取り直す（/refreshコマンド用）"""
+        if self.memory:
+            self.memory.context_cache.invalidate()
 
     def _load_file(self, relative_path: str) -> str | None:
-        """workspaceからMarkdownファイルを読み込む"""
+        """workspaceからMarkdownファイルを読み込む（mtimeとサイズが同じならキャッシュから）"""
         path = self.workspace / relative_path
-        if path.exists():
-            return path.read_text(encoding="utf-8").strip()
-        return None
+        try:
+            stat = path.stat()
+        except OSError:
+            self._file_cache.pop(relative_path, None)
+            return None
 
-    def _runtime_context(self) -> str:
-        """実行時コンテキスト（日時、環境情報など）"""
-        now = datetime.now()
-        memory_status = "Honcho (persistent)" if self.memory else "Local files only"
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._file_cache.get(relative_path)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        text = path.read_text(encoding="utf-8").strip()
+        self._file_cache[relative_path] = (signature, text)
+        return text
+
+    def _static_runtime_context(self) -> str:
+        """実行時コンテキストのうち、セッション中に変わらないもの"""
+        memory_status = f"{self.memory.name} (persistent)" if self.memory else "Local files only"
         return f"""# Runtime Context
-- Current time: {now.strftime("%Y-%m-%d %H:%M:%S")}
 - Workspace: {self.workspace}
 - Memory: {memory_status}
 - Available tools: Use tool calls to take actions."""
+
+    def _volatile_runtime_context(self) -> str:
+        """実行時コンテキストのうち、変わるもの（時刻は時間単位に丸める）"""
+        now = datetime.now()
+        return f"""# Current Time
+- {now.strftime("%Y-%m-%d %H")}時台"""
+
+
+def allocate_sections(
+    sections: list[tuple[str, str | None]],
+    budget: int,
+) -> tuple[list[tuple[str, str | None]], dict[str, int]]:
+    """
+    セクションを予算に収める。
+      1. 上限のあるセクションは上限まで切り詰める
+      2. それでも予算を超えたら、優先度の低いセクションから削る（入りきらなければ丸ごと外す）
+    優先度0のセクションは削らない。
+    戻り値: (収めたセクション, セクション毎に削ったトークン数)
+    """
+    sized: list[list] = []
+    cut: dict[str, int] = {}
+    for name, text in sections:
+        if not text:
+            sized.append([name, text, 0])
+            continue
+        tokens = section_tokens(text)
+        priority, cap = SECTION_BUDGETS.get(name, (0, None))
+        if priority and cap is not None and tokens > cap:
+            text = clip_section(text, cap)
+            cut[name] = tokens - section_tokens(text)
+            tokens = section_tokens(text)
+        sized.append([name, text, tokens])
+
+    over = sum(tokens for _, _, tokens in sized) - budget
+    order = sorted(
+        (i for i, (name, text, _) in enumerate(sized) if text and SECTION_BUDGETS.get(name, (0, None))[0]),
+        key=lambda i: -SECTION_BUDGETS[sized[i][0]][0],
+    )
+    for i in order:
+        if over <= 0:
+            break
+        name, text, tokens = sized[i]
+        keep = tokens - over
+        # 見出しだけ残っても意味がないので、小さくなりすぎるなら外す
+        new_text = clip_section(text, keep) if keep >= 50 else None
+        new_tokens = section_tokens(new_text) if new_text else 0
+        cut[name] = cut.get(name, 0) + tokens - new_tokens
+        over -= tokens - new_tokens
+        sized[i] = [name, new_text, new_tokens]
+
+    return [(name, text) for name, text, _ in sized], cut
+
+
+def clip_section(text: str, max_tokens: int) -> str:
+    """セクションを先頭から上限まで残し、削ったことが分かるようにする"""
+    marker = "\n…（予算のため省略）"
+    clipped = clip_to_tokens(text, max(1, max_tokens - count_tokens(marker)))
+    # 行の途中で切れないよう、半分以上残るなら最後の改行まで戻す
+    newline = clipped.rfind("\n")
+    if newline > len(clipped) // 2:
+        clipped = clipped[:newline]
+    return clipped.rstrip() + marker
+
+
+@lru_cache(maxsize=64)
+def section_tokens(text: str) -> int:
+    """セクションのトークン数（記憶など毎ターン同じ内容は数え直さない）"""
+    return count_tokens(text)
+
+
+def join_sections(sections: list[str]) -> str:
+    """プロンプトのセクションを区切り線でつなぐ"""
+    return "\n\n---\n\n".join(s for s in sections if s)
+
+
+def prefix_hash(text: str) -> str:
+    """prefixが前のターンと同じかを確認するための短いハッシュ"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
@@ -0,0 +1,193 @@
+"""
+YUi Docs Index - workspaceの資料の分割検索
+
+ガイドラインや知識のMarkdownを毎回丸ごとsystem promptに入れる代わりに、
+見出しごとのチャンクに分けてSQLite FTS5に索引し、今のユーザー発言に関係するチャンクだけを引く。
+  - 索引はディスク上に持ち、mtimeとサイズが変わったファイルだけを索引し直す（増分更新）
+  - 資料が何百ファイルに増えても、プロンプトに入るのは上位k件・予算内だけ
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+from yui.agent.recall import fts_query, segment
+from yui.agent.tokens import count_tokens
+
+CHUNK_MAX_TOKENS = 300  # 1チャンクの上限（長い節は段落で分ける）
+HEADING_RE = re.compile(r"^(#{1,3})\s+(.+?)\s*#*\s*$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    heading TEXT NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_path ON chunks (path);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunk_terms USING fts5(terms, tokenize='unicode61');
+"""
+
+
+def split_markdown(text: str, title: str) -> list[tuple[str, str]]:
+    """
+    Markdownを見出し（#〜###）ごとに分ける。コードブロック内の#は見出しとみなさない。
+    戻り値: [(見出しのパス, 本文), ...]  例: ("AGENTS.md > Tools > shell", "...")
+    """
+    chunks: list[tuple[str, str]] = []
+    trail: list[str] = []
+    lines: list[str] = []
+    in_code = False
+
+    def close():
+        body = "\n".join(lines).strip()
+        if body:
+            heading = " > ".join([title] + trail)
+            chunks.extend((heading, part) for part in _split_long(body))
+        lines.clear()
+
+    for line in text.splitlines():
+        if line.lstrip().startswith("```"):
+            in_code = not in_code
+        match = None if in_code else HEADING_RE.match(line)
+        if match:
+            close()
+            level = len(match.group(1))
+            trail[level - 1:] = [match.group(2)]
+        lines.append(line)
+    close()
+    return chunks
+
+
+def _split_long(body: str) -> list[str]:
+    """CHUNK_MAX_TOKENSを超える節を段落の切れ目で分ける"""
+    if count_tokens(body) <= CHUNK_MAX_TOKENS:
+        return [body]
+    parts: list[str] = []
+    current: list[str] = []
+    used = 0
+    for paragraph in re.split(r"\n\s*\n", body):
+        tokens = count_tokens(paragraph)
+        if current and used + tokens > CHUNK_MAX_TOKENS:
+            parts.append("\n\n".join(current))
+            current, used = [], 0
+        current.append(paragraph)
+        used += tokens
+    if current:
+        parts.append("\n\n".join(current))
+    return parts
+
+
+class DocIndex:
+    def __init__(self, workspace: Path, db_path: Path):
+        self.workspace = workspace
+        self.db_path = db_path
+        self.stats = {"files": 0, "chunks": 0, "reindexed": 0}
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def refresh(self, paths: list[Path]):
+        """
+        索引をpathsのファイルに合わせる。
+        mtimeかサイズが変わったファイルだけを索引し直し、なくなったファイルは索引から消す。
+        """
+        current: dict[str, tuple[Path, int, int]] = {}
+        for path in paths:
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            current[path.relative_to(self.workspace).as_posix()] = (path, stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            indexed = {
+                row[0]: (row[1], row[2])
+                for row in self._db.execute("SELECT path, mtime_ns, size FROM files")
+            }
+            changed = False
+            for rel in indexed.keys() - current.keys():
+                self._remove(rel)
+                changed = True
+            for rel, (path, mtime_ns, size) in current.items():
+                if indexed.get(rel) == (mtime_ns, size):
+                    continue
+                try:
+                    text = path.read_text(encoding="utf-8")
+                except (OSError, UnicodeDecodeError) as e:
+                    print(f"[Docs] read error: {e}")
+                    continue
+                self._remove(rel)
+                self._add(rel, mtime_ns, size, text)
+                self.stats["reindexed"] += 1
+                changed = True
+            if changed:
+                self._db.commit()
+            self.stats["files"] = len(current)
+            self.stats["chunks"] = self._db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def _remove(self, rel: str):
+        ids = [row[0] for row in self._db.execute("SELECT id FROM chunks WHERE path = ?", (rel,))]
+        self._db.executemany("DELETE FROM chunk_terms WHERE rowid = ?", [(i,) for i in ids])
+        self._db.execute("DELETE FROM chunks WHERE path = ?", (rel,))
+        self._db.execute("DELETE FROM files WHERE path = ?", (rel,))
+
+    def _add(self, rel: str, mtime_ns: int, size: int, text: str):
+        self._db.execute(
+            "INSERT INTO files (path, mtime_ns, size) VALUES (?, ?, ?)",
+            (rel, mtime_ns, size),
+        )
+        for heading, content in split_markdown(text, rel):
+            cursor = self._db.execute(
+                "INSERT INTO chunks (path, heading, content) VALUES (?, ?, ?)",
+                (rel, heading, content),
+            )
+            # 見出しも検索の手がかりにする
+            self._db.execute(
+                "INSERT INTO chunk_terms (rowid, terms) VALUES (?, ?)",
+                (cursor.lastrowid, " ".join(segment(f"{heading}\n{content}"))),
+            )
+
+    def search(self, query: str, limit: int = 4) -> list[dict]:
+        """関係するチャンクをBM25順で返す: [{path, heading, content, score}, ...]"""
+        match = fts_query(query)
+        if not match:
+            return []
+        try:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT c.path, c.heading, c.content, bm25(chunk_terms) AS score "
+                    "FROM chunk_terms JOIN chunks c ON c.id = chunk_terms.rowid "
+                    "WHERE chunk_terms MATCH ? ORDER BY score LIMIT ?",
+                    (match, limit),
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"[Docs] search error: {e}")
+            return []
+        return [{"path": r[0], "heading": r[1], "content": r[2], "score": r[3]} for r in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def find_markdown(root: Path) -> list[Path]:
+    """root以下のMarkdownファイル（隠しディレクトリは除く）"""
+    found: list[Path] = []
+    if not root.is_dir():
+        return found
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        found.extend(Path(dirpath) / name for name in sorted(filenames) if name.endswith(".md"))
+    return found
@@ -0,0 +1,92 @@
+"""
+YUi LLM Cache - LLM応答のディスクキャッシュ
+
+_call_llm の前段に置く、内容アドレス型のキャッシュ。
+キーは model / messages / tools / max_tokens / extra_body（Geminiのcached content名など）のハッシュ。値はアシスタントメッセージ(dict)。
+
+モード (YUI_LLM_CACHE):
+  - off    : 使わない
+  - on     : 読み書きする（TTL切れは無視）。既定
+  - record : 毎回LLMを呼び、応答を全て記録する
+  - replay : 記録済みの応答だけを返す。ミスはエラー（オフラインで決定的に再生できる）
+容量はmax_bytesを超えたら最終アクセスが古いものから消す（LRU。置き場の管理はDiskLRU）。
+"""
+
+import hashlib
+import json
+import time
+from pathlib import Path
+
+from yui.disk_cache import DiskLRU
+
+MODES = ("off", "on", "record", "replay")
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+
+
+class LLMCache:
+    def __init__(
+        self,
+        directory: Path,
+        mode: str = "on",
+        ttl: float = DEFAULT_TTL_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown LLM cache mode '{mode}' (expected one of {', '.join(MODES)})")
+        self.directory = directory
+        self.mode = mode
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self.store = DiskLRU(directory, max_bytes, self.stats, "LLMCache")
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def key(self, request: dict) -> str:
+        """リクエストのハッシュ（応答に影響するフィールドのみ）"""
+        material = {
+            "model": request.get("model"),
+            "messages": request.get("messages"),
+            "tools": request.get("tools"),
+            "max_tokens": request.get("max_tokens"),
+        }
+        if request.get("extra_body"):
+            # cached contentを使うとsystem promptのprefixはmessagesに入らないので、その名前でキーを分ける
+            # （ないときはキーに含めない。既存のキャッシュのキーを変えないため）
+            material["extra_body"] = request["extra_body"]
+        blob = json.dumps(material, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def get(self, request: dict) -> dict | None:
+        """キャッシュされたアシスタントメッセージを返す。replayモードでミスしたらRuntimeError。"""
+        if self.mode in ("off", "record"):
+            return None
+
+        key = self.key(request)
+        entry = self.store.read(key)
+
+        if entry and self.mode == "on" and time.time() - entry.get("created", 0) > self.ttl:
+            entry = None
+
+        if entry is None:
+            self.stats["misses"] += 1
+            if self.mode == "replay":
+                raise RuntimeError(f"[LLMCache] replay miss: no recorded response for {key[:12]}")
+            return None
+
+        self.stats["hits"] += 1
+        self.store.touch(key)  # LRU用に最終アクセスを更新
+        return entry["message"]
+
+    def put(self, request: dict, message: dict):
+        """アシスタントメッセージを保存"""
+        if self.mode not in ("on", "record"):
+            return
+
+        self.store.write(
+            self.key(request),
+            {"created": time.time(), "model": request.get("model"), "message": message},
+        )
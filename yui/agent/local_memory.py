@@ -0,0 +1,170 @@
+"""
+YUi Local Memory - SQLiteによるローカルの永続記憶
+
+Honchoなしでも会話の保存・検索・復元ができるよう、Memoryと同じインターフェースを
+SQLite (WALモード) + FTS5 の全文検索 (MessageIndex) で実装する。
+  - 保存・復元・検索は全てローカルで完結（ネットワークなし、待ち時間ほぼゼロ）
+  - mirrorにMemory (Honcho) を渡すと、書き込みをバックグラウンドでHonchoにも複製する
+"""
+
+from pathlib import Path
+
+from yui.agent.memory import (
+    CONTEXT_REFRESH_SECONDS,
+    CONTEXT_REFRESH_TURNS,
+    FLUSH_TIMEOUT_SECONDS,
+    ContextCache,
+    Memory,
+    new_session_id,
+)
+from yui.agent.recall import MessageIndex
+
+
+class LocalMemory:
+    name = "SQLite"
+    remote = False
+
+    def __init__(
+        self,
+        db_path: Path,
+        creator_name: str = "creator",
+        agent_name: str = "yui",
+        notes_path: Path | None = None,
+        mirror: Memory | None = None,
+        context_ttl: float = CONTEXT_REFRESH_SECONDS,
+        context_refresh_turns: int = CONTEXT_REFRESH_TURNS,
+        prompt_mode: str = "card",
+    ):
+        self.db_path = db_path
+        self.creator_name = creator_name
+        self.agent_name = agent_name
+        self.notes_path = notes_path  # 手書きの長期記憶 (memory/MEMORY.md)
+        self.mirror = mirror
+        self.prompt_mode = prompt_mode  # ローカルでは手書きの長期記憶がカード代わりなのでどちらも同じ
+        if mirror:
+            self.name = "SQLite+Honcho"
+
+        self.session_id: str | None = None
+
+        self.index = MessageIndex(db_path)
+
+        self.context_cache = ContextCache(
+            self._get_local_context,
+            ttl=context_ttl,
+            refresh_turns=context_refresh_turns,
+        )
+
+    # --- セッション ---
+
+    def start_session(self, session_id: str | None = None, lazy: bool = False) -> str:
+        """新しい会話セッションを開始する（ローカルなので常にすぐ返る）"""
+        self.session_id = session_id or new_session_id()
+        if self.mirror:
+            self.mirror.start_session(self.session_id, lazy=True)
+        return self.session_id
+
+    def ensure_session(self):
+        """Memoryとの互換用（ローカルでは何もしない）"""
+        return self.session_id
+
+    def read_latest_session_id(self) -> str | None:
+        """メッセージが保存された直近のセッションID"""
+        return self.index.latest_session_id()
+
+    # --- 保存 ---
+
+    def store_user_message(self, content: str) -> None:
+        """ユーザーのメッセージを保存"""
+        self._store(self.creator_name, content)
+        self.context_cache.tick()
+        if self.mirror:
+            self.mirror.store_user_message(content)
+
+    def store_agent_message(self, content: str) -> None:
+        """YUiの応答を保存"""
+        self._store(self.agent_name, content)
+        if self.mirror:
+            self.mirror.store_agent_message(content)
+
+    def _store(self, peer: str, content: str):
+        if not self.session_id:
+            self.start_session()
+        self.index.add(self.session_id, peer, content)
+
+    def flush(self, timeout: float = FLUSH_TIMEOUT_SECONDS) -> bool:
+        """ミラー先への未送信分を書き出す（ローカルは保存済み）"""
+        if self.mirror:
+            return self.mirror.flush(timeout)
+        return True
+
+    def close(self):
+        """ミラー先への未送信分を書き出して閉じる"""
+        if self.mirror:
+            self.mirror.close()
+        self.index.close()
+
+    # --- 読み出し ---
+
+    def get_past_messages_openai(self, session_id: str | None = None, limit: int = 10) -> list[dict]:
+        """直近（またはsession_idの）セッションの末尾limit件をOpenAI形式で返す"""
+        session_id = session_id or self.read_latest_session_id()
+        if not session_id:
+            return []
+        return [
+            {"role": "assistant" if peer == self.agent_name else "user", "content": content}
+            for peer, content in self.index.tail(session_id, limit)
+        ]
+
+    def search(self, query: str, limit: int = 5, exclude_session: str | None = None) -> list[dict]:
+        """過去の発言の全文検索（MessageIndex.search）"""
+        return self.index.search(query, limit=limit, exclude_session=exclude_session)
+
+    def get_context_for_prompt(self, fresh: bool = False) -> str:
+        """system promptに埋め込むための記憶テキスト（Memoryと同じ形）"""
+        ctx_text = self.context_cache.refresh() if fresh else self.context_cache.get()
+        if not ctx_text:
+            return ""
+        return "# YUIの永続記憶\n\n" + ctx_text
+
+    def recall(self) -> str:
+        """長期記憶と、前回のセッションの最後のやりとり（memory toolのrecall用）"""
+        parts = []
+        notes = self._get_local_context()
+        if notes:
+            parts.append(notes)
+
+        previous = self.index.latest_session_id()
+        if previous == self.session_id:
+            previous = None
+        if previous:
+            lines = []
+            for peer, content in self.index.tail(previous, 10):
+                role = "創造者" if peer == self.creator_name else "YUI"
+                lines.append(f"  {role}: {content[:200]}")
+            parts.append("**前回のやりとり:**\n" + "\n".join(lines))
+
+        return "# YUIの永続記憶\n\n" + "\n\n".join(parts) if parts else ""
+
+    def search_remote(self, query: str, limit: int = 5) -> list[dict]:
+        """ミラー先（Honcho）の検索。ミラーがなければ空。"""
+        return self.mirror.search_remote(query, limit=limit) if self.mirror else []
+
+    def _get_local_context(self) -> str | None:
+        """手書きの長期記憶（過去の会話は関連するものだけをContextBuilderが検索して入れる）"""
+        if not self.notes_path or not self.notes_path.exists():
+            return None
+        notes = self.notes_path.read_text(encoding="utf-8").strip()
+        if not notes:
+            return None
+        return f"## ローカル記憶\n\n**長期記憶:**\n{notes}"
+
+    def ask_about_creator(self, question: str) -> str:
+        """創造者について問い合わせる（ミラーがなければ全文検索の結果を返す）"""
+        if self.mirror:
+            return self.mirror.ask_about_creator(question)
+        hits = self.search(question, limit=5)
+        if not hits:
+            return "まだ十分な情報がありません。"
+        return "\n".join(
+            f"- {'創造者' if h['peer'] == self.creator_name else 'YUI'}: {h['content'][:300]}" for h in hits
+        )
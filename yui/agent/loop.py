@@ -5,33 +5,74 @@ LLM呼び出し → Tool実行 → 結果反映 のサイクルを最大MAX_ITER
 Gemini API (OpenAI SDK互換エンドポイント) を使用。
 
 コスト最適化:
-  - 会話履歴をMAX_CONTEXT_MESSAGESに制限（古いものは切り捨て）
+  - 会話履歴をMAX_CONTEXT_TOKENSのトークン予算に制限（古いものから切り捨て。tool_callsとtool結果は分割しない）
+  - 切り捨てた会話はバックグラウンドで要約に畳み込む（ConversationCompactor）
+  - 同一リクエストの応答はディスクキャッシュから返す（LLMCache。record/replayで再生も可能）
+  - system promptのprefixをバイト単位で安定させ、プロバイダ側のプロンプトキャッシュを効かせる
   - Tool結果をMAX_TOOL_RESULT_CHARSに切り詰め
   - max_tokensを適正値に
   - Honchoの起動時Dialecticを廃止（コスト高）
 起動速度最適化:
   - Honcho Peerを遅延初期化
   - ブートステータスでUI更新
+  - クライアント生成・過去の会話の復元・新セッション開始を並行に実行
+  - 前回の会話と記憶テキストをローカルのスナップショットから即座に復元し、
+    Honchoとの突き合わせはバックグラウンドで行う（内訳はboot_metrics）
+実行速度最適化:
+  - 1回の応答に含まれる複数のtool_callsを並列実行（ToolExecutor）
+  - run_stream()でトークンを届いた順に返す（TTFTをターン毎に記録）
+  - 本体はasyncio (arun)。LLM・Tool・記憶の保存がイベントループをブロックしないので、
+    1プロセスで複数の会話を並行に扱える。run()はその同期ラッパー
 """
 
+import asyncio
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Callable
-
-from openai import OpenAI
-
-from yui.config import get_gemini_api_key, get_honcho_api_key, get_honcho_base_url
-from yui.agent.context import ContextBuilder
+from typing import Any, AsyncIterator, Callable, Iterator
+
+from openai import AsyncOpenAI
+
+from yui.config import (
+    get_gemini_api_key,
+    get_gemini_cached_content,
+    get_honcho_api_key,
+    get_honcho_base_url,
+    get_llm_cache_dir,
+    get_llm_cache_mode,
+    get_memory_backend,
+    get_memory_prompt_mode,
+    get_memory_refresh_seconds,
+    get_memory_refresh_turns,
+    get_tool_max_workers,
+    use_exact_tokenizer,
+    use_memory_mirror,
+    use_recall_embeddings,
+)
+from yui.agent.compaction import MAX_SUMMARY_TOKENS, ConversationCompactor
+from yui.agent.context import ContextBuilder, join_sections, prefix_hash, section_tokens
+from yui.agent.llm_cache import LLMCache
+from yui.agent.local_memory import LocalMemory
 from yui.agent.memory import Memory
+from yui.agent.recall import use_embeddings
+from yui.agent.snapshot import is_stale, load_snapshot, save_snapshot
+from yui.agent.tokens import message_tokens, trim_to_budget, use_tiktoken
+from yui.tools.executor import ToolExecutor
+from yui.tools.memory_tool import MemoryTool
 from yui.tools.registry import ToolRegistry
 
 MAX_ITERATIONS = 10  # 20→10 に削減（暴走防止）
-MAX_CONTEXT_MESSAGES = 12  # 会話履歴の最大メッセージ数
+MAX_CONTEXT_TOKENS = 8000  # 会話履歴のトークン予算
 MAX_TOOL_RESULT_CHARS = 3000  # Tool結果の最大文字数
 DEFAULT_MODEL = "gemini-3-flash-preview"
 GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
 
 WORKSPACE_DIR = Path.home() / "Workspace" / "YUi" / "workspace"
+STATE_DIRNAME = ".yui"  # ワークスペース内のローカル状態（キャッシュなど）
+SNAPSHOT_FILENAME = "snapshot.json"  # 前回の会話のスナップショット（起動を速くする）
+LOCAL_MEMORY_FILENAME = "memory.db"  # ローカル記憶 (SQLite)
 
 
 class AgentLoop:
@@ -43,62 +84,196 @@ class AgentLoop:
     ):
         self.model = model
         self.workspace = workspace
+        self.state_dir = workspace / STATE_DIRNAME
         self._boot_status = on_boot_status
 
         # ステータスコールバック: (kind, text) を受け取る関数
         # kind: "thinking" | "tool" | "done"
         self.on_status: Callable | None = None
 
-        self._emit_boot("Gemini API 準備中...")
-        self.client = OpenAI(
-            api_key=get_gemini_api_key(),
-            base_url=GEMINI_BASE_URL,
+        # ターン毎の計測値（時間は秒）
+        #   ttft, total, iterations, stream, trimmed_tokens, cache_hits,
+        #   prefix_hash, prefix_stable（system promptのprefixが前のターンと同一か）,
+        #   recalled（プロンプトに入れた関連する過去の発言の件数）,
+        #   docs（プロンプトに入れた資料のチャンク数）,
+        #   prompt_sections（system promptのセクション毎のトークン数。会話の要約は"summary"）,
+        #   prompt_cut（予算のために削ったトークン数）,
+        #   system_tokens / conversation_tokens（最後のLLM呼び出しでのsystem promptと会話履歴のトークン数）
+        self.turn_metrics: list[dict] = []
+        # 最初のターンが始まったか（_reconcile_snapshotは始まる前だけ会話を差し替える。判定と差し替えはロックの中で）
+        self._turn_started = False
+        self._conversation_lock = threading.Lock()
+
+        # 正確なトークナイザ（任意。なければローカル見積もり）
+        if use_exact_tokenizer() and not use_tiktoken():
+            print("[YUi] tiktoken not installed (using token estimates)")
+
+        # 同期API (run / run_stream) 用の専用イベントループ。
+        # 別スレッドで回し続けるので、要約などのバックグラウンド処理はターンの合間にも進む。
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(
+            target=self._loop.run_forever, name="yui-loop", daemon=True
         )
-
-        # Memory (Honcho) — セッション開始は復元後に行う
-        self._emit_boot("Honcho 接続中...")
-        self.memory = self._init_memory()
-
-        self._emit_boot("ワークスペース読み込み中...")
-        self.context_builder = ContextBuilder(workspace, memory=self.memory)
-        self.tool_registry = ToolRegistry()
-        self.conversation: list[dict] = []
-
-        # 起動時に過去の会話を復元（新セッション開始の前に！）
-        self._emit_boot("記憶を復元中...")
-        self._restore_past_context()
-
-        # 復元完了後に新セッションを開始
-        self._emit_boot("セッション開始...")
-        if self.memory:
-            self.memory.start_session()
-
+        self._loop_thread.start()
+
+        # ブートの内訳（秒）。total以外は各ステップの所要時間
+        self.boot_metrics: dict[str, Any] = {}
+        boot_start = time.perf_counter()
+        self.snapshot_path = self.state_dir / SNAPSHOT_FILENAME
+
+        # ブートは独立したステップを並行に進める
+        with ThreadPoolExecutor(max_workers=4, thread_name_prefix="yui-boot") as boot:
+            self._emit_boot("Gemini API 準備中...")
+            client_future = boot.submit(
+                self._timed, "client",
+                AsyncOpenAI,
+                api_key=get_gemini_api_key(),
+                base_url=GEMINI_BASE_URL,
+            )
+            # 過去の発言の検索を埋め込みモデルで並べ替える（任意。なければBM25のみ）
+            embeddings_future = boot.submit(self._timed, "embeddings", self._init_embeddings) if use_recall_embeddings() else None
+
+            # Memory (Honcho / SQLite)
+            self._emit_boot("記憶を準備中...")
+            self.memory = self._timed("memory_init", self._init_memory)
+            self.conversation: list[dict] = []
+
+            # ローカルのスナップショットがあれば即座に復元し、Honchoとの突き合わせは後回し。
+            # なければ過去の会話の復元と新セッションの開始を並行に。
+            # 直近セッションIDはローカルのポインタから先に読むので、新セッションと取り違えない。
+            # ポインタがなければセッション一覧に頼るので、復元してから新セッションを開始する。
+            self._emit_boot("記憶を復元中...")
+            # （ローカル記憶ならそのまま読めば速いのでスナップショットは使わない）
+            use_snapshot = self.memory is not None and self.memory.remote
+            snapshot = self._timed("snapshot", load_snapshot, self.snapshot_path) if use_snapshot else None
+            previous_session_id = self.memory.read_latest_session_id() if self.memory else None
+            restore_future = session_future = None
+            if snapshot:
+                self.conversation = list(snapshot["conversation"])
+                self.memory.start_session(lazy=True)
+            elif previous_session_id:
+                restore_future = boot.submit(self._timed, "restore", self._restore_past_context, previous_session_id)
+                session_future = boot.submit(self._timed, "session", self.memory.start_session)
+            else:
+                restore_future = boot.submit(self._timed, "restore", self._restore_then_start_session)
+
+            self._emit_boot("ワークスペース読み込み中...")
+            workspace_start = time.perf_counter()
+            # Geminiのcached content（SOUL.md等のprefixから作成済みのもの。任意）
+            self.cached_content = get_gemini_cached_content()
+            self.llm_cache = LLMCache(
+                get_llm_cache_dir() or self.state_dir / "llm_cache",
+                mode=get_llm_cache_mode(),
+            )
+            self.context_builder = ContextBuilder(workspace, memory=self.memory, state_dir=self.state_dir)
+            self.tool_registry = ToolRegistry()
+            if self.memory:
+                # 記憶は必要なときにmemory toolで引く（プロンプトにはPeer Cardだけ）
+                self.tool_registry.register(MemoryTool(self.memory))
+            self.tool_registry.set_progress_callback(
+                lambda name, text: self._emit_status("tool", f"{name} を実行中... {text}")
+            )
+            self.tool_executor = ToolExecutor(self.tool_registry, max_workers=get_tool_max_workers())
+            self.compactor = ConversationCompactor(self._asummarize)
+            if snapshot:
+                if snapshot.get("session_context") is not None:
+                    self.memory.context_cache.seed(snapshot["session_context"])
+                self.compactor.summary = snapshot.get("summary") or ""
+            self.boot_metrics["workspace"] = time.perf_counter() - workspace_start
+
+            self.client = client_future.result()
+            if embeddings_future:
+                embeddings_future.result()
+            if restore_future:
+                restore_future.result()
+            if session_future:
+                session_future.result()
+
+        self.boot_metrics["source"] = "snapshot" if snapshot else (self.memory.name.lower() if self.memory else "none")
+        self.boot_metrics["total"] = time.perf_counter() - boot_start
         self._boot_status = None  # ブート完了
 
+        if snapshot:
+            threading.Thread(
+                target=self._reconcile_snapshot,
+                args=(snapshot, previous_session_id or snapshot.get("session_id")),
+                name="yui-reconcile",
+                daemon=True,
+            ).start()
+
+    def _init_embeddings(self):
+        """埋め込みモデルを読み込む（読み込めなければBM25のみで検索する）"""
+        if not use_embeddings():
+            print("[YUi] Embedding model unavailable (using BM25 recall only)")
+
+    def _timed(self, name: str, fn: Callable, *args, **kwargs) -> Any:
+        """fnを実行し、所要時間をboot_metrics[name]に記録する"""
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.boot_metrics[name] = time.perf_counter() - start
+
     def _emit_boot(self, text: str):
         """ブート中のステータスをUIに通知"""
         if self._boot_status:
             self._boot_status(text)
 
-    def _init_memory(self) -> Memory | None:
-        """Honcho永続記憶を初期化。APIキーがなければスキップ。
-        注意: start_session()はここでは呼ばない。
-        先に過去の会話を復元してから新セッションを開始する。
+    def _init_memory(self) -> Memory | LocalMemory | None:
+        """永続記憶を初期化する。
+        YUI_MEMORY_BACKEND=auto なら、HonchoのAPIキーがあればHoncho、なければローカル (SQLite)。
+        注意: start_session()はここでは呼ばない（過去の会話の復元と合わせてブートで行う）。
         """
+        backend = get_memory_backend()
+        if backend == "off":
+            return None
         honcho_key = get_honcho_api_key()
+        cache_options = {
+            "context_ttl": get_memory_refresh_seconds(),
+            "context_refresh_turns": get_memory_refresh_turns(),
+            "prompt_mode": get_memory_prompt_mode(),
+        }
+
+        if backend == "local" or (backend == "auto" and not honcho_key):
+            mirror = None
+            if honcho_key and use_memory_mirror():
+                mirror = self._init_honcho(honcho_key, mirror=True)
+            try:
+                return LocalMemory(
+                    self.state_dir / LOCAL_MEMORY_FILENAME,
+                    notes_path=self.workspace / "memory" / "MEMORY.md",
+                    mirror=mirror,
+                    **cache_options,
+                )
+            except Exception as e:
+                print(f"[YUi] Local memory init failed (continuing without memory): {e}")
+                return None
+
         if not honcho_key:
+            print("[YUi] YUI_MEMORY_BACKEND=honcho but HONCHO_API_KEY is not set (continuing without memory)")
             return None
+        return self._init_honcho(honcho_key, **cache_options)
+
+    def _init_honcho(self, honcho_key: str, **options) -> Memory | None:
+        """Honcho永続記憶を初期化"""
         try:
-            memory = Memory(
+            return Memory(
                 api_key=honcho_key,
                 base_url=get_honcho_base_url(),
+                state_dir=self.state_dir,
+                **options,
             )
-            return memory
         except Exception as e:
             print(f"[YUi] Honcho init failed (continuing without memory): {e}")
             return None
 
-    def _restore_past_context(self):
+    def _restore_then_start_session(self):
+        """過去の会話を復元してから新セッションを開始する（直近セッションのポインタがない場合）"""
+        self._restore_past_context()
+        if self.memory:
+            self.memory.start_session()
+
+    def _restore_past_context(self, session_id: str | None = None):
         """
         起動時にHonchoから過去の会話コンテキストを復元する。
         これにより、前回の会話の続きが可能になる。
@@ -107,97 +282,301 @@ class AgentLoop:
             return
 
         try:
-            past_messages = self.memory.get_past_messages_openai()
+            past_messages = self.memory.get_past_messages_openai(session_id)
             if past_messages:
                 # OpenAI形式のメッセージを会話履歴に注入
                 self.conversation = past_messages
         except Exception as e:
             print(f"[YUi] Past context restore failed: {e}")
 
-    def _trim_conversation(self):
-        """会話履歴をMAX_CONTEXT_MESSAGESに制限。古いものを切り捨てる。"""
-        if len(self.conversation) > MAX_CONTEXT_MESSAGES:
-            self.conversation = self.conversation[-MAX_CONTEXT_MESSAGES:]
+    def _reconcile_snapshot(self, snapshot: dict, session_id: str | None):
+        """
+        スナップショットから起動した後、バックグラウンドでHonchoと突き合わせる。
+        Honchoの会話の末尾とスナップショットが食い違っていれば（別の端末で話した等）、
+        まだターンが始まっていなければ会話をHonchoのものに置き換える。
+        セッション記憶は取り直す。どちらかが古ければスナップショットを書き直す。
+        """
+        start = time.perf_counter()
+        stale = False
+        try:
+            self.memory.ensure_session()
+            past_messages = self.memory.get_past_messages_openai(session_id) if session_id else []
+            stale = is_stale(snapshot["conversation"], past_messages)
+            with self._conversation_lock:
+                if stale and not self._turn_started:
+                    self.conversation = past_messages
+
+            # 記憶テキストはsystem promptの後半に入るので、ターン中に差し替えてもprefixは崩れない
+            if self.memory.context_cache.refresh() != snapshot.get("session_context"):
+                stale = True
+
+            if stale:
+                self.save_snapshot()
+        except Exception as e:
+            print(f"[YUi] Snapshot reconcile failed: {e}")
+        self.boot_metrics["reconcile"] = time.perf_counter() - start
+        self.boot_metrics["snapshot_stale"] = stale
+
+    def save_snapshot(self):
+        """現在の会話・セッション記憶・要約をローカルのスナップショットに保存（次回の起動用）"""
+        if not self.memory or not self.memory.remote:
+            return
+        save_snapshot(
+            self.snapshot_path,
+            self.memory.session_id,
+            self.conversation,
+            self.memory.context_cache.value,
+            self.compactor.summary,
+        )
+
+    def _trim_conversation(self) -> int:
+        """
+        会話履歴をMAX_CONTEXT_TOKENSに制限。古いものを切り捨てる。
+        assistantのtool_callsと対応するtoolメッセージは一緒に残すか一緒に捨てる。
+        捨てたトークン数を返す。
+        """
+        kept, dropped, dropped_tokens = trim_to_budget(self.conversation, MAX_CONTEXT_TOKENS)
+        if dropped:
+            self.conversation = kept
+            # 捨てた会話は要約に畳み込む（バックグラウンド）
+            self.compactor.submit(dropped)
+        return dropped_tokens
+
+    async def _asummarize(self, summary: str, transcript: str) -> str:
+        """ConversationCompactor用: 既存の要約に溢れた会話を畳み込んだ要約をLLMで作る"""
+        prompt = (
+            "あなたは会話の要約係です。以下の「これまでの要約」に「新しい会話」の内容を統合し、"
+            f"日本語で{MAX_SUMMARY_TOKENS}トークン以内の箇条書きの要約を書き直してください。"
+            "ユーザーについての事実、決まったこと、進行中の作業、約束を優先して残してください。"
+            "要約だけを出力してください。\n\n"
+            f"## これまでの要約\n{summary or '(なし)'}\n\n"
+            f"## 新しい会話\n{transcript}"
+        )
+        message = await self._acomplete({
+            "model": self.model,
+            "max_tokens": MAX_SUMMARY_TOKENS * 2,
+            "messages": [{"role": "user", "content": prompt}],
+        })
+        return message["content"]
+
+    # --- 同期API（CLI用の薄いラッパー） ---
 
     def run(self, user_message: str) -> str:
         """
         ユーザーメッセージを受け取り、Agent Loopを回して最終応答を返す。
+        arun()の同期ラッパー。
+        """
+        return self._run_sync(self.arun(user_message))
+
+    def run_stream(self, user_message: str) -> Iterator[tuple[str, Any]]:
+        """
+        ストリーミング版のrun()。LLMの出力を届いた順にイベントとしてyieldする。
+          ("content", str)    — 応答テキストの差分
+          ("tool_call", dict) — tool_callの断片 {index, id, name, arguments}
+          ("done", str)       — 最終応答
+        arun_stream()の同期ラッパー。
+        """
+        events = self.arun_stream(user_message)
+        try:
+            while True:
+                try:
+                    yield self._run_sync(events.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            try:
+                self._run_sync(events.aclose())
+            except RuntimeError:
+                pass
+
+    def _run_sync(self, coro: Any) -> Any:
         """
+        専用イベントループ（別スレッド）でコルーチンを実行し、結果を待つ。
+        AsyncOpenAIのコネクションはループに紐づくので、毎回asyncio.run()はしない。
+        Ctrl+Cなどで中断されたら、タスクをキャンセルし、止まるのを待ってから例外を伝える。
+        """
+        finished = threading.Event()
+
+        async def runner():
+            try:
+                return await coro
+            finally:
+                finished.set()
+
+        future = asyncio.run_coroutine_threadsafe(runner(), self._loop)
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            finished.wait(timeout=5)
+            raise
+
+    # --- 非同期API ---
+
+    async def arun(self, user_message: str) -> str:
+        """
+        ユーザーメッセージを受け取り、Agent Loopを回して最終応答を返す。
+        1つのAgentLoopは1会話。複数のAgentLoopを同じイベントループで並行に動かせる。
+        """
+        final_response = ""
+        async for kind, payload in self._arun_events(user_message, stream=False):
+            if kind == "done":
+                final_response = payload
+        return final_response
+
+    async def arun_stream(self, user_message: str) -> AsyncIterator[tuple[str, Any]]:
+        """arun()のストリーミング版。イベントはrun_stream()と同じ。"""
+        async for event in self._arun_events(user_message, stream=True):
+            yield event
+
+    async def _arun_events(self, user_message: str, stream: bool) -> AsyncIterator[tuple[str, Any]]:
+        """Agent Loop本体。run() / run_stream() / arun() / arun_stream() の共通実装。"""
+        turn_start = time.perf_counter()
+        metrics = {
+            "ttft": None,
+            "total": None,
+            "iterations": 0,
+            "stream": stream,
+            "trimmed_tokens": 0,
+            "cache_hits": 0,
+        }
+        self.turn_metrics.append(metrics)
+
+        with self._conversation_lock:
+            self._turn_started = True  # これ以降_reconcile_snapshotは会話を差し替えない
         self.conversation.append({"role": "user", "content": user_message})
-        self._trim_conversation()
+        metrics["trimmed_tokens"] = self._trim_conversation()
 
-        # Honchoにユーザーメッセージを保存
+        # Honchoにユーザーメッセージを保存（write-behind。待たない）
         if self.memory:
-            try:
-                self.memory.store_user_message(user_message)
-            except Exception as e:
-                print(f"[Memory] store error: {e}")
+            self._store_message("user", user_message)
 
-        system_prompt = self.context_builder.build_system_prompt()
+        prompt_prefix, prompt_volatile = await asyncio.to_thread(
+            self.context_builder.build_prompt_parts, user_message
+        )
+        metrics["recalled"] = len(self.context_builder.last_recall)
+        metrics["docs"] = len(self.context_builder.last_docs)
+        metrics["prompt_sections"] = dict(self.context_builder.section_tokens)
+        metrics["prompt_cut"] = dict(self.context_builder.cut_tokens)
         tools = self.tool_registry.get_tool_schemas()
 
+        # prefixがターンを跨いで同一か（プロンプトキャッシュが効くか）を記録
+        metrics["prefix_hash"] = prefix_hash(prompt_prefix)
+        previous = self.turn_metrics[-2].get("prefix_hash") if len(self.turn_metrics) > 1 else None
+        metrics["prefix_stable"] = previous == metrics["prefix_hash"] if previous else None
+
         for iteration in range(MAX_ITERATIONS):
             self._emit_status("thinking", "考え中...")
-            response = self._call_llm(system_prompt, tools)
-            message = response.choices[0].message
+            metrics["iterations"] = iteration + 1
+
+            request = self._llm_kwargs(prompt_prefix, prompt_volatile, tools)
+            self._record_prompt_tokens(metrics)
+            message = self.llm_cache.get(request)
+            if message is not None:
+                # キャッシュヒット: ストリーミングでも一括で返す
+                metrics["cache_hits"] += 1
+                if metrics["ttft"] is None:
+                    metrics["ttft"] = time.perf_counter() - turn_start
+                if stream and message["content"]:
+                    yield "content", message["content"]
+            elif stream:
+                async for kind, payload in self._astream_llm(request, metrics, turn_start):
+                    if kind == "message":
+                        message = payload
+                    else:
+                        yield kind, payload
+                self.llm_cache.put(request, message)
+            else:
+                message = await self._acall_llm(request)
+                if metrics["ttft"] is None:
+                    metrics["ttft"] = time.perf_counter() - turn_start
+                self.llm_cache.put(request, message)
 
             # アシスタントメッセージを会話に追加
-            assistant_msg = {"role": "assistant", "content": message.content or ""}
-            if message.tool_calls:
-                assistant_msg["tool_calls"] = [
-                    {
-                        "id": tc.id,
-                        "type": "function",
-                        "function": {
-                            "name": tc.function.name,
-                            "arguments": tc.function.arguments,
-                        },
-                    }
-                    for tc in message.tool_calls
-                ]
-            self.conversation.append(assistant_msg)
+            self.conversation.append(message)
+            tool_calls = message.get("tool_calls")
 
             # Tool呼び出しがなければ最終応答
-            if not message.tool_calls:
-                final_response = message.content or ""
+            if not tool_calls:
+                final_response = message["content"]
 
-                # Honchoにエージェント応答を保存
+                # Honchoにエージェント応答を保存（write-behind。待たない）
                 if self.memory:
-                    try:
-                        self.memory.store_agent_message(final_response)
-                    except Exception as e:
-                        print(f"[Memory] store error: {e}")
+                    self._store_message("agent", final_response)
 
-                return final_response
+                # 次回の起動用にスナップショットを更新
+                if self.memory and self.memory.remote:
+                    await asyncio.to_thread(self.save_snapshot)
 
-            # Tool実行
-            for tool_call in message.tool_calls:
-                tool_name = tool_call.function.name
-                self._emit_status("tool", f"{tool_name} を実行中...")
+                metrics["total"] = time.perf_counter() - turn_start
+                yield "done", final_response
+                return
 
+            # Tool実行（並列。結果は元のtool_call順で追加する）
+            calls = []
+            for tool_call in tool_calls:
                 try:
-                    params = json.loads(tool_call.function.arguments)
+                    params = json.loads(tool_call["function"]["arguments"] or "{}")
                 except json.JSONDecodeError:
                     params = {}
+                calls.append((tool_call["function"]["name"], params))
 
-                result = self.tool_registry.execute(tool_name, params)
+            results = await self.tool_executor.aexecute_all(
+                calls,
+                on_start=lambda name: self._emit_status("tool", f"{name} を実行中..."),
+            )
 
+            for tool_call, result in zip(tool_calls, results):
                 # Tool結果を切り詰め
                 result_str = self._format_tool_result(result)
-                if len(result_str) > MAX_TOOL_RESULT_CHARS:
-                    result_str = result_str[:MAX_TOOL_RESULT_CHARS] + f"\n\n[TRUNCATED at {MAX_TOOL_RESULT_CHARS} chars]"
+                tool = self.tool_registry.tools.get(tool_call["function"]["name"])
+                limit = getattr(tool, "max_result_chars", None) or MAX_TOOL_RESULT_CHARS
+                if len(result_str) > limit:
+                    result_str = result_str[:limit] + f"\n\n[TRUNCATED at {limit} chars]"
 
                 self.conversation.append({
                     "role": "tool",
-                    "tool_call_id": tool_call.id,
+                    "tool_call_id": tool_call["id"],
                     "content": result_str,
                 })
 
-        return "[YUi] 最大イテレーション数に到達しました。途中結果を返します。"
+        metrics["total"] = time.perf_counter() - turn_start
+        yield "done", "[YUi] 最大イテレーション数に到達しました。途中結果を返します。"
 
-    def _call_llm(self, system_prompt: str, tools: list[dict]) -> Any:
-        """Gemini API (OpenAI互換エンドポイント) を呼び出す"""
-        messages = [{"role": "system", "content": system_prompt}] + self.conversation
+    def _store_message(self, role: str, content: str):
+        """Honchoにメッセージを保存（キューに積むだけ）"""
+        try:
+            if role == "user":
+                self.memory.store_user_message(content)
+            else:
+                self.memory.store_agent_message(content)
+        except Exception as e:
+            print(f"[Memory] store error: {e}")
+
+    def _record_prompt_tokens(self, metrics: dict):
+        """このLLM呼び出しのsystem promptと会話履歴のトークン数を記録"""
+        sections = metrics["prompt_sections"]
+        summary = self.compactor.summary_block()
+        if summary:
+            sections["summary"] = section_tokens(summary)
+        sent = dict(sections)
+        if self.cached_content:
+            # prefixはGemini側のキャッシュにあるので送っていない
+            for name in self.context_builder.static_section_names:
+                sent.pop(name, None)
+        metrics["system_tokens"] = sum(sent.values())
+        metrics["conversation_tokens"] = sum(message_tokens(m) for m in self.conversation)
+
+    def _llm_kwargs(self, prompt_prefix: str, prompt_volatile: str, tools: list[dict]) -> dict:
+        """
+        chat.completions.create に渡す引数を組み立てる。
+        system promptは 安定したprefix → 変わる部分 → 古い会話の要約 の順（要約は会話の直前）。
+        Geminiのcached contentを使う場合、prefixはキャッシュ側にあるので送らない。
+        """
+        sections = [prompt_volatile, self.compactor.summary_block()]
+        if not self.cached_content:
+            sections.insert(0, prompt_prefix)
+        messages = [{"role": "system", "content": join_sections(sections)}] + self.conversation
 
         kwargs = {
             "model": self.model,
@@ -206,8 +585,109 @@ class AgentLoop:
         }
         if tools:
             kwargs["tools"] = tools
-
-        return self.client.chat.completions.create(**kwargs)
+        if self.cached_content:
+            kwargs["extra_body"] = {"extra_body": {"google": {"cached_content": self.cached_content}}}
+        return kwargs
+
+    async def _acall_llm(self, request: dict) -> dict:
+        """Gemini API (OpenAI互換エンドポイント) を呼び出し、アシスタントメッセージを返す"""
+        response = await self.client.chat.completions.create(**request)
+        return self._message_to_dict(response.choices[0].message)
+
+    async def _acomplete(self, request: dict) -> dict:
+        """キャッシュ経由でLLMを呼び出す（非ストリーミング）"""
+        message = self.llm_cache.get(request)
+        if message is None:
+            message = await self._acall_llm(request)
+            self.llm_cache.put(request, message)
+        return message
+
+    async def _astream_llm(
+        self,
+        request: dict,
+        metrics: dict,
+        turn_start: float,
+    ) -> AsyncIterator[tuple[str, Any]]:
+        """
+        ストリーミングでLLMを呼び出し、差分をyieldする。
+        断片で届くtool_callsを組み立て直し、最後に ("message", アシスタントメッセージ) をyieldする。
+        """
+        content_parts: list[str] = []
+        tool_slots: list[dict] = []
+        slot_by_index: dict[int, int] = {}
+
+        stream = await self.client.chat.completions.create(stream=True, **request)
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+
+            if delta.content:
+                if metrics["ttft"] is None:
+                    metrics["ttft"] = time.perf_counter() - turn_start
+                content_parts.append(delta.content)
+                yield "content", delta.content
+
+            for tc in delta.tool_calls or []:
+                if metrics["ttft"] is None:
+                    metrics["ttft"] = time.perf_counter() - turn_start
+
+                # indexがない実装（Geminiなど）では新しいidの出現で次のスロットとみなす
+                if tc.index is not None:
+                    pos = slot_by_index.get(tc.index)
+                elif tool_slots and (not tc.id or tc.id == tool_slots[-1]["id"]):
+                    pos = len(tool_slots) - 1
+                else:
+                    pos = None
+                if pos is None:
+                    tool_slots.append({"id": "", "name": "", "arguments": ""})
+                    pos = len(tool_slots) - 1
+                    if tc.index is not None:
+                        slot_by_index[tc.index] = pos
+                slot = tool_slots[pos]
+
+                if tc.id:
+                    slot["id"] = tc.id
+                if tc.function and tc.function.name:
+                    slot["name"] += tc.function.name
+                if tc.function and tc.function.arguments:
+                    slot["arguments"] += tc.function.arguments
+
+                yield "tool_call", {
+                    "index": pos,
+                    "id": tc.id,
+                    "name": tc.function.name if tc.function else None,
+                    "arguments": tc.function.arguments if tc.function else None,
+                }
+
+        message = {"role": "assistant", "content": "".join(content_parts)}
+        if tool_slots:
+            message["tool_calls"] = [
+                {
+                    "id": slot["id"] or f"call_{i}",
+                    "type": "function",
+                    "function": {"name": slot["name"], "arguments": slot["arguments"]},
+                }
+                for i, slot in enumerate(tool_slots)
+            ]
+        yield "message", message
+
+    def _message_to_dict(self, message: Any) -> dict:
+        """SDKのメッセージオブジェクトを会話履歴用のdictに変換"""
+        assistant_msg = {"role": "assistant", "content": message.content or ""}
+        if message.tool_calls:
+            assistant_msg["tool_calls"] = [
+                {
+                    "id": tc.id,
+                    "type": "function",
+                    "function": {
+                        "name": tc.function.name,
+                        "arguments": tc.function.arguments,
+                    },
+                }
+                for tc in message.tool_calls
+            ]
+        return assistant_msg
 
     def _emit_status(self, kind: str, text: str):
         """UIにステータス更新を通知"""
@@ -224,10 +704,24 @@ class AgentLoop:
 
     def reset(self):
         """会話履歴をクリアし、新しいセッションを開始"""
-        self.conversation = []
+        with self._conversation_lock:
+            self._turn_started = True  # 遅れて終わった_reconcile_snapshotに前の会話を戻させない
+            self.conversation = []
+        self.compactor.reset()
+        self.tool_registry.reset()
         if self.memory:
+            self.memory.flush()
             try:
-                self.memory.start_session()
+                self.memory.start_session(lazy=True)
             except Exception as e:
                 print(f"[Memory] new session error: {e}")
         self.context_builder.refresh_memory()
+
+    def close(self):
+        """終了処理: スナップショットと未保存の記憶を書き出し、イベントループを止める"""
+        if self.memory:
+            self.save_snapshot()
+            self.memory.close()
+        self.tool_registry.close()
+        self.context_builder.docs.close()
+        self._loop.call_soon_threadsafe(self._loop.stop)
@@ -6,6 +6,13 @@ Honchoの永続記憶をYUiのAgent Loopに統合する。
 速度最適化:
   - Peerオブジェクトを遅延初期化（起動時のAPI呼び出し削減）
   - セッション一覧の取得を最小限に
+  - メッセージ保存はwrite-behind（MessageWriteQueue）。ターンの待ち時間に含めない
+  - 直近セッションIDをローカルに保存し、起動時はセッション一覧を辿らない
+  - 過去メッセージは末尾N件だけを逆順ページで取得（履歴が増えても起動時間は一定）
+  - session.context()はstale-while-revalidate（ContextCache）。キャッシュを即座に返し、
+    Nターン or T秒ごとにバックグラウンドで取り直す
+  - 保存した発言はローカルの検索索引 (MessageIndex) にも入れ、関連する過去の発言をすぐ引ける
+  - プロンプトにはPeer Cardだけを入れ、要約や検索はmemory toolで必要なときだけ引く（prompt_mode="card"）
 
 正しいAPI:
   session.context() → SessionContext (messages, summary, peer_representation, peer_card)
@@ -15,13 +22,292 @@ Honchoの永続記憶をYUiのAgent Loopに統合する。
   peer.get_card() → Peer Card
 """
 
+import atexit
+import json
+import threading
+import time
 import uuid
+from collections import deque
 from datetime import datetime
+from pathlib import Path
+from typing import Callable
 
 from honcho import Honcho
 
+from yui.agent.recall import MessageIndex
+
+WRITE_BATCH_SIZE = 20  # 1回のadd_messagesにまとめる最大件数
+WRITE_LINGER_SECONDS = 0.2  # バッチにまとめるため少し待つ
+WRITE_MAX_RETRIES = 3
+WRITE_BACKOFF_SECONDS = 0.5  # 0.5s → 1s → 2s
+FLUSH_TIMEOUT_SECONDS = 10
+CONTEXT_REFRESH_TURNS = 5  # この回数ターンが進んだら記憶テキストを取り直す
+CONTEXT_REFRESH_SECONDS = 600  # この秒数が経ったら記憶テキストを取り直す
+RECALL_INDEX_FILENAME = "recall.db"  # 過去の発言の検索索引
+
+
+def new_session_id() -> str:
+    """新しいセッションID（時刻順に並ぶ）"""
+    return f"session-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+class MessageWriteQueue:
+    """
+    Honchoへのメッセージ保存をバックグラウンドで行うwrite-behindキュー。
+      - 溜まったメッセージはセッション毎に1回のadd_messagesにまとめる
+      - 失敗したら指数バックオフでリトライ
+      - それでも届かなければローカルのジャーナル(jsonl)に退避し、次回起動時に再送する
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str, list[tuple[str, str]]], None],
+        journal_path: Path | None = None,
+    ):
+        """send(session_id, [(peer_name, content), ...]) で実際に保存する関数を受け取る"""
+        self.send = send
+        self.journal_path = journal_path
+        self.stats = {"sent": 0, "batches": 0, "retries": 0, "journaled": 0}
+
+        self._items: deque[tuple[str, str, str]] = deque()  # (session_id, peer_name, content)
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._load_journal()
+        self._thread = threading.Thread(target=self._worker, name="yui-honcho-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def put(self, session_id: str, peer_name: str, content: str):
+        """メッセージをキューに積む（すぐ返る）"""
+        with self._cond:
+            self._items.append((session_id, peer_name, content))
+            self._cond.notify_all()
+
+    def flush(self, timeout: float = FLUSH_TIMEOUT_SECONDS) -> bool:
+        """キューが空になるまで待つ。全て書き終えたらTrue。"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify_all()
+            while self._items or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self):
+        """残りを書き出して止める。書ききれなかった分はジャーナルへ。"""
+        if self._closed:
+            return
+        self.flush()
+        with self._cond:
+            self._closed = True
+            leftover = list(self._items)
+            self._items.clear()
+            self._cond.notify_all()
+        if leftover:
+            self._journal(leftover)
+
+    def _take_batch(self) -> list[tuple[str, str, str]] | None:
+        """先頭と同じセッションのメッセージを最大WRITE_BATCH_SIZE件取り出す"""
+        with self._cond:
+            while not self._items and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return None
+            # すぐ後に続くメッセージ（ユーザー→応答など）をまとめるため少し待つ
+            if len(self._items) < WRITE_BATCH_SIZE:
+                self._cond.wait(WRITE_LINGER_SECONDS)
+            if self._closed or not self._items:
+                return None if self._closed else []
+
+            session_id = self._items[0][0]
+            batch = []
+            while self._items and self._items[0][0] == session_id and len(batch) < WRITE_BATCH_SIZE:
+                batch.append(self._items.popleft())
+            self._in_flight += len(batch)
+            return batch
+
+    def _worker(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            if not batch:
+                continue
+            try:
+                self._send_with_retry(batch)
+            finally:
+                with self._cond:
+                    self._in_flight -= len(batch)
+                    self._cond.notify_all()
+
+    def _send_with_retry(self, batch: list[tuple[str, str, str]]):
+        session_id = batch[0][0]
+        items = [(peer_name, content) for _, peer_name, content in batch]
+        for attempt in range(WRITE_MAX_RETRIES):
+            try:
+                self.send(session_id, items)
+                self.stats["sent"] += len(batch)
+                self.stats["batches"] += 1
+                return
+            except Exception as e:
+                if attempt == WRITE_MAX_RETRIES - 1:
+                    print(f"[Memory] store error (journaled {len(batch)} msgs): {e}")
+                    break
+                self.stats["retries"] += 1
+                time.sleep(WRITE_BACKOFF_SECONDS * (2 ** attempt))
+        self._journal(batch)
+
+    def _journal(self, batch: list[tuple[str, str, str]]):
+        """届かなかったメッセージをジャーナルに追記"""
+        if not self.journal_path:
+            return
+        try:
+            self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                for session_id, peer_name, content in batch:
+                    f.write(json.dumps(
+                        {"session_id": session_id, "peer": peer_name, "content": content},
+                        ensure_ascii=False,
+                    ) + "\n")
+            self.stats["journaled"] += len(batch)
+        except OSError as e:
+            print(f"[Memory] journal error: {e}")
+
+    def _load_journal(self):
+        """前回届かなかったメッセージを再送キューに戻す"""
+        if not self.journal_path or not self.journal_path.exists():
+            return
+        try:
+            lines = self.journal_path.read_text(encoding="utf-8").splitlines()
+            self.journal_path.unlink()
+        except OSError as e:
+            print(f"[Memory] journal error: {e}")
+            return
+        for line in lines:
+            try:
+                entry = json.loads(line)
+                self._items.append((entry["session_id"], entry["peer"], entry["content"]))
+            except (ValueError, KeyError):
+                continue
+
+
+class ContextCache:
+    """
+    記憶テキストのstale-while-revalidateキャッシュ。
+    値があれば常に即座に返し、古くなっていたら（refresh_turnsターン or ttl秒）
+    バックグラウンドのスレッドで取り直す。値がないときだけ取得を待つ。
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], str | None],
+        ttl: float = CONTEXT_REFRESH_SECONDS,
+        refresh_turns: int = CONTEXT_REFRESH_TURNS,
+    ):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.refresh_turns = refresh_turns
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "last_refresh_latency": None,  # 秒
+            "total_refresh_latency": 0.0,
+        }
+
+        self._lock = threading.Lock()
+        self._value: str | None = None
+        self._loaded = False
+        self._fetched_at = 0.0
+        self._turns = 0  # 前回の取得からのターン数
+        self._refreshing = False
+        self._generation = 0  # invalidate()より前に始まった取得の結果を捨てるため
+
+    @property
+    def value(self) -> str | None:
+        """キャッシュ済みの値（未取得ならNone。取得はしない）"""
+        return self._value
+
+    def get(self) -> str | None:
+        """キャッシュを返す。古ければバックグラウンドで取り直す。未取得なら取得を待つ。"""
+        with self._lock:
+            loaded = self._loaded
+            if loaded:
+                self.stats["hits"] += 1
+                stale = (
+                    self._turns >= self.refresh_turns
+                    or time.monotonic() - self._fetched_at >= self.ttl
+                )
+                if stale and not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(
+                        target=self._refresh, args=(self._generation,), name="yui-memory-refresh", daemon=True
+                    ).start()
+                return self._value
+            self.stats["misses"] += 1
+        return self.refresh()
+
+    def refresh(self) -> str | None:
+        """今すぐ取り直して返す（待つ）"""
+        with self._lock:
+            generation = self._generation
+        self._refresh(generation)
+        return self._value
+
+    def _refresh(self, generation: int):
+        start = time.perf_counter()
+        try:
+            value = self.fetch()
+        except Exception as e:
+            print(f"[Memory] context refresh error: {e}")
+            with self._lock:
+                self.stats["refresh_errors"] += 1
+                self._refreshing = False
+            return
+        latency = time.perf_counter() - start
+
+        with self._lock:
+            self._refreshing = False
+            self.stats["refreshes"] += 1
+            self.stats["last_refresh_latency"] = latency
+            self.stats["total_refresh_latency"] += latency
+            if generation != self._generation:
+                return
+            self._set(value)
+
+    def seed(self, value: str | None):
+        """取得済みの値を入れる（スナップショットからの起動用）"""
+        with self._lock:
+            self._set(value)
+
+    def _set(self, value: str | None):
+        self._value = value
+        self._loaded = True
+        self._fetched_at = time.monotonic()
+        self._turns = 0
+
+    def tick(self):
+        """1ターン進んだことを記録"""
+        with self._lock:
+            self._turns += 1
+
+    def invalidate(self):
+        """キャッシュを捨てる。次のget()は取得を待つ。"""
+        with self._lock:
+            self._generation += 1
+            self._value = None
+            self._loaded = False
+
 
 class Memory:
+    name = "Honcho"
+    remote = True  # ネットワーク越し（起動時はローカルのスナップショットを使う）
+
     def __init__(
         self,
         api_key: str,
@@ -29,7 +315,16 @@ class Memory:
         base_url: str = "https://api.honcho.dev",
         creator_name: str = "creator",
         agent_name: str = "yui",
+        state_dir: Path | None = None,
+        context_ttl: float = CONTEXT_REFRESH_SECONDS,
+        context_refresh_turns: int = CONTEXT_REFRESH_TURNS,
+        prompt_mode: str = "card",
+        mirror: bool = False,
     ):
+        """
+        mirror: LocalMemoryの書き込みを複製する用途。ローカルの検索索引と直近セッションのポインタは
+        LocalMemoryが持つので作らない（同じ発言を2回ディスクに索引しない）。ジャーナルは使う。
+        """
         self.honcho = Honcho(
             workspace_id=workspace_id,
             api_key=api_key,
@@ -37,6 +332,8 @@ class Memory:
         )
         self.creator_name = creator_name
         self.agent_name = agent_name
+        # system promptに入れる記憶: "card"はPeer Cardだけ（残りはmemory toolで必要なときに引く）、"full"は要約・表現まで
+        self.prompt_mode = prompt_mode
 
         # Peers は遅延初期化（起動を速くするため）
         self._creator = None
@@ -45,6 +342,25 @@ class Memory:
         # 現在のセッション
         self.session = None
         self.session_id = None
+        self._session_lock = threading.RLock()
+
+        # ローカル状態: 直近セッションIDのポインタと、送れなかったメッセージのジャーナル
+        self.pointer_path = state_dir / "latest_session" if state_dir and not mirror else None
+        self._pointer_session_id: str | None = None
+
+        # メッセージ保存はバックグラウンドで（届かなければジャーナルに退避）
+        journal_path = state_dir / "honcho_journal.jsonl" if state_dir else None
+        self.writer = MessageWriteQueue(self._send_messages, journal_path=journal_path)
+
+        # 過去の発言のローカル検索索引（保存のたびに増分更新）
+        self.index = MessageIndex(state_dir / RECALL_INDEX_FILENAME) if state_dir and not mirror else None
+
+        # プロンプト用の記憶はキャッシュから返し、古くなったら裏で取り直す
+        self.context_cache = ContextCache(
+            self._get_prompt_context,
+            ttl=context_ttl,
+            refresh_turns=context_refresh_turns,
+        )
 
     @property
     def creator(self):
@@ -60,36 +376,103 @@ class Memory:
             self._agent = self.honcho.peer(self.agent_name)
         return self._agent
 
-    def start_session(self, session_id: str | None = None) -> str:
-        """新しい会話セッションを開始する。"""
-        self.session_id = session_id or f"session-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
-        self.session = self.honcho.session(self.session_id)
-        self.session.add_peers([self.creator, self.agent])
+    def start_session(self, session_id: str | None = None, lazy: bool = False) -> str:
+        """
+        新しい会話セッションを開始する。
+        lazy=TrueならセッションIDだけ決めてすぐ返し、Honchoへの作成は最初に必要になったときに行う。
+        """
+        with self._session_lock:
+            self.session_id = session_id or new_session_id()
+            self.session = None
+        if not lazy:
+            self.ensure_session()
         return self.session_id
 
+    def ensure_session(self):
+        """現在のセッションIDのHonchoセッションを（まだなら）作成して返す"""
+        with self._session_lock:
+            if self.session is None or self.session.id != self.session_id:
+                session = self.honcho.session(self.session_id)
+                session.add_peers([self.creator, self.agent])
+                self.session = session
+            return self.session
+
     def store_user_message(self, content: str) -> None:
-        """ユーザーのメッセージを保存"""
-        if not self.session:
-            self.start_session()
-        self.session.add_messages([self.creator.message(content)])
+        """ユーザーのメッセージを保存（キューに積むだけですぐ返る）"""
+        if not self.session_id:
+            self.start_session(lazy=True)
+        self._write_pointer()
+        self.writer.put(self.session_id, self.creator_name, content)
+        if self.index:
+            self.index.add(self.session_id, self.creator_name, content)
+        self.context_cache.tick()
 
     def store_agent_message(self, content: str) -> None:
-        """YUiの応答を保存"""
-        if not self.session:
-            self.start_session()
-        self.session.add_messages([self.agent.message(content)])
+        """YUiの応答を保存（キューに積むだけですぐ返る）"""
+        if not self.session_id:
+            self.start_session(lazy=True)
+        self._write_pointer()
+        self.writer.put(self.session_id, self.agent_name, content)
+        if self.index:
+            self.index.add(self.session_id, self.agent_name, content)
+
+    def read_latest_session_id(self) -> str | None:
+        """ローカルに保存した直近セッション（メッセージのあるもの）のIDを読む"""
+        if not self.pointer_path:
+            return None
+        try:
+            return self.pointer_path.read_text(encoding="utf-8").strip() or None
+        except OSError:
+            return None
 
-    def get_context_for_prompt(self) -> str:
+    def _write_pointer(self):
+        """最初のメッセージを保存したときに、このセッションを直近セッションとして記録"""
+        if not self.pointer_path or self._pointer_session_id == self.session_id:
+            return
+        self._pointer_session_id = self.session_id
+        try:
+            self.pointer_path.parent.mkdir(parents=True, exist_ok=True)
+            self.pointer_path.write_text(self.session_id, encoding="utf-8")
+        except OSError as e:
+            print(f"[Memory] session pointer error: {e}")
+
+    def _send_messages(self, session_id: str, items: list[tuple[str, str]]):
+        """MessageWriteQueue用: 1セッション分のメッセージを1回のadd_messagesで保存"""
+        session = self.ensure_session() if session_id == self.session_id else self.honcho.session(session_id)
+        peers = {self.creator_name: self.creator, self.agent_name: self.agent}
+        session.add_messages([
+            (peers.get(peer_name) or self.honcho.peer(peer_name)).message(content)
+            for peer_name, content in items
+        ])
+
+    def flush(self, timeout: float = FLUSH_TIMEOUT_SECONDS) -> bool:
+        """未保存のメッセージを書き出す（終了時・/reset時）"""
+        return self.writer.flush(timeout)
+
+    def close(self):
+        """未保存のメッセージを書き出して止める"""
+        self.writer.close()
+        if self.index:
+            self.index.close()
+
+    def search(self, query: str, limit: int = 5, exclude_session: str | None = None) -> list[dict]:
+        """過去の発言のローカル全文検索（MessageIndex.search。索引がなければ空）"""
+        if not self.index:
+            return []
+        return self.index.search(query, limit=limit, exclude_session=exclude_session)
+
+    def get_context_for_prompt(self, fresh: bool = False) -> str:
         """
         system promptに埋め込むための記憶テキストを組み立てる。
 
         コスト最適化: Dialectic API (peer.chat) は高いので起動時には呼ばない。
         session.context() のみ使用（無料）。
+        速度最適化: session.context()はキャッシュから返す（fresh=Trueなら取り直しを待つ）。
         """
         parts = []
 
         # session.context() のみ（無料）
-        ctx_text = self._get_session_context()
+        ctx_text = self.context_cache.refresh() if fresh else self.context_cache.get()
         if ctx_text:
             parts.append(ctx_text)
 
@@ -98,46 +481,88 @@ class Memory:
 
         return "# YUIの永続記憶\n\n" + "\n\n".join(parts)
 
-    def get_past_messages_openai(self) -> list[dict]:
+    def get_past_messages_openai(self, session_id: str | None = None, limit: int = 10) -> list[dict]:
         """
         起動時に過去の会話をOpenAI形式で復元する。
-        直近のセッションからメッセージを取得。
+        直近のセッションから末尾limit件だけを取得（コスト削減: 20→10）。
+        session_idを省略したらローカルのポインタ、なければセッション一覧の最新を使う。
         注意: この関数はPeerを使わないので遅延初期化は発火しない。
         """
         messages = []
 
         try:
-            # 既存セッション一覧から直近のものを探す
-            sessions = list(self.honcho.sessions())
-            if not sessions:
+            session_id = session_id or self.read_latest_session_id()
+            sess = self.honcho.session(session_id) if session_id else self._latest_session()
+            if sess is None:
                 return []
 
-            # 直近1セッションのみ（コスト削減: 3→1）
-            for sess in sessions[-1:]:
-                try:
-                    sess_messages = list(sess.messages())
-                    for msg in sess_messages:
-                        role = "assistant" if msg.peer_id == self.agent_name else "user"
-                        messages.append({"role": role, "content": msg.content})
-                except Exception:
-                    continue
-
-            # 最新10メッセージに絞る（コスト削減: 20→10）
-            if len(messages) > 10:
-                messages = messages[-10:]
+            for msg in self._tail_messages(sess, limit):
+                role = "assistant" if msg.peer_id == self.agent_name else "user"
+                messages.append({"role": role, "content": msg.content})
 
         except Exception as e:
             print(f"[Memory] get_past_messages error: {e}")
 
         return messages
 
+    def _latest_session(self):
+        """セッション一覧の最新1件だけを取得（全ページを辿らない）"""
+        page = self.honcho.sessions(reverse=True, size=1)
+        return page.items[0] if page.items else None
+
+    def _tail_messages(self, sess, limit: int) -> list:
+        """セッションの末尾limit件を古い順で返す（逆順の1ページだけ取得）"""
+        page = sess.messages(reverse=True, size=limit)
+        return list(reversed(page.items))
+
+    def recall(self) -> str:
+        """要約・表現・Peer Cardまで含めた記憶（memory toolのrecall用。キャッシュしない）"""
+        ctx_text = self._get_session_context()
+        return "# YUIの永続記憶\n\n" + ctx_text if ctx_text else ""
+
+    def search_remote(self, query: str, limit: int = 5) -> list[dict]:
+        """Honcho側のメッセージ検索（ローカル索引より前の発言も引ける）。形はMessageIndex.searchと同じ。"""
+        try:
+            messages = self.creator.search(query, limit=limit)
+        except Exception as e:
+            print(f"[Memory] search error: {e}")
+            return []
+        hits = []
+        for msg in messages or []:
+            created = getattr(msg, "created_at", None)
+            hits.append({
+                "session_id": getattr(msg, "session_id", None),
+                "peer": msg.peer_id,
+                "content": msg.content,
+                "created_at": created.timestamp() if isinstance(created, datetime) else time.time(),
+                "score": None,
+            })
+        return hits
+
+    def _get_prompt_context(self) -> str | None:
+        """system promptに入れる記憶（prompt_modeに応じてPeer Cardだけ or 全部）"""
+        if self.prompt_mode == "card":
+            return self._get_peer_card_text()
+        return self._get_session_context()
+
+    def _get_peer_card_text(self) -> str | None:
+        """YUiから見た創造者のPeer Cardだけ（小さい）"""
+        try:
+            card = self.agent.get_card(target=self.creator_name)
+        except Exception as e:
+            print(f"[Memory] peer card error: {e}")
+            return None
+        if not card:
+            return None
+        return "## 創造者のカード\n\n" + "\n".join(f"- {item}" for item in card)
+
     def _get_session_context(self) -> str | None:
         """session.context()で要約・表現を取得"""
-        if not self.session:
+        if not self.session_id:
             return None
 
         try:
-            ctx = self.session.context(
+            ctx = self.ensure_session().context(
                 summary=True,
                 peer_target=self.creator_name,
                 peer_perspective=self.agent_name,
@@ -160,14 +585,8 @@ class Memory:
                 card_text = "\n".join(f"- {item}" for item in ctx.peer_card)
                 parts.append(f"**特徴:**\n{card_text}")
 
-            # コンテキスト内メッセージ
-            if ctx.messages:
-                msg_texts = []
-                for msg in ctx.messages[-10:]:  # 最新10件
-                    role = "創造者" if msg.peer_id == self.creator_name else "YUI"
-                    msg_texts.append(f"  {role}: {msg.content[:200]}")
-                if msg_texts:
-                    parts.append("**最近のやりとり:**\n" + "\n".join(msg_texts))
+            # コンテキスト内メッセージは会話履歴と重複するので入れない。
+            # 過去の発言は、今の発言に関係するものだけをContextBuilderが検索して入れる
 
             if parts:
                 return "## セッション記憶\n\n" + "\n\n".join(parts)
@@ -194,18 +613,17 @@ class Memory:
     def _get_recent_messages_text(self) -> str | None:
         """直近セッションの生メッセージをテキストで返す"""
         try:
-            sessions = list(self.honcho.sessions())
-            if not sessions:
+            latest = self._latest_session()
+            if latest is None:
                 return None
 
-            # 直近セッションのメッセージ
-            latest = sessions[-1]
-            msgs = list(latest.messages())
+            # 直近セッションのメッセージ（最新15件）
+            msgs = self._tail_messages(latest, 15)
             if not msgs:
                 return None
 
             lines = []
-            for msg in msgs[-15:]:  # 最新15件
+            for msg in msgs:
                 role = "創造者" if msg.peer_id == self.creator_name else "YUI"
                 content = msg.content[:300]
                 lines.append(f"  {role}: {content}")
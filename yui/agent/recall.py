@@ -0,0 +1,193 @@
+"""
+YUi Recall - 過去の会話の検索索引
+
+メッセージを保存するたびにSQLite (WALモード) のFTS5索引へ追加し（増分更新）、
+今のユーザー発言に関係する過去の発言をBM25順で引けるようにする。
+  - 分かち書きのない日本語も引っかかるよう、英数字は単語、それ以外は2文字ずつ（bigram）に分けて索引する
+  - 埋め込みモデル（fastembed。任意依存）が使えれば、BM25の候補を意味の近さで並べ替える
+LocalMemoryの保存先そのものであり、Honcho (Memory) ではローカルの検索索引として使う。
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+SEARCH_MAX_TERMS = 32  # 検索クエリに使う語の上限
+RERANK_CANDIDATES = 4  # 並べ替え用にlimitの何倍の候補を取るか
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    peer TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id);
+CREATE VIRTUAL TABLE IF NOT EXISTS message_terms USING fts5(terms, tokenize='unicode61');
+"""
+
+
+_embedder: Callable[[list[str]], list[list[float]]] | None = None
+
+
+def set_embedder(embedder: Callable[[list[str]], list[list[float]]] | None):
+    """埋め込み関数（texts -> ベクトルのリスト）を設定。NoneでBM25のみに戻す。"""
+    global _embedder
+    _embedder = embedder
+
+
+def use_embeddings(model: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2") -> bool:
+    """
+    fastembedが入っていれば、CPUの小さな埋め込みモデルで検索結果を並べ替える。成功したらTrue。
+    モデルを読み込めない（ダウンロードの失敗など）ときはFalse（BM25のみ）。
+    """
+    try:
+        from fastembed import TextEmbedding
+    except ImportError:
+        return False
+    try:
+        encoder = TextEmbedding(model)
+    except Exception as e:
+        print(f"[Recall] embedding model load error: {e}")
+        return False
+    set_embedder(lambda texts: [list(v) for v in encoder.embed(texts)])
+    return True
+
+
+def _cosine(a: list[float], b: list[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = (sum(x * x for x in a) ** 0.5) * (sum(y * y for y in b) ** 0.5)
+    return dot / norm if norm else 0.0
+
+
+def segment(text: str) -> list[str]:
+    """索引・検索用の語に分ける（英数字は単語、日本語などは2文字ずつ）"""
+    terms = []
+    for word in re.findall(r"\w+", text.lower()):
+        if word.isascii() or len(word) == 1:
+            terms.append(word)
+        else:
+            terms.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return terms
+
+
+def fts_query(text: str) -> str | None:
+    """自由文をFTS5のMATCHクエリ（語のOR）にする"""
+    terms = list(dict.fromkeys(segment(text)))[:SEARCH_MAX_TERMS]
+    if not terms:
+        return None
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+class MessageIndex:
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._backfill()
+        self._db.commit()
+
+    def _backfill(self):
+        """索引が空なら既存のメッセージから作り直す（索引を後から追加したDB用）"""
+        if self._db.execute("SELECT 1 FROM message_terms LIMIT 1").fetchone():
+            return
+        rows = self._db.execute("SELECT id, content FROM messages").fetchall()
+        self._db.executemany(
+            "INSERT INTO message_terms (rowid, terms) VALUES (?, ?)",
+            [(rowid, " ".join(segment(content))) for rowid, content in rows],
+        )
+
+    def add(self, session_id: str, peer: str, content: str):
+        """メッセージを追加し、索引も同時に更新する"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO sessions (id, created_at) VALUES (?, ?)",
+                (session_id, now),
+            )
+            cursor = self._db.execute(
+                "INSERT INTO messages (session_id, peer, content, created_at) VALUES (?, ?, ?, ?)",
+                (session_id, peer, content, now),
+            )
+            self._db.execute(
+                "INSERT INTO message_terms (rowid, terms) VALUES (?, ?)",
+                (cursor.lastrowid, " ".join(segment(content))),
+            )
+            self._db.commit()
+
+    def latest_session_id(self) -> str | None:
+        """メッセージが保存された直近のセッションID"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id FROM sessions ORDER BY created_at DESC, rowid DESC LIMIT 1"
+            ).fetchone()
+        return row[0] if row else None
+
+    def tail(self, session_id: str, limit: int) -> list[tuple[str, str]]:
+        """セッションの末尾limit件を古い順で返す: [(peer, content), ...]"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT peer, content FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (session_id, limit),
+            ).fetchall()
+        return rows[::-1]
+
+    def search(self, query: str, limit: int = 5, exclude_session: str | None = None) -> list[dict]:
+        """
+        全文検索（BM25順。埋め込みモデルがあれば意味の近さで並べ替える）。
+        戻り値: [{session_id, peer, content, created_at, score}, ...]（scoreは小さいほど関連が強い）
+        """
+        match = fts_query(query)
+        if not match:
+            return []
+        sql = (
+            "SELECT m.session_id, m.peer, m.content, m.created_at, bm25(message_terms) AS score "
+            "FROM message_terms JOIN messages m ON m.id = message_terms.rowid "
+            "WHERE message_terms MATCH ?"
+        )
+        params: list = [match]
+        if exclude_session:
+            sql += " AND m.session_id != ?"
+            params.append(exclude_session)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit * RERANK_CANDIDATES if _embedder else limit)
+        try:
+            with self._lock:
+                rows = self._db.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            print(f"[Recall] search error: {e}")
+            return []
+
+        hits = [
+            {"session_id": r[0], "peer": r[1], "content": r[2], "created_at": r[3], "score": r[4]}
+            for r in rows
+        ]
+        if _embedder and len(hits) > 1:
+            hits = self._rerank(query, hits)
+        return hits[:limit]
+
+    def _rerank(self, query: str, hits: list[dict]) -> list[dict]:
+        try:
+            vectors = _embedder([query] + [h["content"] for h in hits])
+        except Exception as e:
+            print(f"[Recall] embedding error: {e}")
+            return hits
+        for hit, vector in zip(hits, vectors[1:]):
+            hit["score"] = -_cosine(vectors[0], vector)
+        return sorted(hits, key=lambda h: h["score"])
+
+    def close(self):
+        with self._lock:
+            self._db.close()
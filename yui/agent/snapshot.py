@@ -0,0 +1,73 @@
+"""
+YUi Snapshot - 前回の会話のローカルスナップショット
+
+起動時にHonchoをネットワーク越しに待たずに済むよう、
+トリミング済みの会話履歴・Honchoのセッション記憶・会話の要約をワークスペースに保存しておく。
+起動時はこれを即座に読み込み、Honchoとの突き合わせはバックグラウンドで行う。
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+SNAPSHOT_VERSION = 2
+
+
+def load_snapshot(path: Path) -> dict | None:
+    """スナップショットを読む。なければ・壊れていればNone。"""
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != SNAPSHOT_VERSION or not isinstance(data.get("conversation"), list):
+        return None
+    return data
+
+
+def save_snapshot(
+    path: Path,
+    session_id: str | None,
+    conversation: list[dict],
+    session_context: str | None,
+    summary: str = "",
+):
+    """スナップショットをアトミックに書き込む"""
+    data = {
+        "version": SNAPSHOT_VERSION,
+        "saved_at": time.time(),
+        "session_id": session_id,
+        "conversation": conversation,
+        "session_context": session_context,
+        "summary": summary,
+    }
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[Snapshot] save error: {e}")
+
+
+def dialog_view(messages: list[dict]) -> list[tuple[str, str]]:
+    """
+    Honchoに保存される形（ユーザー発言とYUiの最終応答だけ）に揃えた会話。
+    スナップショットがHonchoと食い違っていないかの比較に使う。
+    """
+    view = []
+    for msg in messages:
+        role = msg.get("role")
+        if role == "user" or (role == "assistant" and not msg.get("tool_calls")):
+            view.append((role, msg.get("content") or ""))
+    return view
+
+
+def is_stale(snapshot_conversation: list[dict], remote_messages: list[dict]) -> bool:
+    """スナップショットの末尾がHonchoの末尾と一致しなければ古いとみなす"""
+    local = dialog_view(snapshot_conversation)
+    remote = dialog_view(remote_messages)
+    n = min(len(local), len(remote))
+    if n == 0:
+        return len(local) != len(remote)
+    return local[-n:] != remote[-n:]
@@ -0,0 +1,107 @@
+"""
+YUi Tokens - トークン数の見積もりと会話履歴のトリミング
+
+  - estimate_tokens(): ローカルで高速に見積もる（UTF-8のバイト数から英数字とCJKを推定）
+  - count_tokens(): 正確なトークナイザが設定されていればそれを使う（tiktokenは任意依存）
+  - trim_to_budget(): トークン予算に収まるよう古いメッセージから捨てる。
+    assistantのtool_callsと対応するtoolメッセージは1グループとして扱い、決して分割しない。
+"""
+
+from typing import Callable
+
+# 1メッセージあたりの固定オーバーヘッド（role等）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_tokenizer: Callable[[str], int] | None = None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    トークン数を高速に見積もる。
+    ASCIIは約4文字で1トークン、日本語などのマルチバイト文字は約1文字1トークン。
+    文字単位のループを避けるため、文字数とUTF-8のバイト数の差からマルチバイト文字数を推定する。
+    """
+    if not text:
+        return 0
+    n_chars = len(text)
+    n_bytes = len(text.encode("utf-8", errors="replace"))
+    multibyte = min(n_chars, (n_bytes - n_chars) // 2)
+    ascii_chars = n_chars - multibyte
+    return multibyte + (ascii_chars + 3) // 4
+
+
+def set_tokenizer(tokenizer: Callable[[str], int] | None):
+    """正確なトークナイザ（text -> トークン数）を設定。Noneで見積もりに戻す。"""
+    global _tokenizer
+    _tokenizer = tokenizer
+
+
+def use_tiktoken(encoding: str = "o200k_base") -> bool:
+    """tiktokenが入っていれば正確なトークナイザとして使う。成功したらTrue。"""
+    try:
+        import tiktoken
+    except ImportError:
+        return False
+    enc = tiktoken.get_encoding(encoding)
+    set_tokenizer(lambda text: len(enc.encode(text, disallowed_special=())))
+    return True
+
+
+def count_tokens(text: str) -> int:
+    """トークン数を数える（トークナイザ未設定なら見積もり）"""
+    if not text:
+        return 0
+    if _tokenizer:
+        return _tokenizer(text)
+    return estimate_tokens(text)
+
+
+def message_tokens(message: dict) -> int:
+    """OpenAI形式のメッセージ1件のトークン数"""
+    tokens = MESSAGE_OVERHEAD_TOKENS + count_tokens(message.get("content") or "")
+    for tc in message.get("tool_calls") or []:
+        fn = tc.get("function", {})
+        tokens += count_tokens(fn.get("name") or "") + count_tokens(fn.get("arguments") or "")
+    return tokens
+
+
+def group_messages(messages: list[dict]) -> list[list[dict]]:
+    """
+    メッセージをトリミング単位のグループに分ける。
+    tool_callsを持つassistantメッセージと、それに続くtoolメッセージは同じグループ。
+    """
+    groups: list[list[dict]] = []
+    for msg in messages:
+        if msg.get("role") == "tool" and groups and (
+            groups[-1][0].get("tool_calls") and groups[-1][0].get("role") == "assistant"
+        ):
+            groups[-1].append(msg)
+        else:
+            groups.append([msg])
+    return groups
+
+
+def trim_to_budget(messages: list[dict], budget: int) -> tuple[list[dict], list[dict], int]:
+    """
+    トークン予算に収まるよう、古いグループから捨てる。
+    最新のグループは予算を超えても必ず残す。対応するassistantのないtoolメッセージも捨てる。
+    戻り値: (残すメッセージ, 捨てたメッセージ, 捨てたトークン数)
+    """
+    groups = group_messages(messages)
+
+    used = 0
+    cut = 0  # groups[:cut] を捨てる
+    for i in range(len(groups) - 1, -1, -1):
+        group_tokens = sum(message_tokens(m) for m in groups[i])
+        if i < len(groups) - 1 and used + group_tokens > budget:
+            cut = i + 1
+            break
+        used += group_tokens
+
+    # 先頭に来たtoolメッセージは対応するtool_callsが失われているので捨てる
+    while cut < len(groups) - 1 and groups[cut][0].get("role") == "tool":
+        cut += 1
+
+    dropped = [m for group in groups[:cut] for m in group]
+    kept = [m for group in groups[cut:] for m in group]
+    return kept, dropped, sum(message_tokens(m) for m in dropped)
@@ -4,19 +4,23 @@ YUi CLI - 対話インターフェース
 richを使ったターミナルUI。
 - 起動中は各ステップをリアルタイム表示
 - 処理中はスピナーでステータス表示
-- 経過時間の表示
+- 応答はストリーミングでMarkdownパネルに逐次描画
+- 経過時間・TTFTの表示
 - Ctrl+C で処理キャンセル（アプリは終了しない）
 - 複数行入力対応: 空行（Enter2回）で送信
 """
 
+import threading
 import time
 
 from rich.console import Console
+from rich.live import Live
 from rich.markdown import Markdown
 from rich.panel import Panel
 from rich.text import Text
 
 from yui.agent.loop import AgentLoop
+from yui.tools.shell import format_bytes
 
 
 console = Console()
@@ -34,16 +38,26 @@ def print_banner():
     console.print()
 
 
-def print_yui(response: str, elapsed: float | None = None):
-    """YUiの応答を表示"""
-    subtitle = f"[dim]{elapsed:.1f}s[/dim]" if elapsed else None
-    console.print(Panel(
+def yui_panel(response: str, subtitle: str | None = None) -> Panel:
+    """YUiの応答パネル"""
+    return Panel(
         Markdown(response),
         title="[bold magenta]YUi[/bold magenta]",
         subtitle=subtitle,
         border_style="magenta",
         padding=(1, 2),
-    ))
+    )
+
+
+def print_yui(response: str, elapsed: float | None = None, ttft: float | None = None):
+    """YUiの応答を表示"""
+    subtitle = None
+    if elapsed:
+        subtitle = f"[dim]{elapsed:.1f}s"
+        if ttft is not None:
+            subtitle += f" · TTFT {ttft:.1f}s"
+        subtitle += "[/dim]"
+    console.print(yui_panel(response, subtitle))
     console.print()
 
 
@@ -62,7 +76,7 @@ def read_multiline() -> str | None:
 
     # 1行目がコマンドならそのまま返す
     stripped = first_line.strip()
-    if stripped.lower() in ("quit", "exit", "q", "/reset", "/refresh"):
+    if stripped.lower() in ("quit", "exit", "q", "/reset", "/refresh", "/stats"):
         return stripped
 
     lines = [first_line]
@@ -87,8 +101,9 @@ def read_multiline() -> str | None:
 
 def run_with_status(agent: AgentLoop, message: str) -> tuple[str | None, float]:
     """
-    agent.run()をスピナー付きで実行。
-    リアルタイムでステータスが更新される。
+    agent.run_stream()をスピナー付きで実行し、応答をライブ描画する。
+    - 最初のトークンが届くまではスピナー
+    - 届いたらMarkdownパネルに逐次描画（Tool実行に入ったらスピナーに戻る）
     Ctrl+Cでキャンセル可能。
     """
     status = console.status(
@@ -96,32 +111,123 @@ def run_with_status(agent: AgentLoop, message: str) -> tuple[str | None, float]:
         spinner="dots",
         spinner_style="magenta",
     )
+    live = Live(console=console, refresh_per_second=12, transient=True)
+    buffer: list[str] = []
+    state = {"live": False}
+    lock = threading.Lock()  # Tool並列実行中は複数スレッドから呼ばれる
+
+    def show_spinner():
+        if state["live"]:
+            live.stop()
+            state["live"] = False
+            status.start()
 
     def on_status(kind: str, text: str):
-        if kind == "thinking":
-            status.update(f"[bold magenta]  {text}[/bold magenta]")
-        elif kind == "tool":
-            status.update(f"[bold yellow]  🔧 {text}[/bold yellow]")
+        with lock:
+            if kind == "thinking":
+                show_spinner()
+                buffer.clear()
+                status.update(f"[bold magenta]  {text}[/bold magenta]")
+            elif kind == "tool":
+                show_spinner()
+                status.update(f"[bold yellow]  🔧 {text}[/bold yellow]")
 
     agent.on_status = on_status
     start_time = time.time()
+    response = None
 
     try:
         status.start()
-        response = agent.run(message)
-        status.stop()
-        elapsed = time.time() - start_time
-        agent.on_status = None
-        return response, elapsed
+        for kind, payload in agent.run_stream(message):
+            if kind == "content":
+                if not state["live"]:
+                    status.stop()
+                    live.start()
+                    state["live"] = True
+                buffer.append(payload)
+                live.update(yui_panel("".join(buffer)))
+            elif kind == "done":
+                response = payload
+        return response, time.time() - start_time
     except KeyboardInterrupt:
-        status.stop()
-        agent.on_status = None
         console.print("[dim]  (中断しました)[/dim]\n")
         return None, 0
-    except Exception as e:
+    finally:
+        if state["live"]:
+            live.stop()
         status.stop()
         agent.on_status = None
-        raise e
+
+
+def format_boot_metrics(metrics: dict) -> str:
+    """ブートの内訳を1行に（例: snapshot 2ms / memory_init 30ms / ...）"""
+    parts = []
+    for key, value in metrics.items():
+        if key in ("source", "total", "snapshot_stale"):
+            continue
+        parts.append(f"{key} {value * 1000:.0f}ms")
+    if "snapshot_stale" in metrics:
+        parts.append("snapshot stale" if metrics["snapshot_stale"] else "snapshot fresh")
+    return " / ".join(parts)
+
+
+def print_stats(agent: AgentLoop):
+    """ブートの内訳と直近ターンの計測値を表示（/statsコマンド用）"""
+    boot = agent.boot_metrics
+    console.print(
+        f"[dim]  boot {boot.get('total', 0) * 1000:.0f}ms ({boot.get('source', '-')}): "
+        f"{format_boot_metrics(boot)}[/dim]"
+    )
+    if agent.memory:
+        cache = agent.memory.context_cache.stats
+        last = cache["last_refresh_latency"]
+        avg = cache["total_refresh_latency"] / cache["refreshes"] if cache["refreshes"] else None
+        console.print(
+            f"[dim]  memory cache: hits {cache['hits']} | misses {cache['misses']} | "
+            f"refreshes {cache['refreshes']} (errors {cache['refresh_errors']}) | "
+            f"last {f'{last * 1000:.0f}ms' if last is not None else '-'} | "
+            f"avg {f'{avg * 1000:.0f}ms' if avg is not None else '-'}[/dim]"
+        )
+    web = agent.tool_registry.tools.get("web_fetch")
+    web_cache = getattr(web, "cache", None)
+    if web_cache and web_cache.enabled:
+        stats = web_cache.stats
+        rate = web_cache.hit_rate
+        console.print(
+            f"[dim]  web cache ({web_cache.mode}): hits {stats['hits']} | revalidated {stats['revalidated']} | "
+            f"misses {stats['misses']} | hit rate {f'{rate:.0%}' if rate is not None else '-'} | "
+            f"saved {format_bytes(stats['bytes_saved'])}[/dim]"
+        )
+    if not agent.turn_metrics:
+        console.print("[dim]no turns yet.[/dim]\n")
+        return
+    for i, m in enumerate(agent.turn_metrics[-5:], start=max(1, len(agent.turn_metrics) - 4)):
+        ttft = f"{m['ttft']:.2f}s" if m.get("ttft") is not None else "-"
+        total = f"{m['total']:.2f}s" if m.get("total") is not None else "-"
+        stable = {True: "same", False: "changed", None: "-"}[m.get("prefix_stable")]
+        console.print(
+            f"[dim]  #{i} ttft {ttft} | total {total} | iter {m['iterations']} | "
+            f"trimmed {m['trimmed_tokens']} tok | cache hits {m['cache_hits']} | "
+            f"recalled {m.get('recalled', 0)} | "
+            f"prefix {m.get('prefix_hash', '-')} ({stable})[/dim]"
+        )
+        sections = m.get("prompt_sections")
+        if sections:
+            console.print(
+                "[dim]      prompt: " + " / ".join(f"{name} {tokens}" for name, tokens in sections.items())
+                + f" | system {m.get('system_tokens', '-')} tok vs conversation {m.get('conversation_tokens', '-')} tok[/dim]"
+            )
+        cut = m.get("prompt_cut")
+        if cut:
+            console.print(
+                "[dim]      cut to fit budget: " + " / ".join(f"{name} -{tokens}" for name, tokens in cut.items()) + "[/dim]"
+            )
+    console.print()
+
+
+def _last_ttft(agent: AgentLoop) -> float | None:
+    """直近ターンのTTFT（秒）"""
+    return agent.turn_metrics[-1]["ttft"] if agent.turn_metrics else None
 
 
 def main():
@@ -146,10 +252,12 @@ def main():
     boot_elapsed = time.time() - boot_start
 
     # ブート結果を1行で表示
-    memory_tag = "[green]Honcho[/green]" if agent.memory else "[yellow]local[/yellow]"
+    memory_tag = f"[green]{agent.memory.name}[/green]" if agent.memory else "[yellow]local[/yellow]"
     restored = len(agent.conversation)
     restore_tag = f" | [green]{restored} msgs restored[/green]" if restored > 0 else ""
-    console.print(f"[dim]  ready in {boot_elapsed:.1f}s | Memory: {memory_tag}{restore_tag}[/dim]")
+    source_tag = " (snapshot)" if agent.boot_metrics.get("source") == "snapshot" else ""
+    console.print(f"[dim]  ready in {boot_elapsed * 1000:.0f}ms | Memory: {memory_tag}{restore_tag}{source_tag}[/dim]")
+    console.print(f"[dim]  boot: {format_boot_metrics(agent.boot_metrics)}[/dim]")
     console.print()
 
     # 起動時: YUiから話しかける
@@ -169,7 +277,7 @@ def main():
     try:
         result = run_with_status(agent, greeting_prompt)
         if result[0]:
-            print_yui(result[0], result[1])
+            print_yui(result[0], result[1], _last_ttft(agent))
     except Exception as e:
         console.print(f"[bold red]Error:[/bold red] {e}\n")
 
@@ -194,6 +302,9 @@ def main():
             agent.reset()
             console.print("[dim]conversation reset.[/dim]\n")
             continue
+        if user_input.lower() == "/stats":
+            print_stats(agent)
+            continue
         if user_input.lower() == "/refresh":
             agent.context_builder.refresh_memory()
             console.print("[dim]memory refreshed.[/dim]\n")
@@ -204,11 +315,14 @@ def main():
         try:
             result = run_with_status(agent, user_input)
             if result[0]:
-                print_yui(result[0], result[1])
+                print_yui(result[0], result[1], _last_ttft(agent))
         except Exception as e:
             console.print(f"[bold red]Error:[/bold red] {e}")
             console.print()
 
+    # スナップショットと未保存の記憶を書き出して終了
+    agent.close()
+
 
 if __name__ == "__main__":
     main()
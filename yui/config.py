@@ -47,6 +47,13 @@ def get_gemini_api_key() -> str:
     return key
 
 
+def get_gemini_cached_content() -> str | None:
+    """Geminiのcached content名（例: cachedContents/abc123）を取得。なければNone。"""
+    load_env()
+    name = os.environ.get("GEMINI_CACHED_CONTENT", "").strip()
+    return name if name else None
+
+
 def get_openrouter_api_key() -> str:
     """OpenRouter APIキーを取得（バックアップ用）。"""
     load_env()
@@ -71,3 +78,148 @@ def get_honcho_base_url() -> str:
     """Honcho API URLを取得。"""
     load_env()
     return os.environ.get("HONCHO_BASE_URL", "https://api.honcho.dev").strip()
+
+
+def get_tool_max_workers() -> int:
+    """Tool並列実行のワーカー数を取得。"""
+    load_env()
+    try:
+        return max(1, int(os.environ.get("YUI_TOOL_WORKERS", "4")))
+    except ValueError:
+        return 4
+
+
+def get_shell_max_output() -> int:
+    """シェルコマンドの出力の上限（バイト）。超えたらkillする。0で無制限（メモリは先頭と末尾だけで一定）。"""
+    load_env()
+    try:
+        return max(0, int(os.environ.get("YUI_SHELL_MAX_OUTPUT", "10000000")))
+    except ValueError:
+        return 10_000_000
+
+
+def use_shell_session() -> bool:
+    """shell Toolで同じシェルを使い回すか（cdやexportが次のコマンドに残る）。既定はon。"""
+    load_env()
+    return os.environ.get("YUI_SHELL_SESSION", "on").strip().lower() not in ("0", "false", "no", "off")
+
+
+def get_python_workers() -> int:
+    """python_exec Toolで起動しておくワーカーの数（0なら呼ばれたときに起動）。"""
+    load_env()
+    try:
+        return max(0, int(os.environ.get("YUI_PYTHON_WORKERS", "2")))
+    except ValueError:
+        return 2
+
+
+def get_python_memory_mb() -> int:
+    """python_exec Toolのワーカー1つあたりのメモリ上限（MB。0で無制限）。"""
+    load_env()
+    try:
+        return max(0, int(os.environ.get("YUI_PYTHON_MEMORY_MB", "1024")))
+    except ValueError:
+        return 1024
+
+
+def get_python_preimport() -> list[str]:
+    """python_exec Toolのワーカーが起動時にimportしておくモジュール（カンマ区切り）。"""
+    load_env()
+    value = os.environ.get(
+        "YUI_PYTHON_PREIMPORT",
+        "json,math,re,datetime,collections,itertools,functools,statistics,pathlib,csv",
+    )
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def get_web_max_bytes() -> int:
+    """web_fetchで1ページあたりに読む本文の上限（展開後のバイト数）。"""
+    load_env()
+    try:
+        return max(1024, int(os.environ.get("YUI_WEB_MAX_BYTES", "5000000")))
+    except ValueError:
+        return 5_000_000
+
+
+def get_web_cache_mode() -> str:
+    """web_fetchのディスクキャッシュのモード（off / on / offline）。"""
+    load_env()
+    mode = os.environ.get("YUI_WEB_CACHE", "on").strip().lower()
+    return mode if mode in ("off", "on", "offline") else "on"
+
+
+def get_web_cache_dir() -> Path:
+    """web_fetchのディスクキャッシュの保存先（既定 ~/.cache/yui/web。セッションをまたいで使う）。"""
+    load_env()
+    value = os.environ.get("YUI_WEB_CACHE_DIR", "").strip()
+    return Path(value).expanduser() if value else Path.home() / ".cache" / "yui" / "web"
+
+
+def use_exact_tokenizer() -> bool:
+    """トークン数を正確に数えるか（tiktokenが必要）。"""
+    load_env()
+    return os.environ.get("YUI_EXACT_TOKENS", "").strip().lower() in ("1", "true", "yes")
+
+
+def get_llm_cache_mode() -> str:
+    """LLM応答キャッシュのモード（off / on / record / replay）。"""
+    load_env()
+    mode = os.environ.get("YUI_LLM_CACHE", "on").strip().lower() or "on"
+    if mode not in ("off", "on", "record", "replay"):
+        print(f"[Config] Unknown YUI_LLM_CACHE '{mode}' (expected off, on, record or replay); using 'on'")
+        return "on"
+    return mode
+
+
+def get_llm_cache_dir() -> Path | None:
+    """LLM応答キャッシュの保存先。未設定ならNone（ワークスペース内に置く）。"""
+    load_env()
+    value = os.environ.get("YUI_LLM_CACHE_DIR", "").strip()
+    return Path(value).expanduser() if value else None
+
+
+def get_memory_refresh_turns() -> int:
+    """記憶テキストをバックグラウンドで取り直すまでのターン数。"""
+    load_env()
+    try:
+        return max(1, int(os.environ.get("YUI_MEMORY_REFRESH_TURNS", "5")))
+    except ValueError:
+        return 5
+
+
+def get_memory_refresh_seconds() -> float:
+    """記憶テキストをバックグラウンドで取り直すまでの秒数。"""
+    load_env()
+    try:
+        return max(1.0, float(os.environ.get("YUI_MEMORY_REFRESH_SECONDS", "600")))
+    except ValueError:
+        return 600.0
+
+
+def get_memory_backend() -> str:
+    """記憶のバックエンド（auto / honcho / local / off）。autoはHonchoのキーがあればhoncho。"""
+    load_env()
+    backend = os.environ.get("YUI_MEMORY_BACKEND", "auto").strip().lower() or "auto"
+    if backend not in ("auto", "honcho", "local", "off"):
+        print(f"[Config] Unknown YUI_MEMORY_BACKEND '{backend}' (expected auto, honcho, local or off); using 'auto'")
+        return "auto"
+    return backend
+
+
+def use_memory_mirror() -> bool:
+    """ローカル記憶の書き込みをHonchoにも複製するか（HONCHO_API_KEYが必要）。"""
+    load_env()
+    return os.environ.get("YUI_MEMORY_MIRROR", "").strip().lower() in ("1", "true", "yes")
+
+
+def use_recall_embeddings() -> bool:
+    """過去の発言の検索結果を埋め込みモデルで並べ替えるか（fastembedが必要）。"""
+    load_env()
+    return os.environ.get("YUI_RECALL_EMBEDDINGS", "").strip().lower() in ("1", "true", "yes")
+
+
+def get_memory_prompt_mode() -> str:
+    """system promptに入れる記憶（card: Peer Cardだけ / full: 要約・表現まで）。"""
+    load_env()
+    mode = os.environ.get("YUI_MEMORY_PROMPT", "card").strip().lower()
+    return mode if mode in ("card", "full") else "card"
@@ -0,0 +1,95 @@
+"""
+YUi Disk Cache - キャッシュ共通のディスク置き場
+
+キー（16進のハッシュ）の先頭2文字でシャードしたディレクトリに、1エントリ1つのJSONファイルを置く。
+  - 書き込みは書き手毎の一時ファイルからos.replace（同時に書いても壊れない）
+  - 合計サイズがmax_bytesを超えたら、最終アクセスが古いものから上限の9割まで消す（LRU）
+  - 最終アクセスはファイルのmtime（読んだときにtouch()で更新する）
+LLMCache（LLM応答）とHttpCache（web_fetch）が使う。
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+
+class DiskLRU:
+    def __init__(self, directory: Path, max_bytes: int, stats: dict, label: str):
+        """statsは呼び出し側の統計（"writes" と "evictions" を数える）。labelはエラー表示用。"""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.stats = stats
+        self.label = label
+        self._total_bytes: int | None = None  # 初回書き込み時に計算
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def read(self, key: str) -> dict | None:
+        """エントリを読む（なければ・壊れていればNone）。最終アクセスは更新しない。"""
+        try:
+            return json.loads(self.path(key).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def touch(self, key: str):
+        """LRU用に最終アクセスを更新する"""
+        try:
+            os.utime(self.path(key))
+        except OSError:
+            pass
+
+    def write(self, key: str, entry: dict) -> bool:
+        """エントリを保存し、上限を超えたら古いものを消す。保存できたらTrue。"""
+        path = self.path(key)
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            old_size = path.stat().st_size if path.exists() else 0
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")  # 書き手毎に別の一時ファイル
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[{self.label}] write error: {e}")
+            return False
+
+        with self._lock:
+            self.stats["writes"] += 1
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += len(data) - old_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+        return True
+
+    def _entries(self) -> list[os.DirEntry]:
+        entries = []
+        if not self.directory.exists():
+            return entries
+        for shard in os.scandir(self.directory):
+            if shard.is_dir():
+                entries.extend(e for e in os.scandir(shard.path) if e.name.endswith(".json"))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(e.stat().st_size for e in self._entries())
+
+    def _evict(self):
+        """最終アクセスが古いものから、上限の9割まで消す"""
+        entries = sorted(self._entries(), key=lambda e: e.stat().st_mtime)
+        total = sum(e.stat().st_size for e in entries)
+        target = int(self.max_bytes * 0.9)
+        for entry in entries:
+            if total <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            total -= size
+            self.stats["evictions"] += 1
+        self._total_bytes = total
@@ -2,10 +2,12 @@
 YUi Tool Base Class
 
 OpenAI function calling形式のスキーマを返す。
+同期のexecute()に加えて、非同期のaexecute()を持つ。
 """
 
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, Callable
 
 
 class BaseTool(ABC):
@@ -13,6 +15,10 @@ class BaseTool(ABC):
 
     name: str = ""
     description: str = ""
+    # 実行中の進捗 (tool_name, text) を受け取る関数（ToolRegistry.set_progress_callbackで設定）
+    on_progress: Callable[[str, str], None] | None = None
+    # 結果の文字数の上限（NoneならAgentLoopのMAX_TOOL_RESULT_CHARS。自分で予算に収めるToolが広げる）
+    max_result_chars: int | None = None
 
     @abstractmethod
     def parameters_schema(self) -> dict:
@@ -34,3 +40,21 @@ class BaseTool(ABC):
     def execute(self, **kwargs) -> Any:
         """Toolを実行"""
         ...
+
+    async def aexecute(self, **kwargs) -> Any:
+        """
+        Toolを非同期で実行。
+        デフォルトはexecute()をスレッドで動かす。ネイティブにasyncで書けるToolはoverrideする。
+        """
+        return await asyncio.to_thread(self.execute, **kwargs)
+
+    def reset(self):
+        """会話のリセット時に呼ばれる（状態を持つToolがoverrideする）"""
+
+    def close(self):
+        """終了時に呼ばれる（プロセスなどを持つToolがoverrideする）"""
+
+    def report_progress(self, text: str):
+        """実行中の進捗を通知（長く動くTool用。コールバックがなければ何もしない）"""
+        if self.on_progress:
+            self.on_progress(self.name, text)
@@ -0,0 +1,96 @@
+"""
+YUi Tool Executor - Tool並列実行
+
+1回のLLM応答に含まれる複数のtool_callsを並列に実行する。
+  - 同時に実行するTool数の上限は設定可能
+  - Tool毎に同時実行数の上限を設定（ファイル書き込みは直列、web_fetchは並列など）
+  - 結果は元のtool_call順で返す（会話に追加する順序を崩さない）
+上限はasyncioのセマフォで守る（同期Toolはaexecute()の既定どおりスレッドで動く）。
+"""
+
+import asyncio
+import contextlib
+from typing import Any, Callable
+
+DEFAULT_MAX_WORKERS = 4
+
+# Tool毎の同時実行数の上限。ここにないToolはmax_workersだけで制限される。
+# "tool:group" のキーはそのToolの特定のactionだけを制限する（ACTION_GROUPS）
+DEFAULT_TOOL_LIMITS = {
+    "shell": 1,  # シェルのセッションは1つ（コマンドは順に実行）
+    "safe_shell": 1,
+    "file_ops:write": 1,  # ファイル書き込みは直列（読み込みや一覧は並列でOK）
+    "safe_file_ops:write": 1,
+    "web_fetch": 8,  # ネットワーク待ちなので並列でOK
+    "web_fetch_batch": 2,  # 1回で最大BATCH_MAX_CONCURRENCY本を並列に取得する
+}
+
+# action → 上限のグループ（追記も書き込みと同じ列に並べる）
+ACTION_GROUPS = {
+    "write": "write",
+    "append": "write",
+}
+
+
+class ToolExecutor:
+    def __init__(
+        self,
+        registry: Any,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        tool_limits: dict[str, int] | None = None,
+    ):
+        self.registry = registry
+        self.max_workers = max(1, max_workers)
+        self.tool_limits = dict(DEFAULT_TOOL_LIMITS)
+        if tool_limits:
+            self.tool_limits.update(tool_limits)
+
+        # セマフォ（イベントループ毎に作り直す）
+        self._async_loop: asyncio.AbstractEventLoop | None = None
+        self._async_workers: asyncio.Semaphore | None = None
+        self._async_semaphores: dict[str, asyncio.Semaphore] = {}
+
+    def _limit_key(self, tool_name: str, params: dict) -> str:
+        """上限のキー（actionのグループに上限があれば "tool:group"、なければTool名）"""
+        action = params.get("action")
+        group = ACTION_GROUPS.get(action) if isinstance(action, str) else None
+        if group and f"{tool_name}:{group}" in self.tool_limits:
+            return f"{tool_name}:{group}"
+        return tool_name
+
+    def _async_semaphores_for(self, key: str) -> list[asyncio.Semaphore]:
+        """ワーカー数と上限のキー毎のasyncioセマフォを取得"""
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            self._async_loop = loop
+            self._async_workers = asyncio.Semaphore(self.max_workers)
+            self._async_semaphores = {}
+
+        sems = [self._async_workers]
+        limit = self.tool_limits.get(key)
+        if limit:
+            if key not in self._async_semaphores:
+                self._async_semaphores[key] = asyncio.Semaphore(limit)
+            sems.insert(0, self._async_semaphores[key])
+        return sems
+
+    async def _arun_one(self, tool_name: str, params: dict, on_start: Callable | None) -> Any:
+        async with contextlib.AsyncExitStack() as stack:
+            for sem in self._async_semaphores_for(self._limit_key(tool_name, params)):
+                await stack.enter_async_context(sem)
+            if on_start:
+                on_start(tool_name)
+            return await self.registry.aexecute(tool_name, params)
+
+    async def aexecute_all(
+        self,
+        calls: list[tuple[str, dict]],
+        on_start: Callable | None = None,
+    ) -> list[Any]:
+        """
+        (tool_name, params) のリストを並行に実行し、入力と同じ順序で結果を返す。
+        on_start(tool_name) は各Toolの実行開始時に呼ばれる。
+        """
+        return await asyncio.gather(
+            *(self._arun_one(name, params, on_start) for name, params in calls)
+        )
@@ -1,16 +1,227 @@
 """
 YUi File Operations Tool - ファイル読み書き
+
+readはファイル全体を読まず、必要な範囲だけを返す（何GBのログでもメモリと時間は一定）。
+  - offset / limit: バイト位置から（seekで読む。UTF-8の文字の途中では切らない）
+  - start_line / end_line: 行の範囲（mmapで改行を探す）
+  - tail: 末尾のN行（mmapで後ろから改行を探す）
+  - 先にサイズを見て、limitより大きいファイルは先頭だけを返し、続きの読み方を添える
+  - 先頭にNULがある・UTF-8でなく制御文字だらけのファイルはバイナリとして読まない
 """
 
+import codecs
+import mmap
 from pathlib import Path
 from typing import Any
 
 from yui.tools.base import BaseTool
+from yui.tools.shell import format_bytes
+
+READ_DEFAULT_CHARS = 3000  # 1回に返す文字数（既定。これまでAgentLoopが残していた量と同じ）
+READ_MAX_CHARS = 12000  # 1回に返す文字数の上限
+UTF8_MAX_BYTES = 4  # 1文字の最大バイト数（limit文字分を読むのに要るバイト数の見積もり）
+SNIFF_BYTES = 8192  # バイナリかどうかを判定する先頭のバイト数
+LINE_SCAN_BYTES = 1024 * 1024  # 行を探すときに一度に改行を数えるバイト数
+BINARY_CONTROL_RATIO = 0.3  # UTF-8でないとき、制御文字がこの割合を超えたらバイナリ
+TEXT_CONTROLS = b"\t\n\r\f\b\x1b"
+
+READ_PARAMETERS = {
+    "offset": {
+        "type": "integer",
+        "description": "read: byte offset to start from",
+    },
+    "limit": {
+        "type": "integer",
+        "description": f"read: maximum characters to return (default: {READ_DEFAULT_CHARS}, max: {READ_MAX_CHARS})",
+    },
+    "start_line": {
+        "type": "integer",
+        "description": "read: first line to return (1-based)",
+    },
+    "end_line": {
+        "type": "integer",
+        "description": "read: last line to return (inclusive)",
+    },
+    "tail": {
+        "type": "integer",
+        "description": "read: return the last N lines",
+    },
+}
+
+
+def is_binary(sample: bytes) -> bool:
+    """先頭のバイト列からバイナリファイルかどうかを判定する"""
+    if b"\0" in sample:
+        return True
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return False
+    except UnicodeDecodeError:
+        pass
+    controls = sum(1 for b in sample if b < 32 and b not in TEXT_CONTROLS)
+    return controls > len(sample) * BINARY_CONTROL_RATIO
+
+
+def _byte_len(text: str) -> int:
+    return len(text.encode("utf-8", errors="surrogateescape"))
+
+
+def _printable(text: str) -> str:
+    """_decode()のテキスト（不正なバイトはサロゲートのまま）を表示用にする"""
+    return text.encode("utf-8", errors="surrogateescape").decode("utf-8", errors="replace")
+
+
+def _decode(data: bytes, limit: int) -> tuple[str, int, int]:
+    """
+    UTF-8として先頭からlimit文字まで読み、(テキスト, 先頭で捨てたバイト数, 使ったバイト数) を返す。
+    先頭の文字の途中のバイトは捨て、末尾の途中で切れた文字は使わない（次の読み出しに回す）。
+    不正なバイトはサロゲートで残す（使ったバイト数を正確に数えるため。表示は_printable()で）。
+    """
+    skip = 0
+    while skip < min(3, len(data)) and 0x80 <= data[skip] < 0xC0:
+        skip += 1
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="surrogateescape")
+    text = decoder.decode(data[skip:], final=False)[:limit]
+    return text, skip, skip + _byte_len(text)
+
+
+def _line_offset(mm: mmap.mmap, line: int) -> int:
+    """line行目（1始まり）の先頭のバイト位置。ファイルの行数より大きければファイルの大きさ。"""
+    pos = 0
+    remaining = line - 1
+    # 改行の数はブロック毎にまとめて数え、目的の行を含むブロックの中だけ1つずつ探す
+    while remaining > 0 and pos < len(mm):
+        block = mm[pos:pos + LINE_SCAN_BYTES]
+        count = block.count(b"\n")
+        if count < remaining:
+            remaining -= count
+            pos += len(block)
+            continue
+        i = -1
+        for _ in range(remaining):
+            i = block.find(b"\n", i + 1)
+        return pos + i + 1
+    return pos if remaining == 0 else len(mm)
+
+
+def _line_range(mm: mmap.mmap, start_line: int, end_line: int | None, window: int) -> tuple[int, int]:
+    """行の範囲を (開始バイト, 終了バイト) で返す。windowバイトを超える分は読まない。"""
+    size = len(mm)
+    start = _line_offset(mm, start_line)
+    stop = min(size, start + window)
+    if end_line is None:
+        return start, stop
+    end = start
+    for _ in range(end_line - start_line + 1):
+        end = mm.find(b"\n", end, stop) + 1
+        if end == 0:
+            return start, stop
+    return start, end
+
+
+def _read_tail(mm: mmap.mmap, lines: int, window: int) -> int:
+    """末尾lines行の開始バイト（windowバイトに収まらなければ、収まる行の区切りから）"""
+    size = len(mm)
+    low = max(0, size - window)
+    pos = size - 1 if size and mm[size - 1] == 0x0A else size  # 最後の改行は行の区切りに数えない
+    for _ in range(lines):
+        pos = mm.rfind(b"\n", low, pos)
+        if pos < 0:
+            if low == 0:
+                return 0
+            # windowに収まらない行は、windowの中の最初の行の区切りから
+            first = mm.find(b"\n", low, size) + 1
+            return first if 0 < first < size else low
+    return pos + 1
+
+
+def read_file(
+    path: Path,
+    offset: int | None = None,
+    limit: int | None = None,
+    start_line: int | None = None,
+    end_line: int | None = None,
+    tail: int | None = None,
+) -> str:
+    """
+    ファイルの一部をテキストで読む（limitは文字数）。範囲の指定がなく、limitに収まるファイルはそのまま全体を返す。
+    それ以外は先頭に [PARTIAL] で読んだ範囲を、末尾に [MORE] で続きの読み方を付ける。
+    """
+    size = path.stat().st_size
+    limit = max(16, min(limit or READ_DEFAULT_CHARS, READ_MAX_CHARS))
+    window = limit * UTF8_MAX_BYTES  # limit文字を読むのに足りるバイト数
+    for name, value in (("offset", offset), ("start_line", start_line), ("end_line", end_line), ("tail", tail)):
+        if value is not None and value < 0:
+            return f"[ERROR] {name} ({value}) must not be negative"
+    if start_line is not None and end_line is not None and end_line < max(1, start_line):
+        return f"[ERROR] end_line ({end_line}) is before start_line ({start_line})"
+    ranged = offset is not None or start_line or end_line or tail
+    with open(path, "rb") as f:
+        if is_binary(f.read(SNIFF_BYTES)):
+            return f"[BINARY] {path.name} ({format_bytes(size)}) does not look like a text file"
+        if not ranged and size <= window:
+            f.seek(0)
+            text = f.read().decode("utf-8", errors="replace")
+            if len(text) <= limit:
+                return text
+
+        lines = ""
+        more = ""
+        if start_line or end_line or tail:
+            if size == 0:
+                return ""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if tail:
+                    start = _read_tail(mm, tail, window)
+                    text, skipped, _ = _decode(mm[start:size], window)
+                    start += skipped
+                    if len(text) > limit:
+                        # 末尾のlimit文字。行の途中から始まるなら次の行から
+                        text = text[-limit:]
+                        newline = text.find("\n")
+                        if 0 <= newline < len(text) - 1:
+                            text = text[newline + 1:]
+                        start = size - _byte_len(text)
+                    end = start + _byte_len(text)
+                    shown = text.count("\n") + (0 if text.endswith("\n") else 1)
+                    lines = f", last {shown} lines" + (f" (of {tail} requested; limit reached)" if shown < tail and start else "")
+                else:
+                    first = max(1, start_line or 1)
+                    start, stop = _line_range(mm, first, end_line, window)
+                    data = mm[start:stop]
+                    text, _, used = _decode(data, limit)
+                    if used < len(data):
+                        # 文字数の上限で切れたら行の区切りまで戻す（1行が長すぎるときは行の途中で切る）
+                        newline = text.rfind("\n")
+                        if newline >= 0:
+                            text = text[:newline + 1]
+                            used = _byte_len(text)
+                    end = start + used
+                    last = first + text.count("\n") - (1 if text.endswith("\n") else 0)
+                    lines = f", lines {first}-{last}" if end > start else f", line {first} is past the end"
+                    if end < size and end > start:
+                        # 行の途中で切れていればその続きから、そうでなければ次の行から
+                        more = f"start_line={last + 1}" if text.endswith("\n") else f"offset={end}"
+        else:
+            start = min(max(0, offset or 0), size)
+            f.seek(start)
+            text, skipped, used = _decode(f.read(window), limit)
+            start, end = start + skipped, start + used
+        if not more and end < size:
+            more = f"offset={end}"
+
+    header = f"[PARTIAL] {path.name}: bytes {start}-{end} of {size} ({format_bytes(size)}){lines}"
+    footer = f"\n[MORE] Continue with {more}" if more else ""
+    return f"{header}\n{_printable(text)}{footer}"
 
 
 class FileOpsTool(BaseTool):
     name = "file_ops"
-    description = "Read, write, list, or append to files on the filesystem."
+    description = (
+        "Read, write, list, or append to files on the filesystem. "
+        "Large files are read in pages: use offset (bytes)/limit (characters), start_line/end_line, or tail."
+    )
+    max_result_chars = READ_MAX_CHARS + 500  # 読む量はlimitで決める（[PARTIAL]などの注記の分を足す）
 
     def parameters_schema(self) -> dict:
         return {
@@ -29,17 +240,31 @@ class FileOpsTool(BaseTool):
                     "type": "string",
                     "description": "Content to write or append (for write/append actions)",
                 },
+                **READ_PARAMETERS,
             },
             "required": ["action", "path"],
         }
 
-    def execute(self, action: str, path: str, content: str = "", **kwargs) -> Any:
+    def execute(
+        self,
+        action: str,
+        path: str,
+        content: str = "",
+        offset: int | None = None,
+        limit: int | None = None,
+        start_line: int | None = None,
+        end_line: int | None = None,
+        tail: int | None = None,
+        **kwargs,
+    ) -> Any:
         p = Path(path).expanduser()
 
         if action == "read":
             if not p.exists():
                 return f"[NOT FOUND] {p}"
-            return p.read_text(encoding="utf-8")
+            if p.is_dir():
+                return f"[ERROR] {p} is a directory"
+            return read_file(p, offset, limit, start_line, end_line, tail)
 
         elif action == "write":
             p.parent.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,197 @@
+"""
+YUi HTTP Cache - web_fetchのディスクキャッシュ
+
+同じドキュメントのURLを何度も取りに行かないよう、レスポンスをURL毎にディスクへ保存する。
+  - 生の本文（デコード済みテキスト）と、抽出したMarkdownの両方を保存する
+  - Cache-Control (max-age / no-cache / no-store) とExpiresに従い、新しいうちはネットワークに出ない
+  - 古くなったらETag / Last-Modifiedで条件付きリクエストを送り、304なら本文を送り直させない
+  - 置き場と容量の管理（max_bytesを超えたら最終アクセスが古いものから消すLRU）はDiskLRU
+
+モード (YUI_WEB_CACHE):
+  - off     : 使わない
+  - on      : 上のとおり。既定
+  - offline : キャッシュがあれば古くてもそのまま返す（オフライン優先）。ないときだけ取得する
+"""
+
+import email.utils
+import hashlib
+import threading
+import time
+from pathlib import Path
+
+from yui.disk_cache import DiskLRU
+
+MODES = ("off", "on", "offline")
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+HEURISTIC_FRESHNESS = 0.1  # max-ageがないとき、Last-Modifiedからの経過時間のこの割合だけ新しいとみなす
+HEURISTIC_MAX_SECONDS = 24 * 60 * 60
+
+
+def _parse_date(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness(headers: dict, now: float) -> tuple[float, bool, bool]:
+    """
+    レスポンスヘッダから (新しいとみなす秒数, 保存してよいか, 毎回確認が要るか) を求める。
+    headersのキーは小文字（cache-control / expires / date / last-modified）。
+    """
+    directives = {}
+    for part in (headers.get("cache-control") or "").lower().split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name] = value.strip('"')
+    if "no-store" in directives:
+        return 0.0, False, True
+    if "no-cache" in directives:
+        return 0.0, True, True
+    if directives.get("max-age", "").isdigit():
+        return float(directives["max-age"]), True, False
+
+    date = _parse_date(headers.get("date")) or now
+    expires = _parse_date(headers.get("expires"))
+    if expires is not None:
+        return max(0.0, expires - date), True, False
+    last_modified = _parse_date(headers.get("last-modified"))
+    if last_modified is not None:
+        return min(max(0.0, (date - last_modified) * HEURISTIC_FRESHNESS), HEURISTIC_MAX_SECONDS), True, False
+    return 0.0, True, False
+
+
+class HttpCache:
+    def __init__(self, directory: Path, mode: str = "on", max_bytes: int = DEFAULT_MAX_BYTES):
+        if mode not in MODES:
+            raise ValueError(f"Unknown web cache mode '{mode}' (expected one of {', '.join(MODES)})")
+        self.directory = directory
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.stats = {
+            "hits": 0,  # ネットワークに出ずに返した
+            "revalidated": 0,  # 304 Not Modified（本文の転送なし）
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+            "bytes_saved": 0,  # 転送せずに済んだ本文のバイト数
+        }
+        self.store = DiskLRU(directory, max_bytes, self.stats, "WebCache")
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    @property
+    def hit_rate(self) -> float | None:
+        """キャッシュから返せた割合（304も含む）"""
+        served = self.stats["hits"] + self.stats["revalidated"]
+        total = served + self.stats["misses"]
+        return served / total if total else None
+
+    def record_served(self, entry: dict, revalidated: bool = False):
+        """キャッシュから返した（revalidated: 304で確認した）"""
+        with self._lock:
+            self.stats["revalidated" if revalidated else "hits"] += 1
+            self.stats["bytes_saved"] += entry.get("bytes", 0)
+
+    def record_miss(self):
+        with self._lock:
+            self.stats["misses"] += 1
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def get(self, url: str) -> dict | None:
+        """保存済みのエントリ（なければNone）。LRU用に最終アクセスを更新する。"""
+        if not self.enabled:
+            return None
+        key = self._key(url)
+        entry = self.store.read(key)
+        if not entry or entry.get("url") != url:
+            return None
+        self.store.touch(key)
+        return entry
+
+    def is_fresh(self, entry: dict, now: float | None = None) -> bool:
+        """ネットワークに出ずにそのまま返してよいか"""
+        if self.mode == "offline":
+            return True
+        if entry.get("no_cache"):
+            return False
+        now = time.time() if now is None else now
+        return now - entry.get("validated", 0) < entry.get("max_age", 0)
+
+    @staticmethod
+    def validators(entry: dict) -> dict:
+        """条件付きリクエストのヘッダ"""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def satisfies(self, entry: dict, max_chars: int, extract: bool = True) -> bool:
+        """
+        保存済みの本文で今回の要求を満たせるか（途中までしか読んでいない本文は、足りる長さのときだけ）。
+        HTMLの本文の抽出には、抽出済みのMarkdownか最後まで読んだ本文が要る（途中までのHTMLからは抽出しない）。
+        """
+        if entry.get("raw") is None:
+            return False
+        if extract and entry.get("html") and not entry.get("text") and entry.get("truncated") is not None:
+            return False
+        if entry.get("truncated") == "chars":
+            return len(entry["raw"]) >= max_chars
+        return True
+
+    def put(self, url: str, result: dict):
+        """fetch()の結果を保存する（200以外・no-storeは保存しない）"""
+        if not self.enabled or result.get("status") != 200:
+            return
+        headers = result.get("headers") or {}
+        now = time.time()
+        max_age, storable, no_cache = freshness(headers, now)
+        if not storable:
+            return
+        entry = {
+            "url": url,
+            "final_url": result.get("url"),
+            "created": now,
+            "validated": now,
+            "max_age": max_age,
+            "no_cache": no_cache,
+            "status": result["status"],
+            "reason": result.get("reason"),
+            "content_type": result.get("content_type"),
+            "charset": result.get("charset"),
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "bytes": result.get("bytes", 0),
+            "raw": result.get("raw"),
+            "html": result.get("html", False),
+            # 抽出したMarkdown（抽出していなければrawと同じなので保存しない）
+            "text": result.get("text") if result.get("extracted") else None,
+            "truncated": result.get("truncated"),
+        }
+        self._write(url, entry)
+
+    def touch(self, url: str, entry: dict, headers: dict):
+        """304 Not Modified: 確認した時刻と新しさを更新する"""
+        now = time.time()
+        # 304にLast-Modifiedがなければ保存済みの値で新しさを見積もる
+        headers = {"last-modified": entry.get("last_modified"), **headers}
+        max_age, storable, no_cache = freshness(headers, now)
+        if not storable:
+            return
+        entry.update(validated=now, max_age=max_age, no_cache=no_cache)
+        if headers.get("etag"):
+            entry["etag"] = headers["etag"]
+        self._write(url, entry)
+
+    def _write(self, url: str, entry: dict):
+        self.store.write(self._key(url), entry)
@@ -0,0 +1,101 @@
+"""
+YUi Memory Tool - 必要なときだけ記憶を引く
+
+記憶を毎回system promptに詰め込む代わりに、モデルが必要なときに呼ぶ。
+  - search: 過去の発言を検索（ローカル索引。見つからなければHoncho側も）
+  - recall: 創造者についての要約・理解・前回のやりとり
+  - ask   : 創造者について自然言語で質問（HonchoのDialectic。遅くて高い）
+結果はセッション毎にキャッシュし、同じ問い合わせを繰り返さない。
+"""
+
+from datetime import datetime
+from typing import Any
+
+from yui.tools.base import BaseTool
+
+ACTIONS = ("search", "recall", "ask")
+MAX_RESULT_CHARS = 300  # 検索結果1件あたりの上限
+
+
+class MemoryTool(BaseTool):
+    name = "memory"
+    description = (
+        "Look up your long-term memory of the user and past conversations. "
+        "Use it only when the reply depends on something from before this conversation. "
+        "Actions: search (find past messages about a topic), "
+        "recall (what you know about the user and how the last conversation ended), "
+        "ask (ask a natural-language question about the user; slower)."
+    )
+
+    def __init__(self, memory: Any):
+        self.memory = memory
+        self.stats = {"hits": 0, "misses": 0}
+        self._cache: dict[tuple, str] = {}
+        self._cache_session: str | None = None
+
+    def parameters_schema(self) -> dict:
+        return {
+            "type": "object",
+            "properties": {
+                "action": {
+                    "type": "string",
+                    "enum": list(ACTIONS),
+                    "description": "search, recall or ask",
+                },
+                "query": {
+                    "type": "string",
+                    "description": "Search query (search) or question (ask)",
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Maximum results for search (default: 5)",
+                },
+            },
+            "required": ["action"],
+        }
+
+    def execute(self, action: str, query: str = "", limit: int = 5, **kwargs) -> Any:
+        if action not in ACTIONS:
+            return f"[ERROR] Unknown action '{action}' (expected one of {', '.join(ACTIONS)})"
+        query = (query or "").strip()
+        if action in ("search", "ask") and not query:
+            return f"[ERROR] query is required for {action}"
+
+        # キャッシュはセッション毎（/resetで新しいセッションになったら捨てる）
+        if self.memory.session_id != self._cache_session:
+            self._cache.clear()
+            self._cache_session = self.memory.session_id
+
+        key = (action, query, limit)
+        if key in self._cache:
+            self.stats["hits"] += 1
+            return self._cache[key]
+        self.stats["misses"] += 1
+
+        try:
+            if action == "search":
+                result = self._search(query, limit)
+            elif action == "recall":
+                result = self.memory.recall() or "まだ記憶がありません。"
+            else:
+                result = self.memory.ask_about_creator(query)
+        except Exception as e:
+            return f"[ERROR] {e}"
+
+        self._cache[key] = result
+        return result
+
+    def _search(self, query: str, limit: int) -> str:
+        limit = max(1, min(limit, 20))
+        hits = self.memory.search(query, limit=limit, exclude_session=self.memory.session_id)
+        if not hits:
+            hits = self.memory.search_remote(query, limit=limit)
+        if not hits:
+            return "該当する記憶はありません。"
+
+        lines = []
+        for hit in hits:
+            role = "創造者" if hit["peer"] == self.memory.creator_name else "YUI"
+            day = datetime.fromtimestamp(hit["created_at"]).strftime("%Y-%m-%d")
+            lines.append(f"- [{day}] {role}: {hit['content'][:MAX_RESULT_CHARS]}")
+        return "\n".join(lines)
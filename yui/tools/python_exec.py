@@ -0,0 +1,278 @@
+"""
+YUi Python Exec Tool - 事前に起動したワーカーでPythonを実行
+
+`python3 -c ...` をshellで毎回起動する代わりに、起動済み・import済みのワーカープロセス
+(python_worker.py) にコードを送って実行する。
+  - プールは常に数個のワーカーを温めておき、使ったら裏で補充する（起動とimportの待ち時間なし）
+  - ワーカーは名前付きのセッション毎に1つ割り当て、変数・import・関数定義が次の呼び出しに残る
+  - 呼び出し毎にCPU時間、ワーカー毎にメモリを制限する（rlimit）
+  - 結果は stdout / stderr / result（最後の式の値）/ error を持つdictで返す
+タイムアウトやクラッシュでワーカーが止まったら捨て、そのセッションは次の呼び出しで新しいワーカーになる。
+"""
+
+import json
+import os
+import selectors
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from yui.config import get_python_memory_mb, get_python_preimport, get_python_workers
+from yui.tools.base import BaseTool
+from yui.tools.python_worker import MAX_OUTPUT_CHARS, MAX_RESULT_CHARS, MAX_TRACEBACK_CHARS
+
+WORKER_SCRIPT = Path(__file__).with_name("python_worker.py")
+WORKER_START_TIMEOUT = 30.0  # ワーカーの準備完了を待つ秒数
+CPU_GRACE_SECONDS = 2.0  # CPU時間の上限で止まる余地（計算だけのコードはワーカーを捨てずにエラーで返る）
+DEFAULT_SESSION = "default"
+# 結果のdictをJSONにしたときの上限の見積もり（stdout・stderr・result・error。エスケープの分を25%見込む）
+MAX_RESULT_JSON_CHARS = int((2 * MAX_OUTPUT_CHARS + 2 * MAX_RESULT_CHARS + MAX_TRACEBACK_CHARS) * 1.25) + 500
+
+
+class WorkerError(Exception):
+    """ワーカーが応答しない・終了した"""
+
+
+class PythonWorker:
+    def __init__(self, memory_mb: int, preimport: list[str], cwd: Path | None = None):
+        self.proc = subprocess.Popen(
+            [sys.executable, "-u", str(WORKER_SCRIPT), str(memory_mb), ",".join(preimport)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=cwd,
+            bufsize=0,
+            start_new_session=True,
+        )
+        self.calls = 0
+        self._buffer = b""
+        self._lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def wait_ready(self, timeout: float = WORKER_START_TIMEOUT):
+        """起動とimportが終わるまで待つ"""
+        message = self._read_line(time.monotonic() + timeout)
+        if not message.get("ready"):
+            raise WorkerError("worker did not start")
+
+    def _read_line(self, deadline: float) -> dict:
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.proc.stdout, selectors.EVENT_READ)
+            while b"\n" not in self._buffer:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError
+                if not selector.select(remaining):
+                    continue
+                data = os.read(self.proc.stdout.fileno(), 65536)
+                if not data:
+                    raise WorkerError(f"worker exited (code {self.proc.wait()})")
+                self._buffer += data
+        line, _, self._buffer = self._buffer.partition(b"\n")
+        return json.loads(line)
+
+    def run(self, code: str, timeout: float, cpu_seconds: float) -> dict:
+        """コードを実行して結果のdictを返す（TimeoutError / WorkerError）"""
+        with self._lock:
+            self.calls += 1
+            request = json.dumps({"code": code, "cpu_seconds": cpu_seconds}) + "\n"
+            try:
+                self.proc.stdin.write(request.encode("utf-8"))
+            except BrokenPipeError:
+                raise WorkerError(f"worker exited (code {self.proc.wait()})") from None
+            return self._read_line(time.monotonic() + timeout)
+
+    def kill(self):
+        """ワーカーをプロセスグループごと終了する（コードが起動した子プロセスも残さない）"""
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.proc.wait()
+        for pipe in (self.proc.stdin, self.proc.stdout):
+            pipe.close()
+
+
+class PythonWorkerPool:
+    """起動済みのワーカーを常にsize個用意しておくプール"""
+
+    def __init__(self, size: int, memory_mb: int, preimport: list[str], cwd: Path | None = None):
+        self.size = size
+        self.memory_mb = memory_mb
+        self.preimport = preimport
+        self.cwd = cwd
+        self.stats = {"started": 0, "warm_hits": 0, "cold_starts": 0}
+        self._idle: list[PythonWorker] = []
+        self._lock = threading.Lock()
+        self._filling = False
+        self._closed = False
+
+    def _start_worker(self) -> PythonWorker:
+        worker = PythonWorker(self.memory_mb, self.preimport, self.cwd)
+        try:
+            worker.wait_ready()
+        except Exception:
+            worker.kill()
+            raise
+        self.stats["started"] += 1
+        return worker
+
+    def fill(self):
+        """足りない分のワーカーをバックグラウンドで起動する"""
+        with self._lock:
+            if self._filling or self._closed or len(self._idle) >= self.size:
+                return
+            self._filling = True
+        threading.Thread(target=self._fill, daemon=True, name="yui-python-pool").start()
+
+    def _fill(self):
+        try:
+            while True:
+                with self._lock:
+                    if self._closed or len(self._idle) >= self.size:
+                        return
+                try:
+                    worker = self._start_worker()
+                except Exception as e:
+                    print(f"[PythonExec] worker start error: {e}")
+                    return
+                with self._lock:
+                    if self._closed:
+                        worker.kill()
+                        return
+                    self._idle.append(worker)
+        finally:
+            with self._lock:
+                self._filling = False
+
+    def acquire(self) -> PythonWorker:
+        """温めておいたワーカーを取り出す（なければその場で起動）。取り出した分は裏で補充する。"""
+        worker = None
+        with self._lock:
+            while self._idle and worker is None:
+                candidate = self._idle.pop(0)
+                if candidate.alive:
+                    worker = candidate
+                else:
+                    candidate.kill()
+        if worker:
+            self.stats["warm_hits"] += 1
+        else:
+            self.stats["cold_starts"] += 1
+            worker = self._start_worker()
+        self.fill()
+        return worker
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.kill()
+
+
+class PythonExecTool(BaseTool):
+    name = "python_exec"
+    description = (
+        "Run Python code in a warm, persistent interpreter. "
+        "Variables, imports and functions persist between calls in the same session. "
+        "The value of the last expression is returned as 'result'. "
+        "Output of os.system and subprocesses is included in stdout/stderr. "
+        "Prefer this over running python through the shell."
+    )
+    # ワーカーが出力の先頭と末尾を残して返すので、AgentLoopの既定の上限で先頭から切らない（JSONも壊さない）
+    max_result_chars = MAX_RESULT_JSON_CHARS
+
+    def __init__(self, cwd: Path | None = None):
+        self.pool = PythonWorkerPool(
+            get_python_workers(),
+            get_python_memory_mb(),
+            get_python_preimport(),
+            cwd=cwd,
+        )
+        self.sessions: dict[str, PythonWorker] = {}
+        self._lock = threading.Lock()
+        # プールは最初の呼び出しで温め始める（使わない会話ではワーカーを起動しない）
+
+    def parameters_schema(self) -> dict:
+        return {
+            "type": "object",
+            "properties": {
+                "code": {
+                    "type": "string",
+                    "description": "Python code to execute",
+                },
+                "session": {
+                    "type": "string",
+                    "description": f"Name of the interpreter session whose state to use (default: {DEFAULT_SESSION})",
+                },
+                "timeout": {
+                    "type": "integer",
+                    "description": "Timeout in seconds; also the CPU time limit (default: 30)",
+                },
+                "reset": {
+                    "type": "boolean",
+                    "description": "Discard the session state before running (default: false)",
+                },
+            },
+            "required": ["code"],
+        }
+
+    def _worker(self, session: str, reset: bool) -> PythonWorker:
+        with self._lock:
+            worker = self.sessions.get(session)
+            if worker and (reset or not worker.alive):
+                worker.kill()
+                worker = None
+            if worker is None:
+                worker = self.pool.acquire()
+                self.sessions[session] = worker
+            return worker
+
+    def _discard(self, session: str, worker: PythonWorker):
+        with self._lock:
+            if self.sessions.get(session) is worker:
+                del self.sessions[session]
+        worker.kill()
+
+    def execute(
+        self,
+        code: str,
+        session: str = DEFAULT_SESSION,
+        timeout: int = 30,
+        reset: bool = False,
+        **kwargs,
+    ) -> Any:
+        session = session or DEFAULT_SESSION
+        try:
+            worker = self._worker(session, reset)
+        except Exception as e:
+            return f"[ERROR] Could not start a Python worker: {e}"
+        try:
+            return worker.run(code, timeout + CPU_GRACE_SECONDS, cpu_seconds=timeout)
+        except TimeoutError:
+            self._discard(session, worker)
+            return f"[TIMEOUT] Code exceeded {timeout}s (session '{session}' was reset)"
+        except WorkerError as e:
+            self._discard(session, worker)
+            return f"[ERROR] {e} (session '{session}' was reset)"
+        except Exception as e:
+            return f"[ERROR] {e}"
+
+    def reset(self):
+        """会話のリセット: 全セッションのワーカーを捨てる"""
+        with self._lock:
+            workers, self.sessions = list(self.sessions.values()), {}
+        for worker in workers:
+            worker.kill()
+
+    def close(self):
+        self.reset()
+        self.pool.close()
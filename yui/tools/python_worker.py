@@ -0,0 +1,206 @@
+"""
+YUi Python Worker - python_exec Toolのワーカープロセス
+
+python_exec.pyから `python -u python_worker.py <memory_mb> <preimport>` で起動される（yuiはimportしない）。
+  - 起動時によく使うモジュールをimportしておき、準備ができたら {"ready": true} を返す
+  - 1行1リクエストのJSON ({"code", "cpu_seconds"}) を受け取り、1行1結果のJSONを返す
+  - 名前空間はプロセスの間ずっと残る（変数・import・関数定義が次の呼び出しに引き継がれる）
+  - 最後の文が式なら、その値のreprをresultとして返す（ノートブックと同じ）
+  - メモリはRLIMIT_AS、CPU時間は呼び出し毎にRLIMIT_CPUで制限する
+  - fd 1/2は一時ファイルに向け、os.systemや子プロセスの出力もstdout/stderrに含める
+"""
+
+import ast
+import importlib
+import io
+import json
+import math
+import os
+import resource
+import signal
+import sys
+import tempfile
+import time
+import traceback
+
+MAX_OUTPUT_CHARS = 8000  # stdout/stderrそれぞれの上限（先頭と末尾を残す）
+MAX_RESULT_CHARS = 4000  # resultのreprの上限
+MAX_TRACEBACK_CHARS = 2000  # tracebackの上限（末尾を残す）
+FD_READ_BYTES = 256 * 1024  # fdへの出力を読むのは先頭と末尾のこのバイト数まで
+
+
+class CpuLimitExceeded(BaseException):
+    """RLIMIT_CPUのソフトリミットに達した（SIGXCPU）。Exceptionで握りつぶされないようBaseException。"""
+
+
+class _Capture(io.TextIOBase):
+    """print等の出力を先頭と末尾だけ残す"""
+
+    def __init__(self, limit: int = MAX_OUTPUT_CHARS):
+        self.head_limit = limit // 2
+        self.tail_limit = limit - self.head_limit
+        self.head = ""
+        self.tail = ""
+        self.total = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        written = len(text)
+        self.total += written
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head += text[:room]
+            text = text[room:]
+        if text:
+            self.tail = (self.tail + text)[-self.tail_limit:]
+        return written
+
+    def getvalue(self) -> str:
+        omitted = self.total - len(self.head) - len(self.tail)
+        if omitted > 0:
+            return f"{self.head}\n... [{omitted} chars omitted] ...\n{self.tail}"
+        return self.head + self.tail
+
+
+class _FdCapture:
+    """fdへ直接書かれた出力（os.system・子プロセス・C拡張）を一時ファイルで受け取る"""
+
+    def __init__(self, fd: int):
+        self.fd = fd
+        self.file = tempfile.TemporaryFile()
+        os.dup2(self.file.fileno(), fd)
+
+    def reset(self):
+        os.ftruncate(self.fd, 0)
+        os.lseek(self.fd, 0, os.SEEK_SET)
+
+    def drain(self, capture: _Capture):
+        """書かれた分をcaptureに足す（大きければ先頭と末尾だけ読む）"""
+        size = os.lseek(self.fd, 0, os.SEEK_END)
+        if not size:
+            return
+        if size <= 2 * FD_READ_BYTES:
+            capture.write(os.pread(self.fd, size, 0).decode("utf-8", errors="replace"))
+            return
+        capture.write(os.pread(self.fd, FD_READ_BYTES, 0).decode("utf-8", errors="replace"))
+        capture.total += size - 2 * FD_READ_BYTES  # 読まなかった分もomittedに数える
+        capture.write(os.pread(self.fd, FD_READ_BYTES, size - FD_READ_BYTES).decode("utf-8", errors="replace"))
+
+
+def _on_xcpu(signum, frame):
+    raise CpuLimitExceeded()
+
+
+def _cpu_time() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _set_cpu_limit(cpu_seconds: float | None):
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if cpu_seconds:
+        soft = math.ceil(_cpu_time() + cpu_seconds)
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+    else:
+        soft = hard
+    try:
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    except (ValueError, OSError):
+        pass
+
+
+def run(code: str, namespace: dict, cpu_seconds: float | None, fd_captures: tuple[_FdCapture, _FdCapture]) -> dict:
+    stdout, stderr = _Capture(), _Capture()
+    for fd_capture in fd_captures:
+        fd_capture.reset()
+    result = None
+    error = None
+    start = time.perf_counter()
+    cpu_start = _cpu_time()
+    saved = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = stdout, stderr
+    _set_cpu_limit(cpu_seconds)
+    try:
+        tree = ast.parse(code, "<python_exec>", "exec")
+        last = None
+        if tree.body and isinstance(tree.body[-1], ast.Expr):
+            last = ast.Expression(tree.body.pop().value)
+        exec(compile(tree, "<python_exec>", "exec"), namespace)
+        if last is not None:
+            value = eval(compile(last, "<python_exec>", "eval"), namespace)
+            if value is not None:
+                result = repr(value)
+                if len(result) > MAX_RESULT_CHARS:
+                    result = result[:MAX_RESULT_CHARS] + f"... [{len(result) - MAX_RESULT_CHARS} chars omitted]"
+    except CpuLimitExceeded:
+        error = {"type": "CpuLimitExceeded", "message": f"CPU time limit of {cpu_seconds}s exceeded", "traceback": ""}
+    except BaseException as e:  # SystemExit・KeyboardInterruptもワーカーを止めずに結果として返す
+        tb = "".join(traceback.format_exception(type(e), e, e.__traceback__.tb_next if e.__traceback__ else None))
+        error = {
+            "type": type(e).__name__,
+            "message": str(e)[:MAX_RESULT_CHARS],
+            "traceback": tb if len(tb) <= MAX_TRACEBACK_CHARS else "...\n" + tb[-MAX_TRACEBACK_CHARS:],
+        }
+    finally:
+        _set_cpu_limit(None)
+        sys.stdout, sys.stderr = saved
+    fd_captures[0].drain(stdout)
+    fd_captures[1].drain(stderr)
+    return {
+        "ok": error is None,
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+        "result": result,
+        "error": error,
+        "duration": round(time.perf_counter() - start, 4),
+        "cpu_time": round(_cpu_time() - cpu_start, 4),
+    }
+
+
+def main():
+    memory_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    preimport = [name for name in (sys.argv[2] if len(sys.argv) > 2 else "").split(",") if name]
+
+    # プロトコル用にstdin/stdoutを複製し、fd 0/1はユーザーのコードから切り離す
+    # （子プロセスがfd 1に直接書いてもプロトコルが壊れないように。fd 1/2の出力は一時ファイルで受け取る）
+    proto_in = os.fdopen(os.dup(0), "r", encoding="utf-8")
+    proto_out = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    fd_captures = (_FdCapture(1), _FdCapture(2))
+    sys.stdin = open(os.devnull, encoding="utf-8")
+
+    for name in preimport:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+
+    if memory_mb > 0:
+        limit = memory_mb * 1024 * 1024
+        try:
+            _, hard = resource.getrlimit(resource.RLIMIT_AS)
+            resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+        except (ValueError, OSError):
+            pass
+    signal.signal(signal.SIGXCPU, _on_xcpu)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+    proto_out.write(json.dumps({"ready": True, "pid": os.getpid()}) + "\n")
+    proto_out.flush()
+    for line in proto_in:
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        response = run(request.get("code", ""), namespace, request.get("cpu_seconds"), fd_captures)
+        proto_out.write(json.dumps(response, ensure_ascii=False) + "\n")
+        proto_out.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,8 @@ from typing import Any
 
 from yui.tools.shell import ShellTool
 from yui.tools.file_ops import FileOpsTool
-from yui.tools.web import WebTool
+from yui.tools.python_exec import PythonExecTool
+from yui.tools.web import WebBatchTool, WebTool
 
 
 class ToolRegistry:
@@ -18,9 +19,33 @@ class ToolRegistry:
 
     def _register_defaults(self):
         """デフォルトToolを登録"""
-        for tool_cls in [ShellTool, FileOpsTool, WebTool]:
+        for tool_cls in [ShellTool, FileOpsTool, WebTool, PythonExecTool]:
             tool = tool_cls()
             self.tools[tool.name] = tool
+        # まとめて取得するToolはweb_fetchのキャッシュを共有する
+        self.register(WebBatchTool(self.tools[WebTool.name]))
+
+    def register(self, tool: Any):
+        """Toolを追加登録（依存を渡して作るTool用。例: MemoryTool）"""
+        self.tools[tool.name] = tool
+
+    def set_progress_callback(self, callback):
+        """実行中のToolの進捗 (tool_name, text) を受け取る関数を全Toolに設定"""
+        for tool in self.tools.values():
+            tool.on_progress = callback
+
+    def reset(self):
+        """会話のリセット: Toolの状態（シェルのセッションなど）を捨てる"""
+        for tool in self.tools.values():
+            tool.reset()
+
+    def close(self):
+        """全Toolの後始末"""
+        for tool in self.tools.values():
+            try:
+                tool.close()
+            except Exception as e:
+                print(f"[Tools] close error ({tool.name}): {e}")
 
     def get_tool_schemas(self) -> list[dict]:
         """全Toolのスキーマを返す（Anthropic API形式）"""
@@ -35,3 +60,13 @@ class ToolRegistry:
             return tool.execute(**params)
         except Exception as e:
             return f"Error executing {tool_name}: {e}"
+
+    async def aexecute(self, tool_name: str, params: dict) -> Any:
+        """Tool名とパラメータで非同期実行"""
+        tool = self.tools.get(tool_name)
+        if not tool:
+            return f"Error: Unknown tool '{tool_name}'"
+        try:
+            return await tool.aexecute(**params)
+        except Exception as e:
+            return f"Error executing {tool_name}: {e}"
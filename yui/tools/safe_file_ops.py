@@ -8,11 +8,16 @@ from pathlib import Path
 from typing import Any
 
 from yui.tools.base import BaseTool
+from yui.tools.file_ops import READ_MAX_CHARS, READ_PARAMETERS, read_file
 
 
 class SafeFileOpsTool(BaseTool):
     name = "safe_file_ops"
-    description = "Safe file operations within workspace sandbox."
+    description = (
+        "Safe file operations within workspace sandbox. "
+        "Large files are read in pages: use offset (bytes)/limit (characters), start_line/end_line, or tail."
+    )
+    max_result_chars = READ_MAX_CHARS + 500
 
     def parameters_schema(self) -> dict:
         return {
@@ -31,6 +36,7 @@ class SafeFileOpsTool(BaseTool):
                     "type": "string",
                     "description": "Content to write or append (for write/append actions)",
                 },
+                **READ_PARAMETERS,
             },
             "required": ["action", "path"],
         }
@@ -55,7 +61,18 @@ class SafeFileOpsTool(BaseTool):
         except Exception as e:
             return None, f"Invalid path: {e}"
 
-    def execute(self, action: str, path: str, content: str = "", **kwargs) -> Any:
+    def execute(
+        self,
+        action: str,
+        path: str,
+        content: str = "",
+        offset: int | None = None,
+        limit: int | None = None,
+        start_line: int | None = None,
+        end_line: int | None = None,
+        tail: int | None = None,
+        **kwargs,
+    ) -> Any:
         safe_path, error = self._get_safe_path(path)
         if not safe_path:
             return f"[BLOCKED] {error}"
@@ -64,7 +81,9 @@ class SafeFileOpsTool(BaseTool):
             if action == "read":
                 if not safe_path.exists():
                     return f"[NOT FOUND] {path}"
-                return safe_path.read_text(encoding="utf-8")
+                if safe_path.is_dir():
+                    return f"[ERROR] {path} is a directory"
+                return read_file(safe_path, offset, limit, start_line, end_line, tail)
 
             elif action == "write":
                 safe_path.parent.mkdir(parents=True, exist_ok=True)
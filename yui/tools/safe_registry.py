@@ -7,7 +7,7 @@ from typing import Dict, Type
 from yui.tools.base import BaseTool
 from yui.tools.safe_shell import SafeShellTool
 from yui.tools.safe_file_ops import SafeFileOpsTool
-from yui.tools.web import WebTool
+from yui.tools.web import WebBatchTool, WebTool
 
 
 class SafeToolRegistry:
@@ -19,10 +19,12 @@ class SafeToolRegistry:
     
     def _register_safe_tools(self):
         """安全なツールを登録"""
+        web = WebTool()  # Web接続は比較的安全とみなす
         safe_tools = [
             SafeShellTool(),
             SafeFileOpsTool(),
-            WebTool(),  # Web接続は比較的安全とみなす
+            web,
+            WebBatchTool(web),
         ]
         
         for tool in safe_tools:
@@ -2,26 +2,34 @@
 YUi Safe Shell Tool - セキュアなコマンド実行
 
 許可されたコマンドのみ実行可能
-ワークスペース内でのみ動作
+ワークスペース内でのみ動作（シェルのセッションを使い回す場合も、作業ディレクトリはワークスペース内に戻す）
 """
 
+import asyncio
 import subprocess
 from pathlib import Path
 from typing import Any
 
 from yui.tools.base import BaseTool
+from yui.config import use_shell_session
+from yui.tools.shell import arun_in_session, format_output, format_timeout, run_async, run_in_session
+from yui.tools.shell_session import ShellSession
 
 
 class SafeShellTool(BaseTool):
     name = "safe_shell"
     description = "Execute safe shell commands in workspace sandbox."
 
+    def __init__(self):
+        self.session: ShellSession | None = None
+
     # 許可されたコマンド
     ALLOWED_COMMANDS = {
         'ls', 'cat', 'echo', 'pwd', 'mkdir', 'touch', 'grep', 'find',
         'python', 'python3', 'pip', 'pip3', 'node', 'npm', 'yarn',
         'git', 'curl', 'wget', 'head', 'tail', 'wc', 'sort', 'uniq',
-        'cp', 'mv', 'rm'  # ファイル操作は制限付きで許可
+        'cp', 'mv', 'rm',  # ファイル操作は制限付きで許可
+        'cd',  # セッション内の移動（ワークスペース内のディレクトリを1つだけ指定。_check_cdで確認）
     }
     
     # 危険なオプション
@@ -37,6 +45,9 @@ class SafeShellTool(BaseTool):
         '$(',  # コマンド置換
         '>',   # リダイレクト（制限）
         '>>',  # リダイレクト（制限）
+        '$',   # 変数展開（$HOME・$OLDPWDなどでワークスペースの外を指せる）
+        '\n',  # 改行（セッションのシェルでは2つ目のコマンドになる）
+        '\r',
     ]
 
     def parameters_schema(self) -> dict:
@@ -55,8 +66,8 @@ class SafeShellTool(BaseTool):
             "required": ["command"],
         }
 
-    def _is_safe_command(self, command: str) -> tuple[bool, str]:
-        """コマンドが安全かチェック"""
+    def _is_safe_command(self, command: str, cwd: Path | None = None) -> tuple[bool, str]:
+        """コマンドが安全かチェック（cwdはcdの移動先を確かめる基準。セッションの作業ディレクトリかワークスペース）"""
         parts = command.strip().split()
         if not parts:
             return False, "Empty command"
@@ -70,40 +81,73 @@ class SafeShellTool(BaseTool):
         # 危険なパターンをチェック
         for pattern in self.DANGEROUS_PATTERNS:
             if pattern in command:
-                return False, f"Dangerous pattern '{pattern}' detected"
-        
+                return False, f"Dangerous pattern {pattern!r} detected"
+
+        if base_command == 'cd':
+            return self._check_cd(parts[1:], cwd)
+
+        return True, "OK"
+
+    def _check_cd(self, args: list[str], cwd: Path | None) -> tuple[bool, str]:
+        """cdは実行前に確かめる: 引数はちょうど1つで、移動先（シンボリックリンクを解決）がワークスペース内"""
+        workspace = (Path.cwd() / "workspace").resolve()
+        if len(args) != 1 or args[0].startswith('-'):
+            return False, "cd takes exactly one directory inside the workspace"
+        target = ((cwd or workspace) / args[0]).resolve()
+        if not target.is_relative_to(workspace):
+            return False, f"cd target outside workspace: {args[0]}"
         return True, "OK"
 
+    def _session(self, workspace: Path) -> ShellSession | None:
+        """ワークスペースに閉じ込めたシェルのセッション（無効ならNone）"""
+        if not use_shell_session():
+            return None
+        if self.session is None:
+            self.session = ShellSession(cwd=workspace, confine=workspace)
+        return self.session
+
     def execute(self, command: str, timeout: int = 30, **kwargs) -> Any:
+        workspace = Path.cwd() / "workspace"
+        workspace.mkdir(exist_ok=True)
+
+        session = self._session(workspace)
+        is_safe, reason = self._is_safe_command(command, session.cwd if session else workspace)
+        if not is_safe:
+            return f"[BLOCKED] {reason}"
+
+        if session:
+            return run_in_session(session, command, timeout, self.report_progress)
+        # 同期版も同じストリーミング読み出しを使う（Toolのワーカースレッドから呼ばれる）
+        return asyncio.run(self.aexecute(command, timeout, **kwargs))
+
+    async def aexecute(self, command: str, timeout: int = 30, **kwargs) -> Any:
         # ワークスペースディレクトリを設定
         workspace = Path.cwd() / "workspace"
         workspace.mkdir(exist_ok=True)
-        
+
         # コマンド安全性チェック
-        is_safe, reason = self._is_safe_command(command)
+        session = self._session(workspace)
+        is_safe, reason = self._is_safe_command(command, session.cwd if session else workspace)
         if not is_safe:
             return f"[BLOCKED] {reason}"
-        
+
+        if session:
+            return await arun_in_session(session, command, timeout, self.report_progress)
+
         try:
-            result = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                cwd=workspace,  # ワークスペース内で実行
+            stdout, stderr, returncode, note = await run_async(
+                command, timeout, cwd=workspace, on_progress=self.report_progress
             )
-            
-            output = ""
-            if result.stdout:
-                output += result.stdout
-            if result.stderr:
-                output += f"\n[STDERR]\n{result.stderr}"
-            if result.returncode != 0:
-                output += f"\n[EXIT CODE: {result.returncode}]"
-            return output.strip() or "(no output)"
-            
-        except subprocess.TimeoutExpired:
-            return f"[TIMEOUT] Command exceeded {timeout}s"
+            return format_output(stdout, stderr, returncode, note)
+        except subprocess.TimeoutExpired as e:
+            return format_timeout(e)
         except Exception as e:
-            return f"[ERROR] {e}"
\ No newline at end of file
+            return f"[ERROR] {e}"
+
+    def reset(self):
+        if self.session:
+            self.session.reset()
+
+    def close(self):
+        if self.session:
+            self.session.close()
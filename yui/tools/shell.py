@@ -2,18 +2,209 @@
 YUi Shell Tool - コマンド実行
 
 セキュリティ制限なし。Mac miniに隔離されている前提。
+aexecute()はasyncioのサブプロセスで実行し、イベントループをブロックしない。
+既定では会話セッションの間同じシェルを使い回す（ShellSession。YUI_SHELL_SESSION=offでコマンド毎に起動）。
+出力は少しずつ読み、先頭と末尾だけを残す（BoundedCapture）。
+  - 何MB出力するコマンドでもメモリ使用量は一定
+  - 出力が上限 (YUI_SHELL_MAX_OUTPUT) を超えたら、タイムアウトを待たずにkillする
+  - 実行中の出力量と最後の行をon_progressで通知する（CLIのステータス表示用）
 """
 
+import asyncio
+import os
+import signal
 import subprocess
-from typing import Any
+import time
+from typing import Any, Callable
 
+from yui.config import get_shell_max_output, use_shell_session
 from yui.tools.base import BaseTool
 
+CAPTURE_HEAD_BYTES = 1200  # 出力の先頭として残すバイト数（stdout・stderrそれぞれ）
+CAPTURE_TAIL_BYTES = 1600  # 出力の末尾として残すバイト数（エラーは末尾に出ることが多い）
+READ_CHUNK_BYTES = 64 * 1024  # 1回に読むバイト数
+PROGRESS_INTERVAL = 0.5  # 進捗を通知する間隔（秒）
+
+
+class BoundedCapture:
+    """
+    出力の先頭head_bytesと末尾tail_bytesだけを残すバッファ。
+    途中は捨てて、バイト数と行数だけを数える。
+    """
+
+    def __init__(self, head_bytes: int = CAPTURE_HEAD_BYTES, tail_bytes: int = CAPTURE_TAIL_BYTES):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+        self.lines = 0
+
+    def feed(self, chunk: bytes):
+        self.total += len(chunk)
+        self.lines += chunk.count(b"\n")
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += chunk[:room]
+            chunk = chunk[room:]
+        if chunk:
+            self.tail += chunk[-self.tail_bytes:]
+            if len(self.tail) > self.tail_bytes:
+                del self.tail[:-self.tail_bytes]
+
+    @property
+    def omitted(self) -> int:
+        """捨てたバイト数"""
+        return self.total - len(self.head) - len(self.tail)
+
+    def last_line(self) -> str:
+        """最後の空でない行（進捗表示用）"""
+        data = self.tail or self.head
+        for line in reversed(bytes(data).splitlines()):
+            if line.strip():
+                return line.decode("utf-8", errors="replace").strip()
+        return ""
+
+    def text(self) -> str:
+        if not self.omitted:
+            return (self.head + self.tail).decode("utf-8", errors="replace")
+        head = self.head.decode("utf-8", errors="replace")
+        tail = self.tail.decode("utf-8", errors="replace")
+        return f"{head}\n... [{self.omitted} bytes omitted] ...\n{tail}"
+
+
+def format_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.1f}GB"
+
+
+def format_output(stdout: str, stderr: str, returncode: int, note: str = "") -> str:
+    """コマンドの出力をTool結果の文字列にまとめる"""
+    output = ""
+    if stdout:
+        output += stdout
+    if stderr:
+        output += f"\n[STDERR]\n{stderr}"
+    if returncode != 0:
+        output += f"\n[EXIT CODE: {returncode}]"
+    if note:
+        output += f"\n{note}"
+    return output.strip() or "(no output)"
+
+
+def format_timeout(e: subprocess.TimeoutExpired) -> str:
+    """タイムアウトのTool結果（それまでの出力も付ける）"""
+    message = f"[TIMEOUT] Command exceeded {e.timeout}s"
+    partial = format_output(e.output or "", e.stderr or "", 0)
+    if partial != "(no output)":
+        message += f"\n{partial}"
+    return message
+
+
+async def run_async(
+    command: str,
+    timeout: int,
+    cwd=None,
+    max_output: int | None = None,
+    on_progress: Callable[[str], None] | None = None,
+) -> tuple[str, str, int, str]:
+    """
+    asyncioのサブプロセスでシェルコマンドを実行し (stdout, stderr, returncode, note) を返す。
+    stdout/stderrは先頭と末尾だけ（BoundedCapture）。出力の合計がmax_outputバイトを超えたらkillし、
+    noteにその旨を入れる（超えなければ空文字列）。
+    タイムアウト・キャンセル時はプロセスグループごとkillする
+    （タイムアウトはsubprocess.TimeoutExpired。output/stderrにそれまでの出力）。
+    """
+    if max_output is None:
+        max_output = get_shell_max_output()
+    proc = await asyncio.create_subprocess_shell(
+        command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=cwd,
+        start_new_session=True,  # sh の子プロセスもまとめてkillできるように
+    )
+    stdout, stderr = BoundedCapture(), BoundedCapture()
+    state = {"limited": False, "reported": time.monotonic()}
+
+    def kill():
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    async def pump(stream: asyncio.StreamReader, capture: BoundedCapture):
+        while chunk := await stream.read(READ_CHUNK_BYTES):
+            capture.feed(chunk)
+            total = stdout.total + stderr.total
+            if max_output and total > max_output:
+                state["limited"] = True
+                kill()
+                return
+            now = time.monotonic()
+            if on_progress and now - state["reported"] >= PROGRESS_INTERVAL:
+                state["reported"] = now
+                lines = stdout.lines + stderr.lines
+                last = capture.last_line()[:60]
+                on_progress(f"{format_bytes(total)}, {lines}行" + (f" | {last}" if last else ""))
+
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(pump(proc.stdout, stdout), pump(proc.stderr, stderr), proc.wait()),
+            timeout,
+        )
+    except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+        kill()
+        await proc.wait()
+        if isinstance(e, asyncio.TimeoutError):
+            raise subprocess.TimeoutExpired(
+                command, timeout, output=stdout.text(), stderr=stderr.text()
+            ) from None
+        raise
+
+    note = ""
+    if state["limited"]:
+        note = (
+            f"[OUTPUT LIMIT] Killed after {format_bytes(stdout.total + stderr.total)} of output "
+            f"(limit: {format_bytes(max_output)})"
+        )
+    return stdout.text(), stderr.text(), proc.returncode, note
+
+
+def run_in_session(session, command: str, timeout: int, on_progress=None) -> str:
+    """ShellSessionでコマンドを実行し、Tool結果の文字列を返す"""
+    try:
+        return format_output(*session.run(command, timeout, get_shell_max_output(), on_progress))
+    except subprocess.TimeoutExpired as e:
+        return format_timeout(e)
+    except Exception as e:
+        return f"[ERROR] {e}"
+
+
+async def arun_in_session(session, command: str, timeout: int, on_progress=None) -> str:
+    """run_in_session()をスレッドで実行する。キャンセルされたら実行中のコマンドをSIGINTで止める。"""
+    try:
+        return await asyncio.to_thread(run_in_session, session, command, timeout, on_progress)
+    except asyncio.CancelledError:
+        session.interrupt()
+        raise
+
 
 class ShellTool(BaseTool):
     name = "shell"
     description = "Execute a shell command on the system. No restrictions."
 
+    def __init__(self):
+        self.session = None
+        if use_shell_session():
+            from yui.tools.shell_session import ShellSession
+
+            self.session = ShellSession()
+            self.description += " The shell session persists between calls (cwd, exported variables)."
+
     def parameters_schema(self) -> dict:
         return {
             "type": "object",
@@ -31,23 +222,28 @@ class ShellTool(BaseTool):
         }
 
     def execute(self, command: str, timeout: int = 120, **kwargs) -> Any:
+        if self.session:
+            return run_in_session(self.session, command, timeout, self.report_progress)
+        # 同期版も同じストリーミング読み出しを使う（Toolのワーカースレッドから呼ばれる）
+        return asyncio.run(self.aexecute(command, timeout, **kwargs))
+
+    async def aexecute(self, command: str, timeout: int = 120, **kwargs) -> Any:
+        if self.session:
+            return await arun_in_session(self.session, command, timeout, self.report_progress)
         try:
-            result = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=timeout,
+            stdout, stderr, returncode, note = await run_async(
+                command, timeout, on_progress=self.report_progress
             )
-            output = ""
-            if result.stdout:
-                output += result.stdout
-            if result.stderr:
-                output += f"\n[STDERR]\n{result.stderr}"
-            if result.returncode != 0:
-                output += f"\n[EXIT CODE: {result.returncode}]"
-            return output.strip() or "(no output)"
-        except subprocess.TimeoutExpired:
-            return f"[TIMEOUT] Command exceeded {timeout}s"
+            return format_output(stdout, stderr, returncode, note)
+        except subprocess.TimeoutExpired as e:
+            return format_timeout(e)
         except Exception as e:
             return f"[ERROR] {e}"
+
+    def reset(self):
+        if self.session:
+            self.session.reset()
+
+    def close(self):
+        if self.session:
+            self.session.close()
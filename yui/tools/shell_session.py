@@ -0,0 +1,281 @@
+"""
+YUi Shell Session - 使い回すシェルのセッション
+
+コマンド毎に /bin/sh を起動する代わりに、会話セッションの間ずっと同じシェルを使う。
+cd・export・venvのactivateなどの状態が次のコマンドに引き継がれ、fork/execの分だけ速い。
+  - コマンドの終わりは一意な目印（sentinel）の行で判定し、終了コードと作業ディレクトリも受け取る
+  - タイムアウト・出力の上限・キャンセルでは実行中のコマンドだけをSIGINTで止める（シェルは残る）
+  - 止まらなければシェルごとkillし、次のコマンドで作り直す（作業ディレクトリは引き継ぐ）
+  - confineを指定すると、作業ディレクトリがその外に出たら戻す（safe_shell用）
+  - コマンドが `&` で残したバックグラウンドのジョブは、目印を出す前にkillする
+    （セッションのパイプに書き続け、後の無関係なコマンドの出力に混ざるため）
+出力はshell.pyと同じBoundedCaptureで先頭と末尾だけを残す。
+"""
+
+import os
+import selectors
+import shutil
+import signal
+import subprocess
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable
+
+from yui.tools.shell import PROGRESS_INTERVAL, READ_CHUNK_BYTES, BoundedCapture, format_bytes
+
+INTERRUPT_GRACE_SECONDS = 2.0  # SIGINTで止まらなければシェルごとkillするまでの秒数
+
+
+class _SentinelReader:
+    """パイプの出力をcaptureに流しつつ、目印の行を探す"""
+
+    def __init__(self, capture: BoundedCapture, sentinel: bytes):
+        self.capture = capture
+        self.marker = b"\n" + sentinel
+        self.pending = b""  # 目印の一部かもしれない末尾（まだcaptureに入れていない）
+        self.trailer: bytes | None = None  # 目印より後ろ（終了コードと作業ディレクトリ）
+
+    @property
+    def done(self) -> bool:
+        return self.trailer is not None and b"\n" in self.trailer
+
+    def feed(self, data: bytes):
+        if self.trailer is not None:
+            self.trailer += data
+            return
+        buf = self.pending + data
+        i = buf.find(self.marker)
+        if i >= 0:
+            self.capture.feed(buf[:i])
+            self.pending = b""
+            self.trailer = buf[i + len(self.marker):]
+            return
+        cut = max(0, len(buf) - len(self.marker) + 1)
+        self.capture.feed(buf[:cut])
+        self.pending = buf[cut:]
+
+
+class ShellSession:
+    def __init__(self, cwd: Path | None = None, confine: Path | None = None):
+        self.initial_cwd = Path(cwd) if cwd else None
+        self.cwd = self.initial_cwd  # 最後に分かっている作業ディレクトリ
+        self.confine = Path(confine).resolve() if confine else None
+        self.proc: subprocess.Popen | None = None
+        self.stats = {"commands": 0, "starts": 0, "restarts": 0, "interrupts": 0}
+        self._lock = threading.Lock()  # 1つのシェルで同時に実行するのは1コマンドだけ
+        self._running = False
+
+    @property
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def _start(self):
+        if self.proc is not None:
+            self.kill()  # 終わったシェルのパイプを閉じる
+            self.stats["restarts"] += 1
+        self.stats["starts"] += 1
+        bash = shutil.which("bash")
+        args = [bash, "--noprofile", "--norc"] if bash else ["/bin/sh"]
+        cwd = self.cwd if self.cwd and self.cwd.is_dir() else self.confine
+        self.proc = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=cwd,
+            bufsize=0,
+            start_new_session=True,  # 実行中のコマンドごとシグナルを送れるように
+        )
+        # シェル自身はSIGINTで終わらない（trapはexec先に引き継がれないので、コマンドは止まる）
+        self._write("trap : INT\n")
+
+    def _write(self, text: str):
+        self.proc.stdin.write(text.encode("utf-8"))
+
+    def _signal(self, sig: int):
+        try:
+            os.killpg(self.proc.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def interrupt(self):
+        """実行中のコマンドをSIGINTで止める（別スレッドから呼んでよい）"""
+        if self._running and self.alive:
+            self.stats["interrupts"] += 1
+            self._signal(signal.SIGINT)
+
+    def kill(self):
+        """シェルをプロセスグループごと終了する（次のrunで作り直す）"""
+        if self.alive:
+            self._signal(signal.SIGKILL)
+        if self.proc is not None:
+            self.proc.wait()
+            for pipe in (self.proc.stdin, self.proc.stdout, self.proc.stderr):
+                pipe.close()
+
+    def close(self):
+        self.kill()
+        self.proc = None
+
+    def reset(self):
+        """シェルを閉じ、次のコマンドは最初の作業ディレクトリの新しいシェルで実行する"""
+        with self._lock:
+            self.close()
+            self.cwd = self.initial_cwd
+
+    def run(
+        self,
+        command: str,
+        timeout: float,
+        max_output: int = 0,
+        on_progress: Callable[[str], None] | None = None,
+    ) -> tuple[str, str, int, str]:
+        """
+        セッションのシェルでコマンドを実行し (stdout, stderr, returncode, note) を返す（shell.run_asyncと同じ形）。
+        タイムアウトはsubprocess.TimeoutExpired（output/stderrにそれまでの出力）。
+        """
+        with self._lock:
+            if not self.alive:
+                self._start()
+            self.stats["commands"] += 1
+            try:
+                sentinel = self._send(command)
+            except BrokenPipeError:
+                # 前のコマンドの後でシェルが終わっていた（exitなど）
+                self._start()
+                sentinel = self._send(command)
+            self._running = True
+            try:
+                return self._collect(command, sentinel, timeout, max_output, on_progress)
+            finally:
+                self._running = False
+
+    def _send(self, command: str) -> bytes:
+        """コマンドと、終わりの目印を出すコマンドを書き込む。目印を返す。"""
+        sentinel = f"__YUI_DONE_{uuid.uuid4().hex}__"
+        quoted = "'" + command.replace("'", "'\\''") + "'"
+        # evalなら構文エラーでもシェルは終わらない。stdinは/dev/null（セッションの入力を読ませない）
+        # 残ったバックグラウンドのジョブは子プロセスごとkillし、その数も目印の行で返す
+        self._write(
+            f"eval {quoted} </dev/null\n"
+            "__yui_rc=$?\n"
+            "__yui_jobs=0\n"
+            "{ for __yui_pid in $(jobs -p); do\n"
+            "    pkill -KILL -P \"$__yui_pid\"; kill -KILL \"$__yui_pid\" && __yui_jobs=$((__yui_jobs + 1))\n"
+            "  done; wait; } 2>/dev/null\n"
+            f"printf '\\n%s %d %d %s\\n' {sentinel} \"$__yui_rc\" \"$__yui_jobs\" \"$PWD\"\n"
+            f"printf '\\n%s\\n' {sentinel} >&2\n"
+        )
+        return sentinel.encode()
+
+    def _collect(
+        self,
+        command: str,
+        sentinel: bytes,
+        timeout: float,
+        max_output: int,
+        on_progress: Callable[[str], None] | None,
+    ) -> tuple[str, str, int, str]:
+        """目印がstdout・stderrの両方に出るまで読む"""
+        stdout, stderr = BoundedCapture(), BoundedCapture()
+        status_reader = _SentinelReader(stdout, sentinel)  # stdoutの目印の後ろに終了コード
+        readers = {
+            self.proc.stdout.fileno(): status_reader,
+            self.proc.stderr.fileno(): _SentinelReader(stderr, sentinel),
+        }
+        selector = selectors.DefaultSelector()
+        for fd in readers:
+            selector.register(fd, selectors.EVENT_READ)
+
+        start = time.monotonic()
+        reported = start
+        stopped = ""  # "timeout" | "limit"
+        kill_at = 0.0
+        restarted = False
+        try:
+            while not all(r.done for r in readers.values()):
+                now = time.monotonic()
+                if not stopped and now - start >= timeout:
+                    stopped, kill_at = "timeout", now + INTERRUPT_GRACE_SECONDS
+                    self.interrupt()
+                if stopped and now >= kill_at:
+                    # SIGINTで止まらない → シェルごと作り直す
+                    self.kill()
+                    restarted = True
+                    break
+                wait = (kill_at if stopped else start + timeout) - now
+                for key, _ in selector.select(max(0.0, min(wait, PROGRESS_INTERVAL))):
+                    data = os.read(key.fd, READ_CHUNK_BYTES)
+                    if not data:
+                        selector.unregister(key.fd)
+                        continue
+                    readers[key.fd].feed(data)
+                if not selector.get_map():
+                    break  # シェルが終わった（exitなど）
+
+                total = stdout.total + stderr.total
+                if max_output and total > max_output and not stopped:
+                    stopped, kill_at = "limit", time.monotonic() + INTERRUPT_GRACE_SECONDS
+                    self.interrupt()
+                now = time.monotonic()
+                if on_progress and not stopped and now - reported >= PROGRESS_INTERVAL:
+                    reported = now
+                    last = (stdout if stdout.total >= stderr.total else stderr).last_line()[:60]
+                    lines = stdout.lines + stderr.lines
+                    on_progress(f"{format_bytes(total)}, {lines}行" + (f" | {last}" if last else ""))
+        finally:
+            selector.close()
+
+        notes = []
+        if restarted:
+            returncode = -signal.SIGKILL
+        else:
+            returncode, killed_jobs, moved_back = self._finish(status_reader)
+            if killed_jobs:
+                notes.append(
+                    f"[JOBS] Killed {killed_jobs} background job(s) still running after the command; "
+                    "use 'nohup CMD >LOG 2>&1 & disown' to keep a process running"
+                )
+            if moved_back:
+                notes.append(f"[BLOCKED] Left the workspace; moved back to {self.confine}")
+        if restarted:
+            notes.append("[SESSION RESTARTED] The command did not stop; environment variables were reset")
+        elif not self.alive:
+            notes.append("[SESSION ENDED] The shell exited; a new session starts with the next command")
+        if stopped == "timeout":
+            stderr_text = stderr.text()
+            if notes:
+                stderr_text = (stderr_text + "\n" + "\n".join(notes)).strip()
+            raise subprocess.TimeoutExpired(command, timeout, output=stdout.text(), stderr=stderr_text)
+        if stopped == "limit":
+            notes.insert(0, (
+                f"[OUTPUT LIMIT] Interrupted after {format_bytes(stdout.total + stderr.total)} of output "
+                f"(limit: {format_bytes(max_output)})"
+            ))
+        return stdout.text(), stderr.text(), returncode, "\n".join(notes)
+
+    def _finish(self, reader: _SentinelReader) -> tuple[int, int, bool]:
+        """
+        目印の後ろから終了コード・killしたジョブの数・作業ディレクトリを読み、confineの外に出ていたら戻す。
+        戻り値: (終了コード, killしたジョブの数, confineに戻したか)
+        """
+        if not reader.done:
+            code = self.proc.poll()
+            return (code if code is not None else -1), 0, False
+        fields = reader.trailer.split(b"\n", 1)[0].decode("utf-8", errors="replace").strip()
+        code, _, rest = fields.partition(" ")
+        jobs, _, cwd = rest.partition(" ")
+        moved_back = False
+        if cwd:
+            self.cwd = Path(cwd)
+            if self.confine and not self.cwd.resolve().is_relative_to(self.confine):
+                self._write(f"cd '{self.confine}'\n")
+                self.cwd = self.confine
+                moved_back = True
+        killed_jobs = int(jobs) if jobs.isdigit() else 0
+        try:
+            return int(code), killed_jobs, moved_back
+        except ValueError:
+            return -1, killed_jobs, moved_back
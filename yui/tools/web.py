@@ -2,18 +2,567 @@
 YUi Web Tool - Web検索・取得
 
 最小限: URLフェッチのみ。後で検索APIを追加できる。
+取得はプロセス全体で共有するhttpxのクライアントで行う。
+  - 接続プール（keep-alive）で同じホストへの2回目以降は接続を使い回す
+  - 圧縮転送（gzip / deflate。brotliパッケージがあればbrも）を受け付け、少しずつ展開しながら読む
+    （高圧縮のページでも一度に展開するのはDECODE_CHUNK_BYTESまで）
+  - 本文は少しずつ読み、max_length文字かバイト数の上限に達したら読むのをやめる
+  - 文字コードはContent-Typeヘッダ → BOM → <meta charset> の順に判定する（なければUTF-8）
+HTMLは読みながらHtmlToMarkdownに流し、scriptやメニューを除いた本文だけをMarkdownで返す（raw=Trueで生のまま）。
+取得結果はHttpCacheでディスクに保存し、新しいうちは再取得せず、古ければETag / Last-Modifiedで確認する。
+web_fetch_batch (WebBatchTool) は複数のURLを並列に取得し、1つのトークン予算に収めて返す。
 """
 
-import urllib.request
-import urllib.error
-from typing import Any
+import codecs
+import re
+import threading
+import zlib
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from html.parser import HTMLParser
+from typing import Any, Iterator
+from urllib.parse import urljoin, urlsplit
 
+import httpx
+
+from yui.agent.compaction import clip_to_tokens
+from yui.agent.tokens import count_tokens
+from yui.config import get_web_cache_dir, get_web_cache_mode, get_web_max_bytes
 from yui.tools.base import BaseTool
+from yui.tools.http_cache import HttpCache
+
+USER_AGENT = "YUi/0.1"
+FETCH_TIMEOUT = 30  # 秒
+POOL_MAX_CONNECTIONS = 20  # 同時に開く接続の上限
+POOL_MAX_KEEPALIVE = 10  # 使い回すために開いたままにしておく接続の上限
+SNIFF_BYTES = 2048  # <meta charset> を探す先頭のバイト数
+CACHE_HEADERS = ("cache-control", "expires", "date", "last-modified", "etag")
+DECODE_CHUNK_BYTES = 64 * 1024  # 圧縮を一度に展開するバイト数の上限
+BATCH_MAX_URLS = 10  # web_fetch_batchで1回に取得するURLの上限
+BATCH_MAX_CONCURRENCY = 6  # web_fetch_batchで同時に取得するURLの数
+BATCH_PER_HOST = 2  # 同じホストへ同時に送るリクエストの数
+BATCH_DEFAULT_TOKENS = 3000  # web_fetch_batchの結果全体のトークン予算（既定）
+BATCH_MAX_TOKENS = 6000  # トークン予算の上限
+
+try:
+    import brotli  # 任意依存（あればbrの圧縮転送も受け付ける）
+except ImportError:
+    brotli = None
+
+ACCEPT_ENCODING = "gzip, deflate, br" if brotli else "gzip, deflate"
+
+TEXT_TYPES = ("text/", "application/json", "application/xml", "application/xhtml", "application/javascript")
+CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([\w.:-]+)""", re.IGNORECASE)
+XML_ENCODING_RE = re.compile(rb"""^<\?xml[^>]+encoding\s*=\s*["']([\w.:-]+)""")
+BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+_client: httpx.Client | None = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> httpx.Client:
+    """共有のHTTPクライアント（スレッドセーフ。初回に作る）"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(
+                headers={"User-Agent": USER_AGENT, "Accept-Encoding": ACCEPT_ENCODING},
+                timeout=FETCH_TIMEOUT,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=POOL_MAX_KEEPALIVE,
+                ),
+            )
+        return _client
+
+
+def _valid_charset(name: str | bytes | None) -> str | None:
+    if not name:
+        return None
+    if isinstance(name, bytes):
+        name = name.decode("ascii", errors="ignore")
+    try:
+        return codecs.lookup(name.strip()).name
+    except LookupError:
+        return None
+
+
+def detect_charset(content_type: str, head: bytes) -> str:
+    """Content-Typeのcharset → BOM → <meta charset> / <?xml encoding> → UTF-8"""
+    match = re.search(r"charset\s*=\s*[\"']?([\w.:-]+)", content_type, re.IGNORECASE)
+    charset = _valid_charset(match.group(1)) if match else None
+    if charset:
+        return charset
+    for bom, name in BOMS:
+        if head.startswith(bom):
+            return name
+    match = XML_ENCODING_RE.match(head) or CHARSET_RE.search(head)
+    return _valid_charset(match.group(1) if match else None) or "utf-8"
+
+
+def iter_decoded(response: httpx.Response) -> Iterator[bytes]:
+    """
+    圧縮転送を少しずつ展開して本文のバイト列を返す。
+    gzip / deflateは展開後DECODE_CHUNK_BYTESずつ（httpxに任せると受信した塊を一度に全部展開する）。
+    """
+    encoding = response.headers.get("content-encoding", "").strip().lower()
+    if encoding in ("gzip", "x-gzip", "deflate"):
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS | 32)  # gzipとzlibを自動判別
+        head = b""  # 最初の出力までに受け取った圧縮データ（zlibヘッダのないdeflateなら読み直す）
+        for raw in response.iter_raw():
+            if head is not None:
+                head += raw
+            while raw:
+                try:
+                    data = decompressor.decompress(raw, DECODE_CHUNK_BYTES)
+                except zlib.error:
+                    if head is None:
+                        raise
+                    # "Content-Encoding: deflate" でヘッダなしのdeflateを送るサーバがある
+                    decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+                    raw, head = head, None
+                    continue
+                if data:
+                    head = None
+                    yield data
+                raw = decompressor.unconsumed_tail
+        tail = decompressor.flush()
+        if tail:
+            yield tail
+    elif encoding == "br" and brotli:
+        decompressor = brotli.Decompressor()
+        for raw in response.iter_raw():
+            data = decompressor.process(raw)
+            if data:
+                yield data
+    else:
+        yield from response.iter_bytes()
+
+
+class TextStream:
+    """
+    レスポンス本文を少しずつ読み、文字コードを判定してテキストの断片を返すイテレータ。
+    max_bytes（展開後）に達したら読むのをやめ、truncatedをTrueにする。
+    """
+
+    def __init__(self, response: httpx.Response, max_bytes: int):
+        self.response = response
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.charset: str | None = None
+        self.truncated = False
+
+    def __iter__(self) -> Iterator[str]:
+        head = b""
+        decoder = None
+        for chunk in iter_decoded(self.response):
+            if self.max_bytes and self.bytes + len(chunk) > self.max_bytes:
+                chunk = chunk[:self.max_bytes - self.bytes]
+                self.truncated = True
+            self.bytes += len(chunk)
+            if decoder is None:
+                # 先頭を少し溜めてから文字コードを決める
+                head += chunk
+                if len(head) < SNIFF_BYTES and not self.truncated:
+                    continue
+                decoder = self._decoder(head)
+                chunk, head = head, b""
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+            if self.truncated:
+                return
+        if decoder is None:
+            decoder = self._decoder(head)
+            text = decoder.decode(head, final=True)
+        else:
+            text = decoder.decode(b"", final=True)
+        if text:
+            yield text
+
+    def _decoder(self, head: bytes):
+        self.charset = detect_charset(self.response.headers.get("content-type", ""), head)
+        return codecs.getincrementaldecoder(self.charset)(errors="replace")
+
+
+# --- HTML → Markdown（本文抽出） ---
+
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "canvas", "iframe", "object", "select", "button", "head"}
+BOILERPLATE_TAGS = {"nav", "footer", "aside"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+CONTAINER_TAGS = {"body", "article", "main", "section", "div", "td"}
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "header", "li", "dd", "dt", "blockquote", "pre",
+    "h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol", "dl", "table", "tr", "td", "th", "figure",
+    "figcaption", "hr", "br", "body", "form", "fieldset", "details", "summary",
+}
+# class/idがこれに当たる要素は本文ではない（readabilityの "unlikely candidates" と同じ考え方）
+UNLIKELY_RE = re.compile(
+    r"banner|breadcrumb|combx|comment|community|cookie|disqus|footer|masthead|menu|modal|"
+    r"navbar|nav-|popup|related|share|shoutbox|sidebar|skip-link|social|sponsor|advert|"
+    r"subscribe|newsletter|toc-|pagination",
+    re.IGNORECASE,
+)
+POSITIVE_RE = re.compile(r"article|content|entry|main|post|story|text|body|blog", re.IGNORECASE)
+MIN_MAIN_SHARE = 0.25  # 選んだ本文がページ全体の文字数のこれ未満なら、全体を返す
+
+
+class HtmlToMarkdown(HTMLParser):
+    """
+    HTMLを少しずつ受け取り（feed）、本文らしい部分をコンパクトなMarkdownにする。DOMは作らない。
+      - script / style などは捨て、nav / footer / aside やメニューらしいclassの要素も捨てる
+      - 見出し・リンク・リスト・表・コードブロックはMarkdownで残す
+      - 段落の文字数とリンク率で親の要素に点数を付け、最も点数の高い要素を本文として選ぶ（readability風）
+    """
+
+    def __init__(self, base_url: str = ""):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.title = ""
+        self.blocks: list[dict] = []  # {kind, text, chain, chars, link_chars}
+        self._stack: list[tuple[str, int | None]] = []  # (タグ, 要素のid: 本文候補なら番号)
+        self._skip_at: int | None = None  # 捨てている部分木の根のスタック位置
+        self._containers: list[dict] = []  # 本文候補: {tag, bonus}
+        self._inline: list[str] = []
+        self._chars = 0
+        self._link_chars = 0
+        self._kind = "p"
+        self._href: str | None = None
+        self._link_text: list[str] = []
+        self._list_depth = 0
+        self._pre_depth = 0
+        self._in_title = False
+        self._table: list[list[str]] | None = None
+        self._cell: list[str] | None = None
+
+    # --- パーサのコールバック ---
+
+    def handle_starttag(self, tag: str, attrs: list):
+        if tag in VOID_TAGS:
+            if self._skip_at is None:
+                self._void(tag, dict(attrs))
+            return
+        if tag == "title":
+            self._in_title = True
+        self._stack.append((tag, None))
+        if self._skip_at is not None:
+            return
+        attrs = dict(attrs)
+        if tag in SKIP_TAGS or tag in BOILERPLATE_TAGS or self._unlikely(tag, attrs):
+            self._skip_at = len(self._stack) - 1
+            return
+
+        if tag in BLOCK_TAGS and self._table is None:
+            self._flush(keep_kind=True)
+        if tag in CONTAINER_TAGS:
+            bonus = 1.0
+            if tag in ("article", "main") or attrs.get("role") == "main":
+                bonus = 1.5
+            elif POSITIVE_RE.search(f"{attrs.get('class') or ''} {attrs.get('id') or ''}"):
+                bonus = 1.25
+            self._containers.append({"tag": tag, "bonus": bonus})
+            self._stack[-1] = (tag, len(self._containers) - 1)
+
+        if tag in ("h1", "h2", "h3", "h4", "h5", "h6"):
+            self._kind = "#" * int(tag[1])
+        elif tag == "li":
+            self._list_depth = max(self._list_depth, 1)
+            self._kind = "li"
+        elif tag in ("ul", "ol"):
+            self._list_depth += 1
+        elif tag == "blockquote":
+            self._kind = ">"
+        elif tag == "pre":
+            self._pre_depth += 1
+            self._kind = "pre"
+        elif tag == "code" and not self._pre_depth:
+            self._text("`")
+        elif tag == "a":
+            href = attrs.get("href") or ""
+            if href and not href.startswith(("#", "javascript:")):
+                self._href = urljoin(self.base_url, href)
+                self._link_text = []
+        elif tag == "table":
+            if self._table is None:
+                self._table = []
+        elif tag == "tr" and self._table is not None:
+            self._table.append([])
+        elif tag in ("td", "th") and self._table is not None:
+            self._cell = []
+
+    def handle_endtag(self, tag: str):
+        if tag == "title":
+            self._in_title = False
+        index = next((i for i in range(len(self._stack) - 1, -1, -1) if self._stack[i][0] == tag), None)
+        if index is None:
+            return  # 対応する開始タグがない
+        if self._skip_at is not None:
+            if index <= self._skip_at:
+                self._skip_at = None
+            del self._stack[index:]
+            return
+
+        if tag == "a" and self._href is not None:
+            text = " ".join("".join(self._link_text).split())
+            self._link_chars += len(text)
+            if text:
+                self._emit(f"[{text}]({self._href})")
+            self._href = None
+        elif tag == "code" and not self._pre_depth:
+            self._text("`")
+        elif tag in ("td", "th") and self._cell is not None and self._table:
+            self._table[-1].append(" ".join("".join(self._cell).split()).replace("|", "\\|"))
+            self._cell = None
+        elif tag == "table" and self._table is not None:
+            # 入れ子の表は外側の表が閉じたときにまとめて出す
+            if not any(t == "table" for t, _ in self._stack[:index]):
+                self._flush_table()
+        elif tag == "pre":
+            self._flush()
+            self._pre_depth = max(0, self._pre_depth - 1)
+        elif tag in ("ul", "ol"):
+            self._flush()
+            self._list_depth = max(0, self._list_depth - 1)
+
+        if tag in BLOCK_TAGS and self._table is None:
+            self._flush()
+        del self._stack[index:]
+
+    def handle_data(self, data: str):
+        if self._in_title:
+            self.title += data
+            return
+        if self._skip_at is not None:
+            return
+        if not self._pre_depth:
+            data = re.sub(r"\s+", " ", data)
+        self._text(data)
+
+    # --- 組み立て ---
+
+    def _unlikely(self, tag: str, attrs: dict) -> bool:
+        if tag in ("body", "html", "article", "main") or self._table is not None:
+            return False
+        names = f"{attrs.get('class') or ''} {attrs.get('id') or ''}"
+        return bool(UNLIKELY_RE.search(names)) and not POSITIVE_RE.search(names)
+
+    def _void(self, tag: str, attrs: dict):
+        if tag == "br":
+            self._text("\n" if self._pre_depth or self._table is None else " ")
+        elif tag == "hr" and self._table is None:
+            self._flush()
+        elif tag == "img" and self._href is not None and attrs.get("alt"):
+            self._link_text.append(attrs["alt"])
+
+    def _text(self, text: str):
+        if self._href is not None:
+            self._link_text.append(text)
+        else:
+            self._emit(text)
+
+    def _emit(self, text: str):
+        if self._cell is not None:
+            self._cell.append(text)
+        elif self._table is None:  # 表の中でセルの外にある空白などは捨てる
+            self._inline.append(text)
+
+    def _flush(self, keep_kind: bool = False):
+        """
+        溜まったインラインのテキストを1つのブロックにする。
+        keep_kind: 開始タグでの区切り（まだ中身のない<li><p>...のように、見出し・リストの種類を次に持ち越す）
+        """
+        raw = "".join(self._inline)
+        self._inline = []
+        kind = self._kind
+        if not raw.strip():
+            if not keep_kind:
+                self._kind = "p"
+            self._link_chars = 0
+            return
+        self._kind = "p"
+        if self._pre_depth and kind != "pre":
+            kind = "pre"
+        text = raw.strip("\n") if kind == "pre" else " ".join(raw.split())
+        if kind == "li":
+            text = "  " * (self._list_depth - 1) + "- " + text
+        elif kind.startswith("#"):
+            text = f"{kind} {text}"
+        elif kind == ">":
+            text = "> " + text
+        elif kind == "pre":
+            text = f"```\n{text}\n```"
+        chars = len(" ".join(raw.split()))
+        self._add_block(kind, text, chars, min(self._link_chars, chars))
+        self._link_chars = 0
+
+    def _flush_table(self):
+        rows = [row for row in self._table or [] if any(cell for cell in row)]
+        self._table = None
+        self._cell = None
+        if not rows:
+            return
+        width = max(len(row) for row in rows)
+        lines = []
+        for i, row in enumerate(rows):
+            lines.append("| " + " | ".join(row + [""] * (width - len(row))) + " |")
+            if i == 0:
+                lines.append("|" + " --- |" * width)
+        text = "\n".join(lines)
+        chars = sum(len(cell) for row in rows for cell in row)
+        self._add_block("table", text, chars, min(self._link_chars, chars))
+        self._link_chars = 0
+
+    def _add_block(self, kind: str, text: str, chars: int, link_chars: int):
+        chain = tuple(cid for _, cid in self._stack if cid is not None)
+        self.blocks.append({"kind": kind, "text": text, "chain": chain, "chars": chars, "link_chars": link_chars})
+
+    # --- 本文の選択 ---
+
+    def _main_container(self) -> int | None:
+        """段落の点数を親（1倍）・祖父（1/2）・曾祖父（1/3）に配り、最も高い要素を選ぶ"""
+        scores: dict[int, float] = {}
+        chars: dict[int, int] = {}
+        links: dict[int, int] = {}
+        for block in self.blocks:
+            for cid in block["chain"]:
+                chars[cid] = chars.get(cid, 0) + block["chars"]
+                links[cid] = links.get(cid, 0) + block["link_chars"]
+            if block["kind"].startswith("#") or block["chars"] < 25:
+                continue
+            text = block["text"]
+            score = 1 + text.count(",") + text.count("、") + text.count("。") + min(block["chars"] // 100, 3)
+            for level, cid in enumerate(reversed(block["chain"][-3:])):
+                scores[cid] = scores.get(cid, 0.0) + score / (1, 2, 3)[level]
+        best, best_score = None, 0.0
+        for cid, score in scores.items():
+            density = links[cid] / chars[cid] if chars[cid] else 1.0
+            score *= self._containers[cid]["bonus"] * (1 - density)
+            if score > best_score:
+                best, best_score = cid, score
+        return best
+
+    def markdown(self) -> str:
+        """本文のMarkdown（feed()をすべて終えてから呼ぶ）"""
+        self.close()
+        self._flush()
+        if self._table is not None:
+            self._flush_table()
+        blocks = self.blocks
+        best = self._main_container()
+        if best is not None:
+            main = [b for b in blocks if best in b["chain"]]
+            total = sum(b["chars"] for b in blocks)
+            if sum(b["chars"] for b in main) >= total * MIN_MAIN_SHARE:
+                blocks = main
+
+        lines: list[str] = []
+        title = " ".join(self.title.split())
+        if title and not (blocks and blocks[0]["kind"] == "#"):
+            lines.append(f"# {title}")
+        previous = None
+        for block in blocks:
+            if lines:
+                lines.append("\n" if block["kind"] == previous == "li" else "\n\n")
+            lines.append(block["text"])
+            previous = block["kind"]
+        return "".join(lines)
+
+
+def html_to_markdown(html: str, base_url: str = "") -> str:
+    """HTML文字列から本文のMarkdownを取り出す"""
+    parser = HtmlToMarkdown(base_url)
+    parser.feed(html)
+    return parser.markdown()
+
+
+def is_html(content_type: str, head: str) -> bool:
+    mime = content_type.split(";", 1)[0].strip().lower()
+    if mime in ("text/html", "application/xhtml+xml"):
+        return True
+    return not mime and head.lstrip()[:15].lower().startswith(("<!doctype html", "<html"))
+
+
+def is_text_type(content_type: str) -> bool:
+    """テキストとして読む価値のあるContent-Typeか（不明なら読む）"""
+    mime = content_type.split(";", 1)[0].strip().lower()
+    return not mime or mime.startswith(TEXT_TYPES) or mime.endswith(("+xml", "+json"))
+
+
+def fetch(
+    url: str,
+    max_chars: int,
+    max_bytes: int | None = None,
+    extract: bool = True,
+    headers: dict | None = None,
+) -> dict:
+    """
+    URLを取得して本文をテキストで返す（共有の接続プール・圧縮転送・ストリーミング）。
+    max_chars文字かmax_bytesバイトに達したら読むのをやめる。
+    extractならHTMLは読みながらHtmlToMarkdownに流し、本文のMarkdownにする
+    （本文の選択にはページ全体が要るので、HTMLはmax_bytesまで読む）。
+    headersは追加のリクエストヘッダ（条件付きリクエスト用。304なら本文なしで返る）。
+    戻り値: {url, status, reason, content_type, charset, headers, raw, text, html, extracted, bytes, truncated}
+      raw: 読んだ本文 / text: 抽出したMarkdown（抽出しなければrawと同じ）。どちらもmax_charsでは切らない
+      headers: キャッシュ用のレスポンスヘッダ（小文字のキー）
+      truncated: "chars"（max_charsで読むのをやめた） | "bytes"（max_bytesに達した） | None
+    """
+    if max_bytes is None:
+        max_bytes = get_web_max_bytes()
+    with get_client().stream("GET", url, headers=headers) as response:
+        content_type = response.headers.get("content-type", "")
+        result = {
+            "url": str(response.url),
+            "status": response.status_code,
+            "reason": response.reason_phrase,
+            "content_type": content_type,
+            "charset": None,
+            "headers": {name: response.headers[name] for name in CACHE_HEADERS if name in response.headers},
+            "raw": "",
+            "text": "",
+            "html": False,
+            "extracted": False,
+            "bytes": 0,
+            "truncated": None,
+        }
+        if response.status_code >= 300 or not is_text_type(content_type):
+            return result
+
+        stream = TextStream(response, max_bytes)
+        parts: list[str] = []
+        chars = 0
+        parser: HtmlToMarkdown | None = None
+        for text in stream:
+            if not parts:
+                result["html"] = is_html(content_type, text)
+                if result["html"] and extract:
+                    parser = HtmlToMarkdown(result["url"])
+            parts.append(text)
+            if parser:
+                parser.feed(text)
+                continue
+            chars += len(text)
+            if chars >= max_chars:
+                result["truncated"] = "chars"
+                break
+        if stream.truncated and not result["truncated"]:
+            result["truncated"] = "bytes"
+        raw = "".join(parts)
+        result.update(charset=stream.charset, raw=raw, text=raw, bytes=stream.bytes)
+        if parser:
+            result.update(text=parser.markdown(), extracted=True)
+        return result
 
 
 class WebTool(BaseTool):
     name = "web_fetch"
-    description = "Fetch content from a URL. Returns the raw text content."
+    description = (
+        "Fetch content from a URL. HTML pages are returned as the main content in compact Markdown "
+        "(headings, links, lists, tables); set raw=true for the unprocessed body."
+    )
 
     def parameters_schema(self) -> dict:
         return {
@@ -27,20 +576,200 @@ class WebTool(BaseTool):
                     "type": "integer",
                     "description": "Maximum characters to return (default: 10000)",
                 },
+                "raw": {
+                    "type": "boolean",
+                    "description": "Return the raw body instead of extracted Markdown (default: false)",
+                },
             },
             "required": ["url"],
         }
 
-    def execute(self, url: str, max_length: int = 10000, **kwargs) -> Any:
+    def __init__(self, cache: HttpCache | None = None):
+        self.cache = cache or HttpCache(get_web_cache_dir(), mode=get_web_cache_mode())
+
+    def execute(self, url: str, max_length: int = 10000, raw: bool = False, **kwargs) -> Any:
         try:
-            req = urllib.request.Request(
-                url,
-                headers={"User-Agent": "YUi/0.1"},
-            )
-            with urllib.request.urlopen(req, timeout=30) as resp:
-                content = resp.read().decode("utf-8", errors="replace")
-                if len(content) > max_length:
-                    content = content[:max_length] + f"\n\n[TRUNCATED at {max_length} chars]"
-                return content
+            result = self.get(url, max_length, extract=not raw)
+        except httpx.TimeoutException:
+            return f"[TIMEOUT] Request exceeded {FETCH_TIMEOUT}s"
         except Exception as e:
             return f"[ERROR] {e}"
+
+        if result["status"] >= 400:
+            return f"[ERROR] HTTP Error {result['status']}: {result['reason']}"
+        if not is_text_type(result["content_type"]):
+            return f"[ERROR] Not a text response (content-type: {result['content_type']})"
+        content = result["text"]
+        if len(content) > max_length or result["truncated"] == "chars":
+            content = content[:max_length] + f"\n\n[TRUNCATED at {max_length} chars]"
+        elif result["truncated"] == "bytes":
+            content += f"\n\n[TRUNCATED at {result['bytes']} bytes]"
+        return content
+
+    def get(self, url: str, max_chars: int, extract: bool = True) -> dict:
+        """
+        キャッシュを通してfetch()する（戻り値もfetch()と同じ形）。
+        新しいキャッシュはそのまま返し、古ければ条件付きリクエストで確認する。
+        取得に失敗したときは古いキャッシュでも返す。
+        """
+        entry = self.cache.get(url)
+        if entry and not self.cache.satisfies(entry, max_chars, extract):
+            entry = None
+        if entry and self.cache.is_fresh(entry):
+            self.cache.record_served(entry)
+            return self._from_entry(entry, extract)
+
+        try:
+            result = fetch(url, max_chars, extract=extract, headers=HttpCache.validators(entry) if entry else None)
+        except httpx.HTTPError:
+            if not entry:
+                raise
+            self.cache.record_served(entry)
+            return self._from_entry(entry, extract)
+        if entry and result["status"] == 304:
+            self.cache.touch(url, entry, result["headers"])
+            self.cache.record_served(entry, revalidated=True)
+            return self._from_entry(entry, extract)
+        if self.cache.enabled:
+            self.cache.record_miss()
+            self.cache.put(url, result)
+        return result
+
+    @staticmethod
+    def _from_entry(entry: dict, extract: bool) -> dict:
+        """キャッシュのエントリをfetch()の戻り値の形にする"""
+        text = entry["raw"]
+        if extract and entry.get("html"):
+            text = entry.get("text") or html_to_markdown(entry["raw"], entry.get("final_url") or entry["url"])
+        return {
+            "url": entry.get("final_url") or entry["url"],
+            "status": entry["status"],
+            "reason": entry.get("reason"),
+            "content_type": entry.get("content_type") or "",
+            "charset": entry.get("charset"),
+            "headers": {},
+            "raw": entry["raw"],
+            "text": text,
+            "html": entry.get("html", False),
+            "extracted": extract and entry.get("html", False),
+            "bytes": entry.get("bytes", 0),
+            "truncated": entry.get("truncated"),
+        }
+
+
+def allocate_budget(sizes: list[int], budget: int) -> list[int]:
+    """
+    合計budgetを各ページに配分する（water-filling）。
+    短いページは全部を受け取り、余った分を長いページで等分する。
+    """
+    shares = [0] * len(sizes)
+    remaining = budget
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    for n, i in enumerate(order):
+        fair = remaining // (len(order) - n)
+        shares[i] = min(sizes[i], fair)
+        remaining -= shares[i]
+    return shares
+
+
+class WebBatchTool(BaseTool):
+    """
+    複数のURLをまとめて取得する（比較・調査でweb_fetchを何度も呼ばずに1回で済ませる）。
+    取得はWebToolに任せ（キャッシュ・本文の抽出も同じ）、全体とホスト毎の同時接続数を制限する。
+    結果はURL毎に見出しを付け、合計がmax_tokensに収まるよう短いページから順に配分する。
+    """
+
+    name = "web_fetch_batch"
+    description = (
+        f"Fetch up to {BATCH_MAX_URLS} URLs concurrently in one call and return each page's main content, "
+        "sharing one token budget between them. Use it instead of several web_fetch calls "
+        "when comparing or researching multiple pages."
+    )
+    max_result_chars = BATCH_MAX_TOKENS * 4 + 2000  # 予算に収めて返すので、既定の上限では切らない
+
+    def __init__(self, web: WebTool | None = None):
+        self.web = web or WebTool()
+
+    def parameters_schema(self) -> dict:
+        return {
+            "type": "object",
+            "properties": {
+                "urls": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": f"The URLs to fetch (at most {BATCH_MAX_URLS})",
+                },
+                "max_tokens": {
+                    "type": "integer",
+                    "description": (
+                        f"Total token budget shared by all pages "
+                        f"(default: {BATCH_DEFAULT_TOKENS}, max: {BATCH_MAX_TOKENS})"
+                    ),
+                },
+                "raw": {
+                    "type": "boolean",
+                    "description": "Return the raw bodies instead of extracted Markdown (default: false)",
+                },
+            },
+            "required": ["urls"],
+        }
+
+    def execute(self, urls: list[str], max_tokens: int = BATCH_DEFAULT_TOKENS, raw: bool = False, **kwargs) -> Any:
+        if isinstance(urls, str):
+            urls = [urls]
+        urls = list(dict.fromkeys(u.strip() for u in urls or [] if u and u.strip()))  # 重複を除く
+        if not urls:
+            return "[ERROR] No URLs given"
+        if len(urls) > BATCH_MAX_URLS:
+            return f"[ERROR] Too many URLs ({len(urls)}; at most {BATCH_MAX_URLS})"
+        max_tokens = max(100, min(max_tokens or BATCH_DEFAULT_TOKENS, BATCH_MAX_TOKENS))
+
+        # 1ページが予算を全部使っても足りる文字数まで取得する（ASCIIは約4文字で1トークン）
+        pages = self.fetch_all(urls, max_tokens * 4, raw)
+        headers = [f"## [{i}] {url}" for i, url in enumerate(urls, start=1)]
+        # 見出しと切り詰めの注記の分を先に引いておく
+        marker = f"\n\n[TRUNCATED to {max_tokens} of {max_tokens * 10} tokens]"
+        overhead = sum(count_tokens(h) + count_tokens(marker) + 2 for h in headers)
+        sizes = [count_tokens(page) for page in pages]
+        shares = allocate_budget(sizes, max(0, max_tokens - overhead))
+
+        sections = []
+        for header, page, size, share in zip(headers, pages, sizes, shares):
+            if size > share:
+                page = clip_to_tokens(page, share).rstrip() + f"\n\n[TRUNCATED to {share} of {size} tokens]"
+            sections.append(f"{header}\n{page}")
+        return "\n\n".join(sections)
+
+    def fetch_all(self, urls: list[str], max_chars: int, raw: bool = False) -> list[str]:
+        """
+        URLを並列に取得し、WebTool.execute()の結果（本文かエラーの文字列）をurlsの順で返す。
+        同時に取得するのは全体でBATCH_MAX_CONCURRENCY、同じホストにはBATCH_PER_HOSTまで。
+        """
+        results: list[str | None] = [None] * len(urls)
+        pending = list(range(len(urls)))
+        running: dict[Future, int] = {}
+        per_host: dict[str, int] = {}
+        hosts = [urlsplit(url).netloc.lower() for url in urls]
+
+        with ThreadPoolExecutor(max_workers=min(BATCH_MAX_CONCURRENCY, len(urls)), thread_name_prefix="yui-web") as pool:
+            while pending or running:
+                # 空いているホストのURLから順に投入する（同じホストの順番待ちで枠を塞がない）
+                for i in list(pending):
+                    if len(running) >= BATCH_MAX_CONCURRENCY:
+                        break
+                    if per_host.get(hosts[i], 0) >= BATCH_PER_HOST:
+                        continue
+                    pending.remove(i)
+                    per_host[hosts[i]] = per_host.get(hosts[i], 0) + 1
+                    running[pool.submit(self.web.execute, urls[i], max_length=max_chars, raw=raw)] = i
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = running.pop(future)
+                    per_host[hosts[i]] -= 1
+                    try:
+                        results[i] = str(future.result())
+                    except Exception as e:
+                        results[i] = f"[ERROR] {e}"
+                finished = len(urls) - len(pending) - len(running)
+                self.report_progress(f"{finished}/{len(urls)} URL")
+        return results